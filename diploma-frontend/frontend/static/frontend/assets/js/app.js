@@ -30,6 +30,7 @@ createApp({
 					return {
 						data: response?.data,
 						status: response.status,
+						headers: response.headers,
 					}
 					return response.data ? response.data : response.json?.()
 				})
@@ -37,9 +38,54 @@ createApp({
 					console.warn(
 						`Метод '${url}' вернул статус код ${error.response.status}`
 					)
-					throw new Error()
+					const failure = new Error()
+					failure.response = error.response
+					throw failure
 				})
 		},
+		postThroughWaitingRoom(url, payload, headers = {}) {
+			// При ответе 429 запрос повторяется с билетом комнаты ожидания после допуска к оформлению
+			return this.postData(url, payload, headers).catch((error) => {
+				const { status, data, headers: responseHeaders } = error.response || {}
+				if (status !== 429 || !data?.token) {
+					throw error
+				}
+				this.waitingRoomPosition = data.position
+				const interval = Number(responseHeaders?.['retry-after'] || 2) * 1000
+				return this.waitForAdmission(data.token, interval).then(() =>
+					this.postThroughWaitingRoom(url, payload, {
+						...headers,
+						'X-Waiting-Room-Token': data.token,
+					})
+				)
+			})
+		},
+		waitForAdmission(token, interval) {
+			return new Promise((resolve, reject) => {
+				const poll = () => {
+					this.getData(`/api/waiting-room/${token}`)
+						.then(({ position, admitted }) => {
+							this.waitingRoomPosition = position
+							if (admitted) {
+								resolve()
+							} else {
+								setTimeout(poll, interval)
+							}
+						})
+						.catch((error) => {
+							this.waitingRoomPosition = 0
+							reject(error)
+						})
+				}
+				setTimeout(poll, interval)
+			})
+		},
+		newIdempotencyKey() {
+			// Ключ не меняется при повторах одного оформления заказа или оплаты
+			return window.crypto?.randomUUID
+				? window.crypto.randomUUID()
+				: `${Date.now()}-${Math.random().toString(36).slice(2)}`
+		},
 		getData(url, payload) {
 			return axios
 				.get(url, { params: payload })
@@ -62,9 +108,23 @@ createApp({
 					this.categories = []
 				})
 		},
+		reportRejectedClaims(headers) {
+			// Товары флеш-распродажи, которые закончились до записи в корзину
+			const rejected = headers?.['flash-sale-rejected']
+			if (!rejected) {
+				return
+			}
+			const count = JSON.parse(rejected).reduce(
+				(acc, item) => acc + item.count,
+				0
+			)
+			alert(`Не удалось добавить в корзину товары распродажи: ${count} шт. Товар закончился`)
+		},
 		getBasket() {
-			this.getData('/api/basket')
-				.then((data) => {
+			axios
+				.get('/api/basket')
+				.then(({ data, headers }) => {
+					this.reportRejectedClaims(headers)
 					const basket = {}
 					data.forEach((item) => {
 						basket[item.id] = {
@@ -72,12 +132,22 @@ createApp({
 						}
 					})
 					this.basket = basket
+					this.basketLoaded = true
 				})
 				.catch(() => {
 					console.warn('Ошибка при получении корзины')
 					this.basket = {}
 				})
 		},
+		getBasketSummary() {
+			this.getData('/api/basket/summary')
+				.then(({ count, subtotal }) => {
+					this.basketSummary = { count, price: Number(subtotal) }
+				})
+				.catch(() => {
+					console.warn('Ошибка при получении сводки корзины')
+				})
+		},
 		// getLastOrder() {
 		// 	this.getData('/api/orders/active/')
 		// 		.then(data => {
@@ -96,8 +166,10 @@ createApp({
 		addToBasket(item, count = 1) {
 			const { id } = item
 			this.postData('/api/basket', { id, count })
-				.then(({ data }) => {
+				.then(({ data, headers }) => {
+					this.reportRejectedClaims(headers)
 					this.basket = data
+					this.basketLoaded = true
 				})
 				.catch(() => {
 					console.warn('Ошибка при добавлении заказа в корзину')
@@ -112,8 +184,10 @@ createApp({
 						'Content-Type': 'application/json',
 					},
 				})
-				.then(({ data }) => {
+				.then(({ data, headers }) => {
+					this.reportRejectedClaims(headers)
 					this.basket = data
+					this.basketLoaded = true
 				})
 				.catch(() => {
 					console.warn('Ошибка при удалении заказа из корзины')
@@ -127,6 +201,10 @@ createApp({
 	},
 	computed: {
 		basketCount() {
+			// До загрузки корзины счетчик в шапке берется из сводки корзины
+			if (!this.basketLoaded) {
+				return this.basketSummary
+			}
 			return (
 				(this.basket &&
 					Object.values(this.basket)?.reduce(
@@ -166,6 +244,9 @@ createApp({
 			cart: [],
 			paymentData: {},
 			basket: {},
+			basketLoaded: false,
+			basketSummary: { count: 0, price: 0 },
+			waitingRoomPosition: 0,
 			// order: {
 			// 	orderId: null,
 			// 	createdAt: '',
@@ -185,7 +266,12 @@ createApp({
 	},
 	mounted() {
 		this.getCategories()
-		this.getBasket()
+		// Полная корзина загружается только на страницах, где выводится список товаров в корзине
+		if (this.fullBasket) {
+			this.getBasket()
+		} else {
+			this.getBasketSummary()
+		}
 		// this.getLastOrder()
 	},
 }).mount('#site')
@@ -1,16 +1,41 @@
 var mix = {
     methods: {
         submitBasket () {
-            this.postData('/api/orders', Object.values(this.basket))
+            this.postThroughWaitingRoom('/api/orders', Object.values(this.basket), {
+                'Idempotency-Key': this.orderKey,
+            })
                 .then(({data: { orderId }}) => {
                     location.assign(`/orders/${orderId}/`)
                 }).catch(() => {
                     console.warn('Ошибка при создании заказа')
                 })
+        },
+        getBasketPreview () {
+            this.getData('/api/basket/preview')
+                .then((preview) => {
+                    this.preview = preview
+                })
+                .catch(() => {
+                    console.warn('Ошибка при расчете стоимости корзины')
+                })
+        }
+    },
+    watch: {
+        basket: {
+            handler () {
+                this.getBasketPreview()
+            },
+            deep: true,
         }
     },
-    mounted() {},
+    mounted() {
+        this.getBasketPreview()
+    },
     data() {
-        return {}
+        return {
+            fullBasket: true,
+            orderKey: this.newIdempotencyKey(),
+            preview: null,
+        }
     }
 }
\ No newline at end of file
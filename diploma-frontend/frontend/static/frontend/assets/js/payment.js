@@ -11,20 +11,21 @@ var mix = {
 				month: this.month,
 				code: this.code,
 			})
-			this.postData(`/api/payment/${orderId}`, {
+			this.postThroughWaitingRoom(`/api/payment/${orderId}`, {
 				name: this.name,
 				number: this.number1,
 				year: this.year,
 				month: this.month,
 				code: this.code
-			}).then(() => {
-				alert('Успешная оплата')
+			}, {
+				'Idempotency-Key': this.paymentKey
+			}).then(({ data: { paymentId } }) => {
 				this.number1 = ''
 				this.name = ''
 				this.year = ''
 				this.month = ''
 				this.code = ''
-				location.assign('/')
+				location.assign(`/progress-payment/?payment=${paymentId}`)
 			}).catch(() => {
 			 	console.warn('Ошибка при оплате')
 			})
@@ -36,7 +37,8 @@ var mix = {
 			month: '',
 			year: '',
 			name: '',
-			code: ''
+			code: '',
+			paymentKey: this.newIdempotencyKey()
 		}
 	}
 }
\ No newline at end of file
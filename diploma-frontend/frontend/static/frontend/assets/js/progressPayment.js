@@ -0,0 +1,50 @@
+var mix = {
+	methods: {
+		watchPayment() {
+			const paymentId = new URLSearchParams(location.search).get('payment')
+			if (!paymentId) return
+			if (typeof EventSource === 'undefined') {
+				this.pollPayment(paymentId)
+				return
+			}
+			this.events = new EventSource(`/api/payments/${paymentId}/events`)
+			this.events.addEventListener('status', (event) => {
+				this.updatePayment(JSON.parse(event.data))
+			})
+		},
+		pollPayment(paymentId) {
+			this.getData(`/api/payments/${paymentId}`)
+				.then((data) => {
+					this.updatePayment(data)
+					if (this.status === 'pending') {
+						setTimeout(() => this.pollPayment(paymentId), 2000)
+					}
+				})
+				.catch(() => {
+					console.warn('Ошибка при получении статуса оплаты')
+				})
+		},
+		updatePayment(data) {
+			this.status = data.status
+			this.error = data.error
+			this.orderId = data.order
+			if (this.status === 'pending') return
+			if (this.events) this.events.close()
+			if (this.status === 'paid') {
+				alert('Успешная оплата')
+				location.assign('/')
+			}
+		}
+	},
+	mounted() {
+		this.watchPayment()
+	},
+	data() {
+		return {
+			status: 'pending',
+			error: '',
+			orderId: null,
+			events: null,
+		}
+	}
+}
\ No newline at end of file
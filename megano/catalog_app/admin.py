@@ -8,6 +8,9 @@ from catalog_app.models import (
     Tag,
 )
 from django.contrib import admin
+from django.db.models import QuerySet
+from django.http import HttpRequest
+from shop_app.reservations import annotate_stock
 
 
 class CategoryAdmin(admin.ModelAdmin):
@@ -56,10 +59,35 @@ class SaleAdmin(admin.ModelAdmin):
 class ProductAdmin(admin.ModelAdmin):
     """Класс для администрирования модели продукта. Родитель: ModelAdmin."""
 
-    list_display = "pk", "title", "category", "price"
+    list_display = (
+        "pk",
+        "title",
+        "category",
+        "price",
+        "count",
+        "reserved_count",
+        "on_hand_count",
+    )
     readonly_fields = ("rating",)
     inlines = [ImageInline]
 
+    def get_queryset(self, request: HttpRequest) -> QuerySet:
+        """Метод для добавления к продуктам остатков с учетом резервов в корзинах."""
+
+        return annotate_stock(super().get_queryset(request))
+
+    @admin.display(description="В резерве")
+    def reserved_count(self, obj: Product) -> int:
+        """Метод для отображения количества товара в действующих резервах корзин."""
+
+        return obj.reserved_count
+
+    @admin.display(description="На складе")
+    def on_hand_count(self, obj: Product) -> int:
+        """Метод для отображения количества товара на складе с учетом резервов."""
+
+        return obj.on_hand_count
+
 
 admin.site.register(Category, CategoryAdmin)
 
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CatalogAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "catalog_app"
+
+    def ready(self) -> None:
+        """Метод для регистрации кэшированных артефактов приложения."""
+
+        import catalog_app.cache  # noqa: F401
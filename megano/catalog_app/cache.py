@@ -0,0 +1,231 @@
+from typing import Iterable, List, Optional, Set
+
+from django.conf import settings
+
+from catalog_app.documents import invalidate_product_documents
+from catalog_app.models import (
+    Category,
+    Image,
+    Product,
+    ProductDocument,
+    Review,
+    Specification,
+    Tag,
+)
+from catalog_app.serializers import CategorySerializer, TagSerializer
+from catalog_app.tasks import purge_catalog_cache
+from catalog_app.utils import get_active_main_categories
+from megano.cache_registry import (
+    CallbackArtifact,
+    Dependency,
+    LocalCachedArtifact,
+    cache_registry,
+)
+
+
+def load_category_tree() -> list:
+    """Функция для загрузки дерева категорий."""
+
+    return CategorySerializer(get_active_main_categories(), many=True).data
+
+
+def load_tag_list() -> list:
+    """Функция для загрузки списка тэгов."""
+
+    return TagSerializer(Tag.objects.all(), many=True).data
+
+
+def load_banner_pool() -> List[int]:
+    """Функция для загрузки id самых дешевых товаров в наличии в каждой категории одним запросом."""
+
+    return list(
+        Product.objects.filter(count__gt=0)
+        .order_by("category_id", "price", "id")
+        .distinct("category_id")
+        .values_list("id", flat=True)
+    )
+
+
+def purge_catalog_microcache(paths: Optional[frozenset]) -> None:
+    """Функция для обновления микрокэша каталога в nginx по списку адресов."""
+
+    if not settings.NGINX_CACHE_PURGE_URL:
+        return
+    if paths is None:
+        paths = {"/api/categories", "/api/tags"}
+    purge_catalog_cache.delay(sorted(paths))
+
+
+def product_pks(products: Iterable[Product]) -> List[int]:
+    """Функция для получения id измененных продуктов."""
+
+    return [product.pk for product in products]
+
+
+def category_tree_ids(category_ids: Iterable[int]) -> Set[int]:
+    """Функция для получения id главных категорий для списка категорий и всех подкатегорий этих главных категорий."""
+
+    tree = set(category_ids)
+    parents = tree
+    while parents:
+        parents = (
+            set(
+                Category.objects.filter(
+                    pk__in=parents, main_category__isnull=False
+                ).values_list("main_category", flat=True)
+            )
+            - tree
+        )
+        tree |= parents
+    roots = set(
+        Category.objects.filter(pk__in=tree, main_category__isnull=True).values_list(
+            "pk", flat=True
+        )
+    )
+    tree = set(roots)
+    children = roots
+    while children:
+        children = (
+            set(
+                Category.objects.filter(main_category__in=children).values_list(
+                    "pk", flat=True
+                )
+            )
+            - tree
+        )
+        tree |= children
+    return tree
+
+
+def category_product_pks(products: Iterable[Product]) -> List[int]:
+    """
+    Функция для получения id продуктов, документы которых включают дерево категорий измененных продуктов. Подкатегории
+    попадают в документ, только если в них есть продукты, поэтому добавление, удаление или перенос продукта меняет
+    документы всех продуктов главной категории старой и новой категории продукта. Старая категория при сохранении
+    продукта берется из его документа.
+    """
+
+    products = list(products)
+    category_ids = {product.category_id for product in products}
+    category_ids.update(
+        ProductDocument.objects.filter(
+            product__in=[product.pk for product in products]
+        ).values_list("document__category__id", flat=True)
+    )
+    category_ids.discard(None)
+    if not category_ids:
+        return []
+    return Product.objects.filter(
+        category__in=category_tree_ids(category_ids)
+    ).values_list("pk", flat=True)
+
+
+def related_product_pks(instances: Iterable) -> Optional[List[int]]:
+    """Функция для получения id продуктов, к которым относятся отзывы или изображения."""
+
+    product_ids = [instance.product_id for instance in instances]
+    if None in product_ids:
+        # Изображения категорий входят в документы всех продуктов
+        return None
+    return product_ids
+
+
+def tagged_product_pks(tags: Iterable[Tag]) -> List[int]:
+    """Функция для получения id продуктов с измененными тэгами."""
+
+    return Product.objects.filter(tags__in=list(tags)).values_list("pk", flat=True)
+
+
+def specified_product_pks(specifications: Iterable[Specification]) -> List[int]:
+    """Функция для получения id продуктов с измененными характеристиками."""
+
+    return Product.objects.filter(specifications__in=list(specifications)).values_list(
+        "pk", flat=True
+    )
+
+
+def product_paths(products: Iterable[Product]) -> List[str]:
+    """Функция для получения адресов микрокэша, ответы на которые зависят от продуктов."""
+
+    paths = ["/api/categories"]
+    for product in products:
+        paths.append("/api/product/{pk}".format(pk=product.pk))
+    return paths
+
+
+def related_product_paths(instances: Iterable) -> List[str]:
+    """Функция для получения адресов микрокэша, ответы на которые зависят от отзывов или изображений."""
+
+    paths = []
+    for instance in instances:
+        if instance.product_id:
+            paths.append("/api/product/{pk}".format(pk=instance.product_id))
+        else:
+            paths.append("/api/categories")
+    return paths
+
+
+category_tree = cache_registry.register(
+    LocalCachedArtifact(
+        "category_tree",
+        loader=load_category_tree,
+        dependencies=[
+            Dependency(Category),
+            Dependency(Image, fields=["src", "alt"]),
+            Dependency(Product, fields=["category"]),
+        ],
+        timeout=600,
+    )
+)
+
+tag_list = cache_registry.register(
+    LocalCachedArtifact(
+        "tag_list", loader=load_tag_list, dependencies=[Dependency(Tag)], timeout=600
+    )
+)
+
+banner_pool = cache_registry.register(
+    LocalCachedArtifact(
+        "banner_pool",
+        loader=load_banner_pool,
+        dependencies=[
+            Dependency(Category),
+            # Остатки меняются при каждом добавлении товара в корзину, поэтому товары, закончившиеся на складе,
+            # убираются из пула по истечении времени жизни пула
+            Dependency(Product, fields=["category", "price"]),
+        ],
+        timeout=60,
+    )
+)
+
+product_documents = cache_registry.register(
+    CallbackArtifact(
+        "product_documents",
+        callback=invalidate_product_documents,
+        dependencies=[
+            Dependency(Product, exclude=["count"], keys=product_pks),
+            # Подкатегории без продуктов не попадают в документы, поэтому добавление, удаление и перенос продукта
+            # меняют документы других продуктов той же главной категории
+            Dependency(Product, fields=["category"], keys=category_product_pks),
+            Dependency(Review, keys=related_product_pks),
+            Dependency(Image, keys=related_product_pks),
+            Dependency(Tag, fields=["name"], keys=tagged_product_pks),
+            Dependency(Specification, keys=specified_product_pks),
+            Dependency(Category),
+        ],
+    )
+)
+
+catalog_microcache = cache_registry.register(
+    CallbackArtifact(
+        "catalog_microcache",
+        callback=purge_catalog_microcache,
+        dependencies=[
+            Dependency(Product, exclude=["count"], keys=product_paths),
+            Dependency(Review, keys=related_product_paths),
+            Dependency(Image, keys=related_product_paths),
+            Dependency(Tag, keys=lambda tags: ["/api/tags"]),
+            Dependency(Category, keys=lambda categories: ["/api/categories"]),
+        ],
+    )
+)
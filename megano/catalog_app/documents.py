@@ -0,0 +1,143 @@
+import json
+from typing import Dict, Iterable, List, Optional, Type
+
+from catalog_app.models import Product, ProductDocument
+from catalog_app.serializers import ProductDetailsSerializer
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import QuerySet
+from rest_framework.serializers import ModelSerializer
+
+# Поля, которые часто меняются (остаток при добавлении в корзину) и не хранятся в документе, а берутся из продукта
+VOLATILE_FIELDS = ("count",)
+
+
+def document_products_queryset() -> QuerySet:
+    """Функция для получения QuerySet продуктов со всеми связанными объектами, входящими в документ продукта."""
+
+    return (
+        Product.objects.select_related("category__image")
+        .prefetch_related("category__subcategories__products")
+        .prefetch_related("category__subcategories__subcategories")
+        .prefetch_related("category__subcategories__image")
+        .prefetch_related("images")
+        .prefetch_related("tags")
+        .prefetch_related("reviews")
+        .prefetch_related("specifications")
+    )
+
+
+def build_product_document(product: Product) -> Dict:
+    """Функция для формирования документа продукта по данным ORM."""
+
+    data = ProductDetailsSerializer(product).data
+    document = json.loads(json.dumps(data, cls=DjangoJSONEncoder))
+    for field in VOLATILE_FIELDS:
+        document.pop(field, None)
+    return document
+
+
+def rebuild_product_documents(
+    product_ids: Optional[Iterable[int]] = None, batch_size: int = 100
+) -> int:
+    """
+    Функция для пересборки документов продуктов. Без списка id пересобираются документы, отсутствующие в таблице
+    документов (удаленные при изменении данных продуктов).
+    """
+
+    products = document_products_queryset()
+    if product_ids is None:
+        products = products.filter(document__isnull=True)
+    else:
+        products = products.filter(id__in=list(product_ids))
+    product_pks = list(products.order_by("pk").values_list("pk", flat=True))
+    rebuilt = 0
+    for start in range(0, len(product_pks), batch_size):
+        batch = products.filter(pk__in=product_pks[start : start + batch_size])
+        documents = [
+            ProductDocument(product=product, document=build_product_document(product))
+            for product in batch
+        ]
+        ProductDocument.objects.bulk_create(
+            documents,
+            update_conflicts=True,
+            unique_fields=["product"],
+            update_fields=["document", "updated"],
+        )
+        rebuilt += len(documents)
+    return rebuilt
+
+
+def invalidate_product_documents(product_ids: Optional[Iterable[int]] = None) -> None:
+    """Функция для удаления устаревших документов продуктов. Без списка id удаляются все документы."""
+
+    documents = ProductDocument.objects.all()
+    if product_ids is not None:
+        documents = documents.filter(product_id__in=list(product_ids))
+    documents.delete()
+
+
+def document_representation(
+    document: Dict, volatile: Dict, serializer_class: Type[ModelSerializer]
+) -> Dict:
+    """Функция для приведения документа продукта к представлению сериалайзера."""
+
+    return {
+        field: volatile[field] if field in VOLATILE_FIELDS else document[field]
+        for field in serializer_class.Meta.fields
+    }
+
+
+def product_document(
+    product_pk: int, serializer_class: Type[ModelSerializer]
+) -> Optional[Dict]:
+    """Функция для получения представления продукта из документа одним запросом по первичному ключу."""
+
+    row = (
+        ProductDocument.objects.filter(product_id=product_pk)
+        .values_list(
+            "document",
+            *["product__{field}".format(field=field) for field in VOLATILE_FIELDS]
+        )
+        .first()
+    )
+    if row is None:
+        return None
+    document, *volatile_values = row
+    return document_representation(
+        document, dict(zip(VOLATILE_FIELDS, volatile_values)), serializer_class
+    )
+
+
+def product_documents(
+    products: Iterable[Product], serializer_class: Type[ModelSerializer]
+) -> List[Dict]:
+    """
+    Функция для получения представлений списка продуктов из документов. Продукты без документа сериализуются через
+    ORM.
+    """
+
+    products = list(products)
+    documents = dict(
+        ProductDocument.objects.filter(
+            product_id__in=[product.pk for product in products]
+        ).values_list("product_id", "document")
+    )
+    missing = [product.pk for product in products if product.pk not in documents]
+    fallback = {}
+    if missing:
+        fallback = {
+            item["id"]: item
+            for item in serializer_class(
+                document_products_queryset().filter(pk__in=missing), many=True
+            ).data
+        }
+    data = []
+    for product in products:
+        if product.pk in fallback:
+            data.append(fallback[product.pk])
+            continue
+        volatile = {field: getattr(product, field) for field in VOLATILE_FIELDS}
+        data.append(
+            document_representation(documents[product.pk], volatile, serializer_class)
+        )
+    return data
@@ -0,0 +1,101 @@
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from catalog_app.models import Product
+from django.core.management.base import BaseCommand, CommandParser
+
+# Статусы $upstream_cache_status, при которых запрос доходит до gunicorn
+UPSTREAM_STATUSES = {"MISS", "EXPIRED", "BYPASS", "-"}
+
+
+class Command(BaseCommand):
+    """
+    Команда для нагрузочного тестирования микрокэша каталога в nginx. Выводит долю попаданий в кэш и долю запросов,
+    дошедших до gunicorn. Родитель: BaseCommand.
+    """
+
+    help = "Нагрузочный тест микрокэша анонимных запросов каталога"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Метод для добавления аргументов команды."""
+
+        parser.add_argument("--url", default="http://localhost")
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def build_paths(self, total: int, seed: int) -> List[str]:
+        """Метод для формирования набора адресов, имитирующего анонимный трафик каталога."""
+
+        rnd = random.Random(seed)
+        product_ids = list(Product.objects.values_list("id", flat=True)[:200]) or [1]
+        paths = []
+        for _ in range(total):
+            kind = rnd.random()
+            if kind < 0.4:
+                paths.append(
+                    "/api/catalog?currentPage={page}&sort=price&sortType=inc&limit=20".format(
+                        page=rnd.randint(1, 5)
+                    )
+                )
+            elif kind < 0.8:
+                paths.append("/api/product/{pk}".format(pk=rnd.choice(product_ids)))
+            elif kind < 0.9:
+                paths.append("/api/categories")
+            else:
+                paths.append("/api/tags")
+        return paths
+
+    def fetch(self, url: str) -> Tuple[str, float]:
+        """Метод для выполнения запроса и получения статуса кэша nginx."""
+
+        started = time.perf_counter()
+        try:
+            with urlopen(url, timeout=10) as response:
+                response.read()
+                cache_status = response.headers.get("X-Cache-Status", "-")
+        except HTTPError as error:
+            cache_status = error.headers.get("X-Cache-Status", "-")
+        return cache_status, time.perf_counter() - started
+
+    def handle(self, *args, **options) -> None:
+        """Метод для запуска нагрузочного теста и вывода результатов."""
+
+        base_url = options["url"].rstrip("/")
+        paths = self.build_paths(options["requests"], options["seed"])
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            results = list(
+                executor.map(lambda path: self.fetch(base_url + path), paths)
+            )
+        elapsed = time.perf_counter() - started
+
+        statuses = Counter(cache_status for cache_status, _ in results)
+        latencies = sorted(latency for _, latency in results)
+        total = len(results)
+        hits = statuses["HIT"] + statuses["STALE"] + statuses["UPDATING"]
+        upstream = sum(statuses[name] for name in UPSTREAM_STATUSES)
+        self.stdout.write(
+            "Запросов: {total}, {rps:.0f} rps".format(total=total, rps=total / elapsed)
+        )
+        for name, count in sorted(statuses.items()):
+            self.stdout.write("  {name}: {count}".format(name=name, count=count))
+        self.stdout.write(
+            "Доля попаданий в кэш: {ratio:.1%}".format(ratio=hits / total)
+        )
+        self.stdout.write(
+            "Запросов к gunicorn: {upstream} (снижение нагрузки на {reduction:.1%})".format(
+                upstream=upstream, reduction=1 - upstream / total
+            )
+        )
+        self.stdout.write(
+            "Задержка p50: {p50:.1f} мс, p95: {p95:.1f} мс".format(
+                p50=latencies[total // 2] * 1000,
+                p95=latencies[int(total * 0.95)] * 1000,
+            )
+        )
@@ -0,0 +1,60 @@
+from catalog_app.documents import (
+    build_product_document,
+    document_products_queryset,
+    rebuild_product_documents,
+)
+from catalog_app.models import ProductDocument
+from django.core.management.base import BaseCommand, CommandParser
+
+
+class Command(BaseCommand):
+    """
+    Команда для проверки соответствия документов продуктов данным ORM. Выводит продукты с отсутствующими и
+    устаревшими документами. Родитель: BaseCommand.
+    """
+
+    help = "Проверка документов продуктов на соответствие данным ORM"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Метод для добавления аргументов команды."""
+
+        parser.add_argument(
+            "--fix", action="store_true", help="Пересобрать расходящиеся документы"
+        )
+        parser.add_argument("--batch-size", type=int, default=100)
+
+    def handle(self, *args, **options) -> None:
+        """Метод для сравнения документов продуктов с данными ORM."""
+
+        batch_size = options["batch_size"]
+        product_pks = list(
+            document_products_queryset().order_by("pk").values_list("pk", flat=True)
+        )
+        missing, stale = [], []
+        for start in range(0, len(product_pks), batch_size):
+            batch_pks = product_pks[start : start + batch_size]
+            documents = dict(
+                ProductDocument.objects.filter(product_id__in=batch_pks).values_list(
+                    "product_id", "document"
+                )
+            )
+            for product in document_products_queryset().filter(pk__in=batch_pks):
+                if product.pk not in documents:
+                    missing.append(product.pk)
+                elif documents[product.pk] != build_product_document(product):
+                    stale.append(product.pk)
+
+        self.stdout.write(
+            "Проверено продуктов: {total}, без документа: {missing}, устаревших документов: {stale}".format(
+                total=len(product_pks), missing=len(missing), stale=len(stale)
+            )
+        )
+        if stale:
+            self.stdout.write(
+                "Устаревшие документы: {pks}".format(pks=", ".join(map(str, stale)))
+            )
+        if options["fix"] and (missing or stale):
+            rebuilt = rebuild_product_documents(missing + stale, batch_size=batch_size)
+            self.stdout.write(
+                "Пересобрано документов: {rebuilt}".format(rebuilt=rebuilt)
+            )
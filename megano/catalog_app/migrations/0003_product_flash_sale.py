@@ -0,0 +1,17 @@
+# Generated by Django 4.2.2 on 2026-10-18 23:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog_app", "0002_productdocument"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="flashSale",
+            field=models.BooleanField(default=False, verbose_name="Флеш-распродажа"),
+        ),
+    ]
@@ -1,6 +1,9 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.db.models import Avg
 
+from megano.cache_registry import InvalidatingQuerySet
+
 
 def image_directory_path(instance: "Image", filename: str) -> str:
     """Функция для формирования директории, в которую сохраняются изображения продуктов и категорий продуктов."""
@@ -23,6 +26,8 @@ class Image(models.Model):
         verbose_name="Продукт",
     )
 
+    objects = InvalidatingQuerySet.as_manager()
+
     def __str__(self) -> str:
         """Метод для вывода описания изображения в качестве названия изображения."""
 
@@ -52,6 +57,8 @@ class Category(models.Model):
         verbose_name="Главная категория",
     )
 
+    objects = InvalidatingQuerySet.as_manager()
+
     def __str__(self) -> str:
         """Метод для вывода заголовка категории и подкатегории в качестве названия категории и подкатегории."""
 
@@ -67,6 +74,8 @@ class Tag(models.Model):
 
     name = models.CharField(max_length=50, verbose_name="Имя")
 
+    objects = InvalidatingQuerySet.as_manager()
+
     def __str__(self) -> str:
         """Метод для вывода имени тэга в качестве названия тэга."""
 
@@ -83,6 +92,8 @@ class Specification(models.Model):
     name = models.CharField(max_length=100, verbose_name="Наименование")
     value = models.CharField(max_length=50, verbose_name="Значение")
 
+    objects = InvalidatingQuerySet.as_manager()
+
     def __str__(self) -> str:
         """Метод для вывода имени характеристики в качестве названия характеристки."""
 
@@ -102,6 +113,8 @@ class Sale(models.Model):
     dateFrom = models.DateField(verbose_name="Дата начала акции")
     dateTo = models.DateField(verbose_name="Дата окончания акции")
 
+    objects = InvalidatingQuerySet.as_manager()
+
     def __str__(self) -> str:
         """Метод для вывода цены продукта со скидкой в качестве названия скидки."""
 
@@ -142,6 +155,7 @@ class Product(models.Model):
         decimal_places=1, max_digits=2, default=5, verbose_name="Рейтинг"
     )
     limited = models.BooleanField(verbose_name="Ограниченный тираж")
+    flashSale = models.BooleanField(default=False, verbose_name="Флеш-распродажа")
     sale = models.ForeignKey(
         Sale,
         null=True,
@@ -151,6 +165,8 @@ class Product(models.Model):
         verbose_name="Скидка",
     )
 
+    objects = InvalidatingQuerySet.as_manager()
+
     def __str__(self) -> str:
         """Метод для вывода заголовка продукта в качестве названия продукта."""
 
@@ -177,6 +193,8 @@ class Review(models.Model):
         verbose_name="Продукт",
     )
 
+    objects = InvalidatingQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Отзыв"
         verbose_name_plural = "Отзывы"
@@ -194,3 +212,29 @@ class Review(models.Model):
         )
         product.rating = rating["rate__avg"]
         product.save(update_fields=["rating"])
+
+
+class ProductDocument(models.Model):
+    """
+    Модель предварительно собранного документа продукта, содержащего категорию, изображения, тэги, отзывы и
+    характеристики продукта. Родитель: Model.
+    """
+
+    product = models.OneToOneField(
+        Product,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="document",
+        verbose_name="Продукт",
+    )
+    document = models.JSONField(encoder=DjangoJSONEncoder, verbose_name="Документ")
+    updated = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    def __str__(self) -> str:
+        """Метод для вывода названия документа продукта."""
+
+        return "Документ продукта {product_id}".format(product_id=self.product_id)
+
+    class Meta:
+        verbose_name = "Документ продукта"
+        verbose_name_plural = "Документы продуктов"
@@ -0,0 +1,43 @@
+import logging
+from typing import List, Optional
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from catalog_app.documents import rebuild_product_documents
+from celery import shared_task
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def purge_catalog_cache(paths: List[str]) -> int:
+    """
+    Функция для обновления записей микрокэша каталога в nginx. Запрос к внутреннему серверу nginx проходит мимо кэша
+    и перезаписывает закэшированный ответ.
+    """
+
+    refreshed = 0
+    for path in paths:
+        url = "{base}{path}".format(
+            base=settings.NGINX_CACHE_PURGE_URL.rstrip("/"), path=path
+        )
+        try:
+            with urlopen(url, timeout=settings.NGINX_CACHE_PURGE_TIMEOUT):
+                refreshed += 1
+        except URLError as error:
+            if getattr(error, "code", None) == 404:
+                refreshed += 1
+            else:
+                logger.warning("Не удалось обновить кэш %s: %s", url, error)
+    return refreshed
+
+
+@shared_task
+def index_product_documents(product_ids: Optional[List[int]] = None) -> int:
+    """
+    Функция для пересборки документов продуктов. Периодически запускается celery beat и собирает документы,
+    удаленные при изменении данных продуктов.
+    """
+
+    return rebuild_product_documents(product_ids)
@@ -1,11 +1,31 @@
 import json
+import time
 from datetime import datetime
+from functools import partial
+from io import StringIO
+from unittest import mock
 
-from catalog_app.models import Category, Image, Product, Review, Tag
+import fakeredis
 from django.contrib.auth.models import User
-from django.db.models import Count, Q, Sum
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.test import SimpleTestCase, override_settings
 from django.urls import reverse
 from rest_framework.test import APITestCase
+
+from catalog_app.documents import rebuild_product_documents
+from catalog_app.models import Category, Image, Product, ProductDocument, Review, Tag
+from catalog_app.serializers import ProductDetailsSerializer
+from megano.cache_bus import InvalidationBus
+from megano.cache_registry import (
+    CacheRegistry,
+    CallbackArtifact,
+    Dependency,
+    LocalCachedArtifact,
+    cache_registry,
+)
+from shop_app.models import OrderStatus
 from users_app.models import Profile
 
 
@@ -129,7 +149,7 @@ class ProductListViewTestCase(APITestCase):
             .annotate(
                 purchase_count=Sum(
                     "products_in_order_count__count_in_order",
-                    filter=Q(products_in_order_count__order__status="paid"),
+                    filter=Q(products_in_order_count__order__status=OrderStatus.PAID),
                 )
             )
             .order_by("-rating", "-purchase_count")[:5],
@@ -307,3 +327,314 @@ class ProductReviewCreateTestCase(APITestCase):
             },
         )
         self.assertEqual(response.status_code, 403)
+
+
+class CatalogCachePurgeTestCase(APITestCase):
+    """Тест обновления микрокэша каталога в nginx при изменении товаров. Родитель: APITestCase."""
+
+    fixtures = [
+        fixture_recode("images-fixture.json"),
+        fixture_recode("tags-fixture.json"),
+        fixture_recode("specifications-fixture.json"),
+        fixture_recode("categories-fixture.json"),
+        fixture_recode("sales-fixture.json"),
+        fixture_recode("products-fixture.json"),
+    ]
+
+    @override_settings(NGINX_CACHE_PURGE_URL="http://nginx:8081")
+    def test_product_change_purges_cache(self) -> None:
+        """Метод для тестирования обновления кэша после фиксации изменения товара."""
+
+        product = Product.objects.first()
+        with mock.patch("catalog_app.cache.purge_catalog_cache.delay") as purge:
+            with self.captureOnCommitCallbacks(execute=True):
+                product.title = "test_product_title"
+                product.save(update_fields=["title"])
+        purge.assert_called_once_with(
+            ["/api/categories", "/api/product/{pk}".format(pk=product.pk)]
+        )
+
+    @override_settings(NGINX_CACHE_PURGE_URL="http://nginx:8081")
+    def test_stock_change_keeps_cache(self) -> None:
+        """Метод для тестирования изменения остатка товара одним запросом без обновления кэша."""
+
+        product = Product.objects.first()
+        with mock.patch("catalog_app.cache.purge_catalog_cache.delay") as purge:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertNumQueries(1):
+                    Product.objects.filter(pk=product.pk, count__gte=1).update(
+                        count=F("count") - 1
+                    )
+        purge.assert_not_called()
+
+    @override_settings(NGINX_CACHE_PURGE_URL="")
+    def test_purge_disabled(self) -> None:
+        """Метод для тестирования отключения обновления кэша при отсутствии адреса nginx."""
+
+        product = Product.objects.first()
+        with mock.patch("catalog_app.cache.purge_catalog_cache.delay") as purge:
+            with self.captureOnCommitCallbacks(execute=True):
+                product.save()
+        purge.assert_not_called()
+
+
+class ProductDocumentTestCase(APITestCase):
+    """Тест документов продуктов для отображения товаров без объединения таблиц. Родитель: APITestCase."""
+
+    fixtures = [
+        fixture_recode("images-fixture.json"),
+        fixture_recode("tags-fixture.json"),
+        fixture_recode("specifications-fixture.json"),
+        fixture_recode("categories-fixture.json"),
+        fixture_recode("sales-fixture.json"),
+        fixture_recode("products-fixture.json"),
+    ]
+
+    def setUp(self) -> None:
+        """Метод для предварительной сборки документов продуктов."""
+
+        rebuild_product_documents()
+        self.product = Product.objects.first()
+
+    def test_product_detail_from_document(self) -> None:
+        """Метод для тестирования получения детальной страницы товара из документа одним запросом."""
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse("product", kwargs={"pk": self.product.pk})
+            )
+        expected = json.loads(
+            json.dumps(ProductDetailsSerializer(self.product).data, default=str)
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), expected)
+
+    def test_product_change_invalidates_document(self) -> None:
+        """Метод для тестирования удаления документа продукта после изменения продукта."""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.title = "test_product_title"
+            self.product.save(update_fields=["title"])
+        self.assertFalse(ProductDocument.objects.filter(product=self.product).exists())
+        response = self.client.get(reverse("product", kwargs={"pk": self.product.pk}))
+        self.assertContains(response, "test_product_title")
+
+    def test_product_count_change_keeps_document(self) -> None:
+        """Метод для тестирования сохранения документа продукта при изменении остатка."""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.count += 1
+            self.product.save(update_fields=["count"])
+        self.assertTrue(ProductDocument.objects.filter(product=self.product).exists())
+        response = self.client.get(reverse("product", kwargs={"pk": self.product.pk}))
+        self.assertEqual(json.loads(response.content)["count"], self.product.count)
+
+    def documented_categories(self) -> list:
+        """Метод для получения отсортированного списка id категорий продуктов, у которых есть документ."""
+
+        return sorted(
+            ProductDocument.objects.values_list("product__category", flat=True)
+        )
+
+    def test_product_create_invalidates_category_documents(self) -> None:
+        """Метод для тестирования удаления документов продуктов главной категории после добавления продукта."""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(
+                category_id=5,
+                price=100,
+                count=1,
+                title="test_product_title",
+                description="test_description",
+                fullDescription="test_fullDescription",
+                freeDelivery=False,
+                limited=False,
+            )
+        self.assertEqual(self.documented_categories(), [4, 4])
+
+    def test_product_update_invalidates_category_documents(self) -> None:
+        """Метод для тестирования удаления документов продуктов главной категории при переносе запросом update."""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=1).update(category_id=3)
+        self.assertEqual(self.documented_categories(), [4, 4])
+
+    def test_product_move_invalidates_category_documents(self) -> None:
+        """Метод для тестирования удаления документов продуктов старой и новой главной категории при переносе."""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.get(pk=7)
+            product.category_id = 2
+            product.save()
+        self.assertEqual(self.documented_categories(), [])
+
+    def test_check_product_documents(self) -> None:
+        """Метод для тестирования проверки соответствия документов продуктов данным ORM."""
+
+        ProductDocument.objects.filter(product=self.product).update(document={})
+        out = StringIO()
+        call_command("check_product_documents", "--fix", stdout=out)
+        self.assertIn("устаревших документов: 1", out.getvalue())
+        out = StringIO()
+        call_command("check_product_documents", stdout=out)
+        self.assertIn("без документа: 0, устаревших документов: 0", out.getvalue())
+
+
+class CacheRegistryTestCase(APITestCase):
+    """Тест реестра кэшированных артефактов. Родитель: APITestCase."""
+
+    fixtures = [
+        fixture_recode("images-fixture.json"),
+        fixture_recode("tags-fixture.json"),
+        fixture_recode("specifications-fixture.json"),
+        fixture_recode("categories-fixture.json"),
+        fixture_recode("sales-fixture.json"),
+        fixture_recode("products-fixture.json"),
+    ]
+
+    def setUp(self) -> None:
+        """Метод для регистрации тестового артефакта, зависящего от цены и тэгов продуктов."""
+
+        self.callback = mock.Mock()
+        cache_registry.register(
+            CallbackArtifact(
+                "test_artifact",
+                callback=self.callback,
+                dependencies=[
+                    Dependency(
+                        Product,
+                        fields=["price", "tags"],
+                        keys=lambda products: [product.pk for product in products],
+                    )
+                ],
+            )
+        )
+        self.addCleanup(cache_registry.unregister, "test_artifact")
+        self.products = list(Product.objects.order_by("pk")[:2])
+
+    def test_queryset_update_invalidates_artifact(self) -> None:
+        """Метод для тестирования сброса артефакта при обновлении продуктов через QuerySet.update."""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=self.products[0].pk).update(price=1)
+        self.callback.assert_called_once_with(frozenset([self.products[0].pk]))
+
+    def test_bulk_update_batches_invalidation(self) -> None:
+        """Метод для тестирования сброса артефакта одной пачкой после нескольких изменений в транзакции."""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for product in self.products:
+                product.price = 1
+            Product.objects.bulk_update(self.products, ["price"])
+            self.products[0].save(update_fields=["price"])
+        self.callback.assert_called_once_with(
+            frozenset(product.pk for product in self.products)
+        )
+
+    def test_batch_per_transaction(self) -> None:
+        """Метод для тестирования отдельного сброса артефакта после каждой транзакции."""
+
+        for product in self.products:
+            with self.captureOnCommitCallbacks(execute=True):
+                Product.objects.filter(pk=product.pk).update(price=1)
+        self.assertEqual(
+            self.callback.call_args_list,
+            [mock.call(frozenset([product.pk])) for product in self.products],
+        )
+
+    def test_savepoint_rollback_discards_batch(self) -> None:
+        """Метод для тестирования отмены сброса артефакта вместе с откатом точки сохранения."""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Product.objects.filter(pk=self.products[0].pk).update(price=1)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            Product.objects.filter(pk=self.products[1].pk).update(price=1)
+        self.callback.assert_called_once_with(frozenset([self.products[1].pk]))
+
+    def test_m2m_change_invalidates_artifact(self) -> None:
+        """Метод для тестирования сброса артефакта при изменении тэгов продукта."""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].tags.clear()
+        self.callback.assert_called_once_with(frozenset([self.products[0].pk]))
+
+    def test_unrelated_field_change_keeps_artifact(self) -> None:
+        """Метод для тестирования сохранения артефакта при изменении поля, от которого он не зависит."""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=self.products[0].pk).update(count=1)
+        self.callback.assert_not_called()
+
+
+class CacheInvalidationBusTestCase(SimpleTestCase):
+    """Тест шины сброса кэша между процессами на fakeredis. Родитель: SimpleTestCase."""
+
+    def setUp(self) -> None:
+        """Метод для создания двух реестров с шинами, имитирующих два процесса gunicorn."""
+
+        self.server = fakeredis.FakeServer()
+        self.loads = {"first": 0, "second": 0}
+        self.registries = {}
+        for process in self.loads:
+            registry = CacheRegistry()
+            registry.register(
+                LocalCachedArtifact(
+                    "test_artifact",
+                    loader=partial(self.load, process),
+                    dependencies=[Dependency(Tag)],
+                )
+            )
+            registry.bus = InvalidationBus(
+                registry,
+                client_factory=partial(fakeredis.FakeRedis, server=self.server),
+                channel="test-cache-invalidation",
+            )
+            self.addCleanup(registry.bus.stop)
+            self.registries[process] = registry
+
+    def load(self, process: str) -> int:
+        """Метод для загрузки значения артефакта с подсчетом загрузок."""
+
+        self.loads[process] += 1
+        return self.loads[process]
+
+    def wait_for_load(self, process: str, value: int) -> None:
+        """Метод для ожидания повторной загрузки артефакта после сброса из другого процесса."""
+
+        artifact = self.registries[process].get("test_artifact")
+        deadline = time.monotonic() + 2
+        while artifact.get() != value and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(artifact.get(), value)
+
+    def test_invalidation_reaches_other_process(self) -> None:
+        """Метод для тестирования сброса артефакта в другом процессе по сообщению шины."""
+
+        second = self.registries["second"].get("test_artifact")
+        self.assertEqual(second.get(), 1)
+        self.assertEqual(second.get(), 1)
+        self.registries["first"].invalidate("test_artifact")
+        self.wait_for_load("second", 2)
+
+    def test_own_messages_are_ignored(self) -> None:
+        """Метод для тестирования того, что процесс не сбрасывает артефакт повторно по своему сообщению."""
+
+        first = self.registries["first"].get("test_artifact")
+        self.assertEqual(first.get(), 1)
+        self.registries["first"].invalidate("test_artifact")
+        self.assertEqual(first.get(), 2)
+        time.sleep(0.1)
+        self.assertEqual(first.get(), 2)
+
+    def test_values_not_cached_without_subscription(self) -> None:
+        """Метод для тестирования отключения кэширования в памяти процесса при недоступности Redis."""
+
+        self.server.connected = False
+        self.registries["first"].bus.timeout = 0.1
+        first = self.registries["first"].get("test_artifact")
+        self.assertEqual(first.get(), 1)
+        self.assertEqual(first.get(), 2)
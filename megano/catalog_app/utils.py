@@ -1,11 +1,62 @@
+from catalog_app.documents import product_documents
 from catalog_app.models import Category, Product
-from django.db.models import Q, QuerySet
+from django.db.models import Count, Q, QuerySet, Sum
 from django_filters import BooleanFilter, CharFilter, NumberFilter
 from django_filters.rest_framework import FilterSet
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.request import Request
 from rest_framework.response import Response
 
+# Связанные объекты, которые выводит ProductListSerializer, в том числе подкатегории категории продукта
+PRODUCT_LIST_PREFETCH = [
+    "category__subcategories__products",
+    "category__subcategories__subcategories",
+    "category__subcategories__image",
+    "images",
+    "tags",
+    "reviews",
+]
+
+
+def prefetch_product_list(queryset: QuerySet, prefix: str = "") -> QuerySet:
+    """
+    Функция для загрузки связанных объектов, которые выводит ProductListSerializer, постоянным количеством запросов
+    независимо от количества продуктов. prefix - путь к продукту от модели QuerySet, например "product__".
+    """
+
+    return queryset.select_related(prefix + "category__image").prefetch_related(
+        *[prefix + lookup for lookup in PRODUCT_LIST_PREFETCH]
+    )
+
+
+def get_active_main_categories() -> QuerySet:
+    """
+    Функция для получения главных категорий, содержащих хотя бы один продукт или активную подкатегорию (подкатегорию,
+    содержащую хотя бы один продукт).
+    """
+
+    queryset = (
+        Category.objects.filter(main_category=None)
+        .prefetch_related("subcategories")
+        .prefetch_related("products")
+        .annotate(prods_count=Count("products"))
+        .annotate(subcats_count=Count("subcategories"))
+        .filter(Q(prods_count__gt=0) | Q(subcats_count__gt=0))
+    )
+    for category in queryset:
+        subcategories_products_sum = (
+            category.subcategories.all()
+            .prefetch_related("products")
+            .annotate(subcats_prods_count=Count("products"))
+            .aggregate(subcats_prods_sum=Sum("subcats_prods_count"))
+        )
+        if (
+            category.prods_count == 0
+            and subcategories_products_sum["subcats_prods_sum"] == 0
+        ):
+            queryset = queryset.exclude(id=category.id)
+    return queryset
+
 
 class ProductListFilter(FilterSet):
     """Фильтр списка продуктов. Родитель: FilterSet."""
@@ -94,6 +145,25 @@ class SaleListViewPagination(ProductListViewPagination):
     page_size = 3
 
 
+class ProductDocumentListMixin:
+    """
+    Примесь для отображения списков товаров из предварительно собранных документов продуктов. Запрос к продуктам
+    выполняется только для фильтрации, сортировки и разбиения на страницы, без предварительной загрузки
+    связанных объектов.
+    """
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        """Метод для получения списка товаров из документов продуктов."""
+
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        page = self.paginate_queryset(queryset)
+        products = page if page is not None else queryset
+        data = product_documents(products, self.get_serializer_class())
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+
 def request_handler(request: Request) -> Request:
     """Функция для приведения параметров запроса поиска товаров в соответствие полям фильтров"""
     if not "search" in request.query_params:
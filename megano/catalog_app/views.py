@@ -1,6 +1,9 @@
+import random
 from datetime import datetime
 
-from catalog_app.models import Category, Product, Review, Tag
+from catalog_app.cache import banner_pool, category_tree, tag_list
+from catalog_app.documents import product_document
+from catalog_app.models import Product, Review, Tag
 from catalog_app.serializers import (
     BannerProductListSerializer,
     CategorySerializer,
@@ -11,9 +14,11 @@ from catalog_app.serializers import (
     TagSerializer,
 )
 from catalog_app.utils import (
+    ProductDocumentListMixin,
     ProductListFilter,
     ProductListViewPagination,
     SaleListViewPagination,
+    get_active_main_categories,
     request_handler,
 )
 from django.db.models import Count, Q, QuerySet, Sum
@@ -24,6 +29,7 @@ from rest_framework.filters import OrderingFilter, SearchFilter
 from rest_framework.generics import CreateAPIView, ListAPIView, RetrieveAPIView
 from rest_framework.request import Request
 from rest_framework.response import Response
+from shop_app.models import OrderStatus
 
 
 @extend_schema(
@@ -56,39 +62,19 @@ from rest_framework.response import Response
 class CategoryView(ListAPIView):
     """Представление категорий и подкатегорий товаров. Родитель: ListAPIView."""
 
-    # Получаем главные категории, содержащие хотя бы один продукт или подкатегорию
-    main_categories = (
-        Category.objects.filter(main_category=None)
-        .prefetch_related("subcategories")
-        .prefetch_related("products")
-        .annotate(prods_count=Count("products"))
-        .annotate(subcats_count=Count("subcategories"))
-        .filter(Q(prods_count__gt=0) | Q(subcats_count__gt=0))
-    )
-
-    queryset = main_categories
     serializer_class = CategorySerializer
 
     def get_queryset(self) -> QuerySet:
         """
-        Метод для исключения из Queryset главных категорий, которые не содержат ни одного продукта и ни одной активной
-        подкатегории (подкатегории, содержащей хотя бы один продукт)
+        Метод для получения главных категорий, содержащих хотя бы один продукт или хотя бы одну активную подкатегорию.
         """
 
-        queryset = super().get_queryset()
-        for category in queryset:
-            subcategories_products_sum = (
-                category.subcategories.all()
-                .prefetch_related("products")
-                .annotate(subcats_prods_count=Count("products"))
-                .aggregate(subcats_prods_sum=Sum("subcats_prods_count"))
-            )
-            if (
-                category.prods_count == 0
-                and subcategories_products_sum["subcats_prods_sum"] == 0
-            ):
-                queryset = queryset.exclude(id=category.id)
-        return queryset
+        return get_active_main_categories()
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        """Метод для получения дерева категорий из кэша."""
+
+        return Response(category_tree.get())
 
 
 @extend_schema(tags=["tags"])
@@ -98,10 +84,15 @@ class TagsView(ListAPIView):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
 
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        """Метод для получения списка тэгов из кэша."""
+
+        return Response(tag_list.get())
+
 
 @extend_schema(tags=["catalog"])
-class ProductListView(ListAPIView):
-    """Представление списка товаров. Родитель: ListAPIView."""
+class ProductListView(ProductDocumentListMixin, ListAPIView):
+    """Представление списка товаров. Родители: ProductDocumentListMixin, ListAPIView."""
 
     queryset = (
         Product.objects.all()
@@ -129,8 +120,8 @@ class ProductListView(ListAPIView):
 
 
 @extend_schema(tags=["catalog"])
-class ProductPopularListView(ListAPIView):
-    """Представление списка топ-товаров. Родитель: ListAPIView."""
+class ProductPopularListView(ProductDocumentListMixin, ListAPIView):
+    """Представление списка топ-товаров. Родители: ProductDocumentListMixin, ListAPIView."""
 
     queryset = (
         Product.objects.filter(count__gt=0)
@@ -142,7 +133,7 @@ class ProductPopularListView(ListAPIView):
         .annotate(
             purchase_count=Sum(
                 "products_in_order_count__count_in_order",
-                filter=Q(products_in_order_count__order__status="paid"),
+                filter=Q(products_in_order_count__order__status=OrderStatus.PAID),
             )
         )
         .order_by("-rating", "-purchase_count")[:5]
@@ -151,8 +142,8 @@ class ProductPopularListView(ListAPIView):
 
 
 @extend_schema(tags=["catalog"])
-class ProductLimitedListView(ListAPIView):
-    """Представление списка товаров из серии 'ограниченный тираж'. Родитель: ListAPIView."""
+class ProductLimitedListView(ProductDocumentListMixin, ListAPIView):
+    """Представление списка товаров из серии 'ограниченный тираж'. Родители: ProductDocumentListMixin, ListAPIView."""
 
     queryset = (
         Product.objects.filter(count__gt=0)
@@ -190,20 +181,10 @@ class BannerListView(ListAPIView):
     serializer_class = BannerProductListSerializer
 
     def get_queryset(self) -> QuerySet:
-        """Метод для получения QuerySet из самых дешевых товаров в избранных категориях."""
+        """Метод для получения QuerySet из самых дешевых товаров в случайных категориях."""
 
-        categories = (
-            Category.objects.prefetch_related("products")
-            .filter(products__count__gt=0)
-            .order_by("?")[:5]
-        )
-        products_in_banners_list = [
-            Product.objects.select_related("category")
-            .filter(category=category, count__gt=0)
-            .order_by("price")[:1][0]
-            .id
-            for category in categories
-        ]
+        pool = banner_pool.get()
+        products_in_banners_list = random.sample(pool, min(len(pool), 5))
         queryset = (
             Product.objects.filter(id__in=products_in_banners_list)
             .select_related("category")
@@ -227,6 +208,14 @@ class ProductDetailView(RetrieveAPIView):
     )
     serializer_class = ProductDetailsSerializer
 
+    def retrieve(self, request: Request, *args, **kwargs) -> Response:
+        """Метод для получения детальной страницы товара из документа продукта одним запросом."""
+
+        document = product_document(kwargs["pk"], self.get_serializer_class())
+        if document is None:
+            return super().retrieve(request, *args, **kwargs)
+        return Response(document)
+
 
 @extend_schema(tags=["product"])
 class ProductReviewCreate(CreateAPIView):
@@ -0,0 +1,169 @@
+"""
+Шина сброса кэшированных артефактов между процессами.
+
+Артефакты, хранящиеся в памяти процесса (дерево категорий, список тэгов, стоимость доставки и т.д.), сбрасываются
+реестром только в том процессе, где были изменены данные. Шина публикует сбросы в канал Redis, а слушатель в каждом
+процессе gunicorn и celery сбрасывает у себя те же артефакты.
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+from typing import Callable, Hashable, Optional
+
+import redis
+from django.conf import settings
+
+from megano.cache_registry import ALL_KEYS, CacheRegistry, cache_registry
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationBus:
+    """Шина сброса артефактов через канал Redis. Родитель: object."""
+
+    def __init__(
+        self,
+        registry: CacheRegistry,
+        client_factory: Callable[[], redis.Redis],
+        channel: str,
+        timeout: float = 1.0,
+    ) -> None:
+        """
+        Метод для создания шины. client_factory - функция для создания клиента Redis, timeout - время ожидания
+        подписки на канал в секундах.
+        """
+
+        self.registry = registry
+        self.client_factory = client_factory
+        self.channel = channel
+        self.timeout = timeout
+        self._host = socket.gethostname()
+        self._client = None
+        self._pid = None
+        self._thread = None
+        self._subscribed = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def sender(self) -> str:
+        """Метод для получения идентификатора процесса, отправляющего сообщения."""
+
+        return "{host}:{pid}:{bus}".format(
+            host=self._host, pid=os.getpid(), bus=id(self)
+        )
+
+    def publish(self, name: str, keys: Optional[frozenset]) -> None:
+        """Метод для публикации сброса артефакта в канал."""
+
+        message = json.dumps(
+            {
+                "sender": self.sender,
+                "artifact": name,
+                "keys": None if keys is ALL_KEYS else list(keys),
+            }
+        )
+        try:
+            if self._client is None:
+                self._client = self.client_factory()
+            self._client.publish(self.channel, message)
+        except redis.RedisError as error:
+            logger.warning(
+                "Не удалось опубликовать сброс артефакта %s: %s", name, error
+            )
+
+    def handle(self, data: bytes) -> None:
+        """Метод для обработки сообщения о сбросе артефакта, полученного из канала."""
+
+        message = json.loads(data)
+        if message["sender"] == self.sender:
+            return
+        keys = message["keys"]
+        if keys is not ALL_KEYS:
+            keys = frozenset(self._restore_key(key) for key in keys)
+        self.registry.invalidate_local(message["artifact"], keys)
+
+    @staticmethod
+    def _restore_key(key: object) -> Hashable:
+        """Метод для восстановления ключа артефакта после преобразования в JSON."""
+
+        return tuple(key) if isinstance(key, list) else key
+
+    def ensure_listening(self) -> bool:
+        """
+        Метод для запуска слушателя канала в текущем процессе. Слушатель запускается заново после fork, так как
+        потоки родительского процесса в дочерний не переносятся. Подписка ожидается только при запуске слушателя.
+        Возвращает True, если слушатель подписан на канал.
+        """
+
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            with self._lock:
+                if self._pid != os.getpid() or not self._thread.is_alive():
+                    self._pid = os.getpid()
+                    self._client = None
+                    self._subscribed = threading.Event()
+                    self._stopped = threading.Event()
+                    self._thread = threading.Thread(
+                        target=self._listen,
+                        name="cache-invalidation-bus",
+                        daemon=True,
+                    )
+                    self._thread.start()
+            return self._subscribed.wait(self.timeout)
+        return self._subscribed.is_set()
+
+    def stop(self) -> None:
+        """Метод для остановки слушателя канала."""
+
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _listen(self) -> None:
+        """Метод слушателя канала. При потере соединения слушатель подключается к Redis заново."""
+
+        while not self._stopped.is_set():
+            try:
+                pubsub = self.client_factory().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Сбросы, опубликованные до подписки, неизвестны, поэтому значения в памяти процесса сбрасываются все
+                self.registry.invalidate_local()
+                self._subscribed.set()
+                while not self._stopped.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is None or message["type"] != "message":
+                        continue
+                    try:
+                        self.handle(message["data"])
+                    except (KeyError, ValueError):
+                        logger.exception("Некорректное сообщение шины сброса кэша")
+                pubsub.close()
+            except redis.RedisError as error:
+                self._subscribed.clear()
+                logger.warning("Потеряно соединение с шиной сброса кэша: %s", error)
+                self._stopped.wait(1.0)
+
+
+def connect_invalidation_bus(
+    registry: CacheRegistry = cache_registry,
+) -> Optional[InvalidationBus]:
+    """
+    Функция для подключения шины к реестру артефактов по настройкам проекта. Пустой адрес Redis отключает шину.
+    Слушатель запускается при первом обращении к артефакту в памяти процесса.
+    """
+
+    if not settings.CACHE_INVALIDATION_BUS_URL:
+        return None
+    if registry.bus is None:
+        registry.bus = InvalidationBus(
+            registry,
+            client_factory=lambda: redis.Redis.from_url(
+                settings.CACHE_INVALIDATION_BUS_URL, health_check_interval=30
+            ),
+            channel=settings.CACHE_INVALIDATION_BUS_CHANNEL,
+            timeout=settings.CACHE_INVALIDATION_BUS_TIMEOUT,
+        )
+    return registry.bus
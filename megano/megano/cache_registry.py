@@ -0,0 +1,472 @@
+"""
+Реестр кэшированных артефактов и их зависимостей от моделей.
+
+Каждый артефакт (дерево категорий, документ продукта, список тэгов, стоимость доставки и т.д.) объявляет, от каких
+моделей и полей он зависит. Изменения моделей через save, delete, m2m, QuerySet.update, bulk_update и bulk_create
+собираются реестром и сбрасывают ровно те артефакты, которые от них зависят. Сброс выполняется одной пачкой после
+фиксации транзакции.
+"""
+
+import logging
+import threading
+import time
+import weakref
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import partial
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+)
+
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+
+logger = logging.getLogger(__name__)
+
+# Ключи артефакта, соответствующие сбросу всех значений артефакта
+ALL_KEYS = None
+
+KeysFunction = Callable[[Iterable[models.Model]], Optional[Iterable[Hashable]]]
+
+
+class Dependency:
+    """Зависимость артефакта от модели и ее полей. Родитель: object."""
+
+    def __init__(
+        self,
+        model: Type[models.Model],
+        fields: Optional[Iterable[str]] = None,
+        exclude: Iterable[str] = (),
+        keys: Optional[KeysFunction] = None,
+    ) -> None:
+        """
+        Метод для создания зависимости. fields - поля, изменение которых сбрасывает артефакт (None - любые поля),
+        exclude - поля, изменение которых артефакт не затрагивает, keys - функция для получения ключей артефакта по
+        измененным экземплярам модели (без функции сбрасываются все значения артефакта).
+        """
+
+        self.model = model
+        self.fields = frozenset(fields) if fields is not None else None
+        self.exclude = frozenset(exclude)
+        self.keys = keys
+
+    def matches(self, changed_fields: Optional[Iterable[str]]) -> bool:
+        """Метод для проверки, затрагивают ли измененные поля артефакт. None - изменены все поля."""
+
+        if changed_fields is None:
+            return True
+        changed = set(changed_fields) - self.exclude
+        if self.fields is None:
+            return bool(changed)
+        return bool(changed & self.fields)
+
+    def resolve_keys(
+        self, instances: Optional[Iterable[models.Model]]
+    ) -> Optional[frozenset]:
+        """Метод для получения ключей артефакта, затронутых изменением экземпляров модели."""
+
+        if self.keys is None or instances is None:
+            return ALL_KEYS
+        keys = self.keys(instances)
+        return ALL_KEYS if keys is None else frozenset(keys)
+
+
+class CachedArtifact:
+    """Базовый класс кэшированного артефакта. Родитель: object."""
+
+    def __init__(self, name: str, dependencies: Iterable[Dependency]) -> None:
+        """Метод для создания артефакта с именем и списком зависимостей."""
+
+        self.name = name
+        self.dependencies = list(dependencies)
+        self.registry = None
+
+    def invalidate(self, keys: Optional[frozenset] = ALL_KEYS) -> None:
+        """Метод для сброса значений артефакта по ключам. None - сброс всех значений."""
+
+        raise NotImplementedError
+
+
+class LocalCachedArtifact(CachedArtifact):
+    """
+    Артефакт, значения которого хранятся в памяти процесса. Значения, прочитанные внутри транзакции, не кэшируются,
+    так как могут содержать незафиксированные изменения. Родитель: CachedArtifact.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        loader: Callable[..., Any],
+        dependencies: Iterable[Dependency],
+        timeout: Optional[float] = None,
+    ) -> None:
+        """Метод для создания артефакта с функцией загрузки значения и временем жизни значения в секундах."""
+
+        super().__init__(name, dependencies)
+        self.loader = loader
+        self.timeout = timeout
+        self._values: Dict[Hashable, Tuple[Optional[float], Any]] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable = None) -> Any:
+        """Метод для получения значения артефакта из памяти процесса или загрузки значения при его отсутствии."""
+
+        entry = self._values.get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires is None or expires > time.monotonic():
+                return value
+        cacheable = self.registry is None or self.registry.accepts_local_values()
+        generation = self._generation
+        value = self.loader() if key is None else self.loader(key)
+        if not cacheable or transaction.get_connection().in_atomic_block:
+            return value
+        expires = time.monotonic() + self.timeout if self.timeout else None
+        with self._lock:
+            # Значение, загруженное во время сброса артефакта, может быть устаревшим
+            if generation == self._generation:
+                self._values[key] = (expires, value)
+        return value
+
+    def invalidate(self, keys: Optional[frozenset] = ALL_KEYS) -> None:
+        """Метод для удаления значений артефакта из памяти процесса."""
+
+        with self._lock:
+            self._generation += 1
+            if keys is ALL_KEYS:
+                self._values.clear()
+            else:
+                for key in keys:
+                    self._values.pop(key, None)
+
+
+class CallbackArtifact(CachedArtifact):
+    """
+    Артефакт, хранящийся вне памяти процесса (таблица документов, кэш nginx). Сброс выполняется функцией обратного
+    вызова. Родитель: CachedArtifact.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        callback: Callable[[Optional[frozenset]], None],
+        dependencies: Iterable[Dependency],
+    ) -> None:
+        """Метод для создания артефакта с функцией сброса значений."""
+
+        super().__init__(name, dependencies)
+        self.callback = callback
+
+    def invalidate(self, keys: Optional[frozenset] = ALL_KEYS) -> None:
+        """Метод для сброса значений артефакта функцией обратного вызова."""
+
+        self.callback(keys)
+
+
+class CacheRegistry:
+    """Реестр кэшированных артефактов. Родитель: object."""
+
+    def __init__(self) -> None:
+        """Метод для создания пустого реестра."""
+
+        self._artifacts: Dict[str, CachedArtifact] = {}
+        self._dependencies: Dict[
+            Type[models.Model], List[Tuple[CachedArtifact, Dependency]]
+        ] = defaultdict(list)
+        self._m2m_fields: Dict[Type[models.Model], Tuple[Type[models.Model], str]] = {}
+        self._local = threading.local()
+        # Шина для сброса артефактов в памяти других процессов (megano.cache_bus.InvalidationBus)
+        self.bus = None
+
+    def register(self, artifact: CachedArtifact) -> CachedArtifact:
+        """Метод для регистрации артефакта и подключения обработчиков сигналов моделей, от которых он зависит."""
+
+        self._artifacts[artifact.name] = artifact
+        artifact.registry = self
+        for dependency in artifact.dependencies:
+            self._dependencies[dependency.model].append((artifact, dependency))
+            self._connect(dependency.model)
+        return artifact
+
+    def unregister(self, name: str) -> None:
+        """Метод для удаления артефакта из реестра."""
+
+        artifact = self._artifacts.pop(name)
+        for model, dependencies in self._dependencies.items():
+            self._dependencies[model] = [
+                item for item in dependencies if item[0] is not artifact
+            ]
+
+    def get(self, name: str) -> CachedArtifact:
+        """Метод для получения артефакта по имени."""
+
+        return self._artifacts[name]
+
+    def _connect(self, model: Type[models.Model]) -> None:
+        """Метод для подключения обработчиков сигналов модели."""
+
+        uid = "cache_registry_{id}".format(id=id(self))
+        post_save.connect(self._on_save, sender=model, weak=False, dispatch_uid=uid)
+        pre_delete.connect(self._on_delete, sender=model, weak=False, dispatch_uid=uid)
+        for field in model._meta.many_to_many:
+            through = field.remote_field.through
+            self._m2m_fields[through] = (model, field.name)
+            m2m_changed.connect(
+                self._on_m2m_changed, sender=through, weak=False, dispatch_uid=uid
+            )
+
+    def _on_save(
+        self,
+        sender: Type[models.Model],
+        instance: models.Model,
+        update_fields: Optional[frozenset] = None,
+        **kwargs
+    ) -> None:
+        """Метод-обработчик сохранения экземпляра модели."""
+
+        self.notify(sender, [instance], update_fields)
+
+    def _on_delete(
+        self, sender: Type[models.Model], instance: models.Model, **kwargs
+    ) -> None:
+        """Метод-обработчик удаления экземпляра модели. Ключи вычисляются до удаления связанных объектов."""
+
+        self.notify(sender, [instance], None)
+
+    def _on_m2m_changed(
+        self,
+        sender: Type[models.Model],
+        instance: models.Model,
+        action: str,
+        reverse: bool,
+        pk_set: Optional[set],
+        **kwargs
+    ) -> None:
+        """Метод-обработчик изменения связи многие-ко-многим."""
+
+        if not action.startswith("post_"):
+            return
+        model, field_name = self._m2m_fields[sender]
+        if not reverse:
+            instances = [instance]
+        elif pk_set is not None:
+            instances = [model(pk=pk) for pk in pk_set]
+        else:
+            instances = None
+        self.notify(model, instances, [field_name])
+
+    def _matching(
+        self, model: Type[models.Model], fields: Optional[frozenset]
+    ) -> List[Tuple[CachedArtifact, Dependency]]:
+        """Метод для получения артефактов, которые затрагивает изменение полей модели. None - изменены все поля."""
+
+        return [
+            (artifact, dependency)
+            for artifact, dependency in self._dependencies.get(model, ())
+            if dependency.matches(fields)
+        ]
+
+    @staticmethod
+    def _field_names(model: Type[models.Model], fields: Iterable[str]) -> frozenset:
+        """Метод для приведения полей модели к их названиям: update(category_id=...) изменяет поле category."""
+
+        return frozenset(model._meta.get_field(field).name for field in fields)
+
+    def tracks(self, model: Type[models.Model], fields: Iterable[str]) -> bool:
+        """Метод для проверки, зависит ли какой-либо артефакт от изменяемых полей модели."""
+
+        return bool(self._matching(model, self._field_names(model, fields)))
+
+    def notify(
+        self,
+        model: Type[models.Model],
+        instances: Optional[Iterable[models.Model]],
+        fields: Optional[Iterable[str]] = None,
+    ) -> None:
+        """
+        Метод для регистрации изменения экземпляров модели. instances - измененные экземпляры (None - неизвестны),
+        fields - измененные поля (None - все поля). Сброс артефактов выполняется после фиксации транзакции.
+        """
+
+        if getattr(self._local, "suppressed", False):
+            return
+        fields = None if fields is None else self._field_names(model, fields)
+        matched = self._matching(model, fields)
+        if not matched:
+            return
+        with self._batch() as pending:
+            for artifact, dependency in matched:
+                self._merge(pending, artifact.name, dependency.resolve_keys(instances))
+
+    @staticmethod
+    def _merge(
+        pending: Dict[str, Optional[frozenset]], name: str, keys: Optional[frozenset]
+    ) -> None:
+        """Метод для объединения ключей артефакта с уже накопленными ключами."""
+
+        current = pending.get(name, frozenset())
+        if current is ALL_KEYS or keys is ALL_KEYS:
+            pending[name] = ALL_KEYS
+        else:
+            pending[name] = current | keys
+
+    @contextmanager
+    def _batch(self) -> Iterator[Dict[str, Optional[frozenset]]]:
+        """
+        Метод для получения накопленных в текущей транзакции (точке сохранения) сбросов артефактов. Сброс
+        планируется один раз на точку сохранения: накопленные сбросы хранятся по кортежу id точек сохранения и
+        удаляются при выполнении сброса после фиксации. Реестр хранит только слабую ссылку на запланированный сброс,
+        поэтому после отката транзакции или точки сохранения Django отбрасывает сброс вместе с накопленными
+        значениями, и накопление начинается заново. Вне транзакции сброс выполняется сразу.
+        """
+
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            pending = {}
+            yield pending
+            self.flush(pending)
+            return
+        batches = self._local.__dict__.setdefault("batches", {})
+        savepoint_ids = tuple(connection.savepoint_ids)
+        reference = batches.get(savepoint_ids)
+        callback = reference() if reference is not None else None
+        if callback is None:
+            callback = partial(self._flush_batch, savepoint_ids, {})
+            batches[savepoint_ids] = weakref.ref(callback)
+            transaction.on_commit(callback)
+        yield callback.args[1]
+
+    def _flush_batch(
+        self, savepoint_ids: Tuple, pending: Dict[str, Optional[frozenset]]
+    ) -> None:
+        """Метод для сброса артефактов, накопленных в точке сохранения, после фиксации транзакции."""
+
+        batches = self._local.__dict__.get("batches", {})
+        reference = batches.get(savepoint_ids)
+        callback = reference() if reference is not None else None
+        if callback is None or callback.args[1] is pending:
+            batches.pop(savepoint_ids, None)
+        self.flush(pending)
+
+    def flush(self, pending: Dict[str, Optional[frozenset]]) -> None:
+        """Метод для сброса накопленных артефактов одной пачкой."""
+
+        for name, keys in list(pending.items()):
+            artifact = self._artifacts.get(name)
+            if artifact is None or keys is not ALL_KEYS and not keys:
+                continue
+            try:
+                artifact.invalidate(keys)
+            except Exception:
+                logger.exception("Не удалось сбросить артефакт %s", name)
+            if self.bus is not None and isinstance(artifact, LocalCachedArtifact):
+                self.bus.publish(name, keys)
+        pending.clear()
+
+    def invalidate_local(
+        self, name: Optional[str] = None, keys: Optional[frozenset] = ALL_KEYS
+    ) -> None:
+        """
+        Метод для немедленного сброса артефактов в памяти текущего процесса по сообщению шины. Без имени
+        сбрасываются все такие артефакты.
+        """
+
+        if name is None:
+            artifacts = list(self._artifacts.values())
+        else:
+            artifacts = [self._artifacts[name]] if name in self._artifacts else []
+        for artifact in artifacts:
+            if isinstance(artifact, LocalCachedArtifact):
+                artifact.invalidate(keys)
+
+    def accepts_local_values(self) -> bool:
+        """
+        Метод для проверки, можно ли сохранять значения артефактов в памяти процесса. Пока слушатель шины не подписан
+        на канал, сбросы из других процессов могут быть пропущены, поэтому значения не сохраняются.
+        """
+
+        return self.bus is None or self.bus.ensure_listening()
+
+    def invalidate(
+        self, name: str, keys: Optional[Iterable[Hashable]] = ALL_KEYS
+    ) -> None:
+        """Метод для явного сброса артефакта после фиксации транзакции."""
+
+        keys = ALL_KEYS if keys is ALL_KEYS else frozenset(keys)
+        with self._batch() as pending:
+            self._merge(pending, name, keys)
+
+    @contextmanager
+    def suppressed(self) -> Iterator[None]:
+        """Метод для временного отключения регистрации изменений в текущем потоке."""
+
+        previous = getattr(self._local, "suppressed", False)
+        self._local.suppressed = True
+        try:
+            yield
+        finally:
+            self._local.suppressed = previous
+
+
+cache_registry = CacheRegistry()
+
+
+class InvalidatingQuerySet(models.QuerySet):
+    """
+    QuerySet, сообщающий реестру кэшированных артефактов об изменениях через update, bulk_update и bulk_create,
+    для которых Django не отправляет сигналы. Родитель: QuerySet.
+    """
+
+    def update(self, **kwargs) -> int:
+        """
+        Метод для обновления записей с регистрацией изменения полей. Ключи артефактов вычисляются по записям до и
+        после обновления, так как они могут зависеть от старых и новых значений полей (например, от старой и новой
+        категории продукта). Если от изменяемых полей не зависит ни один артефакт, обновляемые записи не загружаются.
+        """
+
+        if not cache_registry.tracks(self.model, kwargs):
+            with cache_registry.suppressed():
+                return super().update(**kwargs)
+        instances = list(self.all())
+        cache_registry.notify(self.model, instances, kwargs.keys())
+        with cache_registry.suppressed():
+            updated = super().update(**kwargs)
+        cache_registry.notify(
+            self.model,
+            self.model._base_manager.filter(
+                pk__in=[instance.pk for instance in instances]
+            ),
+            kwargs.keys(),
+        )
+        return updated
+
+    def bulk_update(
+        self,
+        objs: Iterable[models.Model],
+        fields: Iterable[str],
+        batch_size: int = None,
+    ) -> int:
+        """Метод для пакетного обновления записей с регистрацией изменения полей."""
+
+        objs = list(objs)
+        fields = list(fields)
+        cache_registry.notify(self.model, objs, fields)
+        with cache_registry.suppressed():
+            return super().bulk_update(objs, fields, batch_size=batch_size)
+
+    def bulk_create(self, objs: Iterable[models.Model], *args, **kwargs) -> list:
+        """Метод для пакетного создания записей с регистрацией изменения."""
+
+        objs = super().bulk_create(objs, *args, **kwargs)
+        cache_registry.notify(self.model, objs, None)
+        return objs
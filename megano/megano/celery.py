@@ -1,6 +1,7 @@
 import os
 
 from celery import Celery
+from celery.signals import worker_init, worker_process_init
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "megano.settings")
 
@@ -9,3 +10,22 @@ app = Celery("megano")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 
 app.autodiscover_tasks()
+
+
+@worker_init.connect
+def connect_cache_invalidation_bus(**kwargs) -> None:
+    """Функция для подключения шины сброса кэша при запуске воркера celery."""
+
+    from megano.cache_bus import connect_invalidation_bus
+
+    connect_invalidation_bus()
+
+
+@worker_process_init.connect
+def start_cache_invalidation_listener(**kwargs) -> None:
+    """Функция для запуска слушателя шины сброса кэша в дочернем процессе воркера celery."""
+
+    from megano.cache_registry import cache_registry
+
+    if cache_registry.bus is not None:
+        cache_registry.bus.ensure_listening()
@@ -174,6 +174,122 @@ SPECTACULAR_SETTINGS = {
 
 CELERY_BROKER_URL = "redis://redis:6379/0"
 CELERY_RESULT_BACKEND = "redis://redis:6379/0"
+CELERY_BEAT_SCHEDULE = {
+    "index-product-documents": {
+        "task": "catalog_app.tasks.index_product_documents",
+        "schedule": 10.0,
+    },
+    "release-basket-reservations": {
+        "task": "shop_app.tasks.release_basket_reservations",
+        "schedule": 60.0,
+    },
+    "write-flash-sale-claims": {
+        "task": "shop_app.tasks.write_flash_sale_claims",
+        "schedule": 1.0,
+    },
+    "reconcile-flash-sale-stock": {
+        "task": "shop_app.tasks.reconcile_flash_sale_stock",
+        "schedule": 60.0,
+    },
+    "collect-basket-garbage": {
+        "task": "shop_app.tasks.collect_basket_garbage",
+        "schedule": 60.0 * 60,
+    },
+    "update-daily-sales": {
+        "task": "shop_app.tasks.update_daily_sales",
+        "schedule": 60.0,
+    },
+    "reconcile-payments": {
+        "task": "shop_app.tasks.reconcile_payments",
+        "schedule": 60.0,
+    },
+}
+
+# Время резерва товара, добавленного в корзину, в секундах и размер пачки строк при возврате товаров на склад
+BASKET_RESERVATION_TTL = 30 * 60
+BASKET_RESERVATION_RELEASE_BATCH = 500
+
+# Возраст в секундах, после которого корзина анонимного пользователя без добавлений товаров считается брошенной,
+# размер пачки и пауза в секундах между пачками при удалении брошенных корзин и сессий с истекшим сроком действия
+BASKET_GC_AGE = 14 * 24 * 60 * 60
+BASKET_GC_BATCH = 1000
+BASKET_GC_PAUSE = 0.1
+
+# Хранилище корзин анонимных пользователей: "database" - корзина в БД, "cookie" - корзина в подписанном cookie,
+# которая записывается в БД при входе в учетную запись или оформлении заказа. Для cookie заданы название, время
+# жизни в секундах и наибольшее количество разных товаров в корзине
+BASKET_ANONYMOUS_STORAGE = getenv("BASKET_ANONYMOUS_STORAGE", "database")
+BASKET_COOKIE_NAME = "basket"
+BASKET_COOKIE_MAX_AGE = 14 * 24 * 60 * 60
+BASKET_COOKIE_MAX_LINES = 50
+
+# Адрес Redis для остатков товаров флеш-распродажи (пустое значение отключает флеш-распродажи), время ожидания
+# записи заявок корзины перед оформлением заказа и интервал повтора оформления в секундах
+FLASH_SALE_REDIS_URL = getenv("FLASH_SALE_REDIS_URL", "")
+FLASH_SALE_WRITE_BATCH = 500
+FLASH_SALE_CHECKOUT_WAIT = 5
+FLASH_SALE_CHECKOUT_RETRY = 2
+
+# Адрес Redis для комнаты ожидания оформления заказов (пустое значение отключает комнату ожидания), количество
+# пользователей, одновременно допускаемых к оформлению в каждой комнате, и время допуска и ожидания в секундах
+WAITING_ROOM_REDIS_URL = getenv("WAITING_ROOM_REDIS_URL", "")
+WAITING_ROOMS = {"checkout": 200, "flash_sale": 50}
+WAITING_ROOM_LEASE = 120
+WAITING_ROOM_QUEUE_TIMEOUT = 30
+WAITING_ROOM_POLL_INTERVAL = 2
+
+# Адрес Redis для событий оплаты заказов (пустое значение отключает публикацию событий), время жизни потока событий,
+# интервал комментариев в потоке и интервал переподключения клиента в секундах
+PAYMENT_EVENTS_REDIS_URL = getenv("PAYMENT_EVENTS_REDIS_URL", "")
+PAYMENT_EVENTS_TIMEOUT = 120
+PAYMENT_EVENTS_HEARTBEAT = 15
+PAYMENT_EVENTS_RETRY = 2
+
+# Адрес HTTP API платежного шлюза (пустое значение включает симулятор платежной системы в процессе воркера celery),
+# время ожидания ответа шлюза в секундах, количество попыток и начальная пауза между попытками в секундах
+PAYMENT_GATEWAY_URL = getenv("PAYMENT_GATEWAY_URL", "")
+PAYMENT_GATEWAY_TIMEOUT = 10
+PAYMENT_GATEWAY_ATTEMPTS = 3
+PAYMENT_GATEWAY_BACKOFF = 0.5
+
+# Возраст в секундах, после которого оплата в статусе "pending" сверяется с платежным шлюзом, и размер пачки оплат
+PAYMENT_RECONCILE_AGE = 10 * 60
+PAYMENT_RECONCILE_BATCH = 100
+
+# Адрес, на который платежный шлюз отправляет уведомления о результате оплаты (пустое значение - результат в ответе
+# шлюза), и ключ подписи уведомлений, отдельный от SECRET_KEY (пустое значение - уведомления отклоняются)
+PAYMENT_WEBHOOK_URL = getenv("PAYMENT_WEBHOOK_URL", "")
+PAYMENT_WEBHOOK_SECRET = getenv("PAYMENT_WEBHOOK_SECRET", "")
+
+# Настройки симулятора платежной системы в процессе воркера: задержка и ее разброс в секундах, доли сбоев, отказов
+# и таймаутов, наибольшее количество списаний в секунду (0 - без ограничения)
+PAYMENT_SIMULATOR = {
+    "latency": 3,
+    "jitter": 0,
+    "failure_rate": 0,
+    "decline_rate": 0,
+    "timeout_rate": 0,
+    "rate_limit": 0,
+}
+
+# Время хранения ключа идемпотентности запросов оформления заказа и оплаты с ответом, наибольшее время выполнения
+# запроса, после которого ключ занимается заново, и интервал повтора запроса во время выполнения в секундах
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+IDEMPOTENCY_KEY_LOCK = 60
+IDEMPOTENCY_KEY_RETRY = 1
+
+# Задержка в секундах, после которой оплаты учитываются в продажах по дням, и размер пачки оплат
+SALES_ROLLUP_LAG = 30
+SALES_ROLLUP_BATCH = 500
+
+# Адрес внутреннего сервера nginx для обновления микрокэша каталога (пустое значение отключает обновление)
+NGINX_CACHE_PURGE_URL = getenv("NGINX_CACHE_PURGE_URL", "")
+NGINX_CACHE_PURGE_TIMEOUT = 2
+
+# Адрес Redis для шины сброса кэша в памяти процессов (пустое значение отключает шину)
+CACHE_INVALIDATION_BUS_URL = getenv("CACHE_INVALIDATION_BUS_URL", "")
+CACHE_INVALIDATION_BUS_CHANNEL = "megano:cache-invalidation"
+CACHE_INVALIDATION_BUS_TIMEOUT = 1.0
 
 
 APPEND_SLASH = False
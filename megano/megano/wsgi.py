@@ -11,6 +11,10 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from megano.cache_bus import connect_invalidation_bus
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "megano.settings")
 
 application = get_wsgi_application()
+
+connect_invalidation_bus()
@@ -1,6 +1,16 @@
 from django.contrib import admin
 from django.http import HttpRequest
-from shop_app.models import Basket, DeliveryPrice, ExpressDeliveryPrice, Order
+from shop_app.models import (
+    Basket,
+    CategoryDailySales,
+    DeliveryDailySales,
+    DeliveryPrice,
+    ExpressDeliveryPrice,
+    Order,
+    OrderStatusHistory,
+    Payment,
+    ProductDailySales,
+)
 
 
 class BasketAdmin(admin.ModelAdmin):
@@ -9,10 +19,32 @@ class BasketAdmin(admin.ModelAdmin):
     list_display = "pk", "user"
 
 
+class OrderStatusHistoryInline(admin.TabularInline):
+    """Класс для отображения истории статусов на странице заказа. Родитель: TabularInline."""
+
+    model = OrderStatusHistory
+    fields = "from_status", "to_status", "changed_at"
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
 class OrderAdmin(admin.ModelAdmin):
-    """Класс для администрирования модели заказа. Родитель: ModelAdmin."""
+    """
+    Класс для администрирования модели заказа. Статус меняется только переходами, поэтому в админке он доступен
+    только для чтения. Родитель: ModelAdmin.
+    """
+
+    list_display = "pk", "totalCost", "status"
+    list_filter = ("status",)
+    readonly_fields = ("status",)
+    inlines = [OrderStatusHistoryInline]
 
-    list_display = "pk", "totalCost"
+
+class PaymentAdmin(admin.ModelAdmin):
+    """Класс для администрирования модели оплаты заказа. Родитель: ModelAdmin."""
+
+    list_display = "pk", "order", "status", "created_at"
 
 
 class DeliveryPriceAdmin(admin.ModelAdmin):
@@ -37,10 +69,67 @@ class ExpressDeliveryPriceAdmin(admin.ModelAdmin):
         return not ExpressDeliveryPrice.objects.exists()
 
 
+class DailySalesAdmin(admin.ModelAdmin):
+    """
+    Класс для отображения продаж по дням. Продажи записываются только задачей celery, поэтому в админке они
+    доступны только для чтения. Родитель: ModelAdmin.
+    """
+
+    date_hierarchy = "day"
+    ordering = "-day", "-revenue"
+    list_per_page = 50
+
+    def has_add_permission(self, request: HttpRequest) -> bool:
+        """Метод для обеспечения невозможности создания продаж в админке."""
+
+        return False
+
+    def has_change_permission(self, request: HttpRequest, obj=None) -> bool:
+        """Метод для обеспечения невозможности изменения продаж в админке."""
+
+        return False
+
+    def has_delete_permission(self, request: HttpRequest, obj=None) -> bool:
+        """Метод для обеспечения невозможности удаления продаж в админке."""
+
+        return False
+
+
+class ProductDailySalesAdmin(DailySalesAdmin):
+    """Класс для отображения продаж товаров по дням. Родитель: DailySalesAdmin."""
+
+    list_display = "day", "product", "units", "revenue", "orders"
+    list_select_related = ("product",)
+    search_fields = ("product__title",)
+
+
+class CategoryDailySalesAdmin(DailySalesAdmin):
+    """Класс для отображения продаж категорий товаров по дням. Родитель: DailySalesAdmin."""
+
+    list_display = "day", "category", "units", "revenue", "orders"
+    list_select_related = ("category",)
+    list_filter = ("category",)
+
+
+class DeliveryDailySalesAdmin(DailySalesAdmin):
+    """Класс для отображения продаж по типам доставки по дням. Родитель: DailySalesAdmin."""
+
+    list_display = "day", "deliveryType", "units", "revenue", "orders"
+    list_filter = ("deliveryType",)
+
+
 admin.site.register(Basket, BasketAdmin)
 
 admin.site.register(Order, OrderAdmin)
 
+admin.site.register(Payment, PaymentAdmin)
+
 admin.site.register(DeliveryPrice, DeliveryPriceAdmin)
 
 admin.site.register(ExpressDeliveryPrice, ExpressDeliveryPriceAdmin)
+
+admin.site.register(ProductDailySales, ProductDailySalesAdmin)
+
+admin.site.register(CategoryDailySales, CategoryDailySalesAdmin)
+
+admin.site.register(DeliveryDailySales, DeliveryDailySalesAdmin)
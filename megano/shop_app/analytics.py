@@ -0,0 +1,249 @@
+"""
+Продажи по дням.
+
+Выручка и количество проданных товаров по дням в разрезе товаров, категорий и типов доставки хранятся в отдельных
+таблицах. Задача celery периодически добавляет в них заказы, оплаченные после отметки SalesWatermark - id последней
+учтенной записи истории статусов о переходе заказа в статус "paid". Заказ оплачивается один раз, поэтому каждый
+заказ учитывается в продажах ровно один раз. Отчеты читают только таблицы продаж по дням и не нагружают таблицы
+заказов, с которыми работает оформление заказов.
+
+Записи истории с меньшим id могут быть зафиксированы позже записей с большим id, поэтому обрабатываются только
+записи старше SALES_ROLLUP_LAG секунд.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, Optional, Tuple, Type
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from shop_app.models import (
+    CategoryDailySales,
+    DailySales,
+    DeliveryDailySales,
+    Order,
+    OrderStatus,
+    OrderStatusHistory,
+    ProductDailySales,
+    ProductsInOrderCount,
+    SalesWatermark,
+)
+from shop_app.pricing import order_totals
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "sales"
+
+# Показатели продаж за день по ключу строки таблицы продаж: количество товаров, выручка и id заказов
+Rollup = Dict[Tuple, Dict]
+
+
+def empty_sales() -> Dict:
+    """Функция для получения пустых показателей продаж за день."""
+
+    return {"units": 0, "revenue": Decimal(0), "orders": set()}
+
+
+def collect_sales(paid_orders: Dict[int, date]) -> Dict[Type[DailySales], Rollup]:
+    """
+    Функция для подсчета продаж оплаченных заказов по дням в разрезе товаров, категорий и типов доставки. paid_orders -
+    день оплаты по id заказа. Строки и заказы загружаются двумя запросами. Выручка строки считается по цене снимка с
+    учетом скидки, для строк без снимка - по текущей цене товара. Выручка заказа без итоговой стоимости, например
+    заказа, оплаченного до ее сохранения, пересчитывается order_totals одним запросом на пачку.
+    """
+
+    sales = {
+        ProductDailySales: defaultdict(empty_sales),
+        CategoryDailySales: defaultdict(empty_sales),
+        DeliveryDailySales: defaultdict(empty_sales),
+    }
+    lines = ProductsInOrderCount.objects.filter(
+        order__in=list(paid_orders)
+    ).values_list(
+        "order",
+        "product",
+        "product__category",
+        "count_in_order",
+        Coalesce("salePrice", "price", "product__price"),
+    )
+    units_by_order = defaultdict(int)
+    for order_id, product_id, category_id, count, price in lines:
+        day = paid_orders[order_id]
+        for model, key in (
+            (ProductDailySales, (day, product_id)),
+            (CategoryDailySales, (day, category_id)),
+        ):
+            row = sales[model][key]
+            row["units"] += count
+            row["revenue"] += price * count
+            row["orders"].add(order_id)
+        units_by_order[order_id] += count
+    orders = Order.objects.filter(pk__in=list(paid_orders)).values_list(
+        "pk", "deliveryType", "totalCost"
+    )
+    unpriced = [order_id for order_id, _, total_cost in orders if total_cost is None]
+    repriced = order_totals(unpriced) if unpriced else {}
+    for order_id, delivery_type, total_cost in orders:
+        if total_cost is None:
+            total_cost = repriced.get(order_id, {}).get("total", 0)
+        row = sales[DeliveryDailySales][(paid_orders[order_id], delivery_type)]
+        row["units"] += units_by_order[order_id]
+        row["revenue"] += total_cost
+        row["orders"].add(order_id)
+    return sales
+
+
+def merge_sales(model: Type[DailySales], key_field: str, rollup: Rollup) -> int:
+    """
+    Функция для добавления продаж к строкам таблицы продаж по дням. Существующие строки загружаются одним запросом и
+    сохраняются bulk_update, новые строки создаются bulk_create. Возвращает количество измененных строк.
+    """
+
+    if not rollup:
+        return 0
+    existing = {
+        (row.day, getattr(row, key_field)): row
+        for row in model.objects.filter(
+            day__in={day for day, _ in rollup},
+            **{key_field + "__in": {key for _, key in rollup}}
+        )
+    }
+    created, updated = [], []
+    for (day, key), sales in rollup.items():
+        row = existing.get((day, key))
+        if row is None:
+            row = model(day=day, **{key_field: key})
+            created.append(row)
+        else:
+            updated.append(row)
+        row.units += sales["units"]
+        row.revenue += sales["revenue"]
+        row.orders += len(sales["orders"])
+    model.objects.bulk_create(created)
+    model.objects.bulk_update(updated, ["units", "revenue", "orders"])
+    return len(rollup)
+
+
+def apply_sales(paid_orders: Dict[int, date]) -> None:
+    """Функция для добавления продаж оплаченных заказов во все таблицы продаж по дням."""
+
+    sales = collect_sales(paid_orders)
+    merge_sales(ProductDailySales, "product_id", sales[ProductDailySales])
+    merge_sales(CategoryDailySales, "category_id", sales[CategoryDailySales])
+    merge_sales(DeliveryDailySales, "deliveryType", sales[DeliveryDailySales])
+
+
+def lock_watermark() -> SalesWatermark:
+    """
+    Функция для получения отметки продаж с блокировкой строки. Блокировка не дает параллельным запускам обработать
+    одни и те же оплаты дважды. Вызывается в транзакции.
+    """
+
+    SalesWatermark.objects.get_or_create(name=WATERMARK_NAME)
+    return SalesWatermark.objects.select_for_update().get(name=WATERMARK_NAME)
+
+
+def update_sales_rollups(batch_size: int = 500) -> Dict[str, int]:
+    """
+    Функция для добавления в продажи по дням заказов, оплаченных после отметки. Оплаты обрабатываются пачками в
+    порядке id записи истории, каждая пачка вместе с отметкой записывается отдельной транзакцией. Возвращает
+    количество учтенных заказов и пачек.
+    """
+
+    metrics = {"orders": 0, "batches": 0}
+    cutoff = timezone.now() - timedelta(seconds=settings.SALES_ROLLUP_LAG)
+    while True:
+        with transaction.atomic():
+            watermark = lock_watermark()
+            events = list(
+                OrderStatusHistory.objects.filter(
+                    pk__gt=watermark.position,
+                    to_status=OrderStatus.PAID,
+                    changed_at__lt=cutoff,
+                )
+                .order_by("pk")
+                .values_list("pk", "order", "changed_at")[:batch_size]
+            )
+            if not events:
+                break
+            apply_sales(
+                {
+                    order_id: timezone.localdate(changed_at)
+                    for _, order_id, changed_at in events
+                }
+            )
+            watermark.position = events[-1][0]
+            watermark.save(update_fields=["position", "updated_at"])
+        metrics["orders"] += len(events)
+        metrics["batches"] += 1
+        if len(events) < batch_size:
+            break
+    if metrics["orders"]:
+        logger.info(
+            "Учтено оплаченных заказов в продажах по дням: %(orders)s, пачек: %(batches)s",
+            metrics,
+        )
+    return metrics
+
+
+def rebuild_sales_rollups(batch_size: int = 500) -> Dict[str, int]:
+    """
+    Функция для пересчета продаж по дням с начала. Заказы, оплаченные до появления истории статусов, учитываются
+    днем создания заказа пачками по batch_size в порядке id заказа, следующая пачка выбирается по id последнего
+    заказа пачки. Остальные заказы учитываются по истории статусов. Возвращает количество учтенных заказов и пачек.
+    """
+
+    legacy = {"orders": 0, "batches": 0}
+    with transaction.atomic():
+        watermark = lock_watermark()
+        for model in (ProductDailySales, CategoryDailySales, DeliveryDailySales):
+            model.objects.all().delete()
+        legacy_orders = (
+            Order.objects.filter(status=OrderStatus.PAID)
+            .exclude(status_history__to_status=OrderStatus.PAID)
+            .order_by("pk")
+        )
+        last_id = 0
+        while True:
+            batch = list(
+                legacy_orders.filter(pk__gt=last_id).values_list("pk", "createdAt")[
+                    :batch_size
+                ]
+            )
+            if not batch:
+                break
+            apply_sales(
+                {order_id: timezone.localdate(created) for order_id, created in batch}
+            )
+            last_id = batch[-1][0]
+            legacy["orders"] += len(batch)
+            legacy["batches"] += 1
+            if len(batch) < batch_size:
+                break
+        watermark.position = 0
+        watermark.save(update_fields=["position", "updated_at"])
+    metrics = update_sales_rollups(batch_size)
+    metrics["orders"] += legacy["orders"]
+    metrics["batches"] += legacy["batches"]
+    return metrics
+
+
+def sales_between(
+    model: Type[DailySales],
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> QuerySet:
+    """Функция для получения продаж по дням за период. Пустая граница периода не ограничивает период."""
+
+    sales = model.objects.all()
+    if date_from is not None:
+        sales = sales.filter(day__gte=date_from)
+    if date_to is not None:
+        sales = sales.filter(day__lte=date_to)
+    return sales.order_by("-day", "-revenue", "pk")
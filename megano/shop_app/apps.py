@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ShopAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "shop_app"
+
+    def ready(self) -> None:
+        """Метод для регистрации кэшированных артефактов приложения."""
+
+        import shop_app.cache  # noqa: F401
@@ -0,0 +1,43 @@
+from typing import Iterable, List, Optional, Tuple
+
+from catalog_app.models import Product
+from shop_app.flash_sale import sync_flash_sale_products
+from shop_app.models import DeliveryPrice, ExpressDeliveryPrice
+
+from megano.cache_registry import (
+    CallbackArtifact,
+    Dependency,
+    LocalCachedArtifact,
+    cache_registry,
+)
+
+
+def load_delivery_prices() -> (
+    Tuple[Optional[DeliveryPrice], Optional[ExpressDeliveryPrice]]
+):
+    """Функция для загрузки стоимости обычной и экспресс доставки."""
+
+    return DeliveryPrice.objects.first(), ExpressDeliveryPrice.objects.first()
+
+
+def product_pks(products: Iterable[Product]) -> List[int]:
+    """Функция для получения id измененных продуктов."""
+
+    return [product.pk for product in products]
+
+
+delivery_prices = cache_registry.register(
+    LocalCachedArtifact(
+        "delivery_prices",
+        loader=load_delivery_prices,
+        dependencies=[Dependency(DeliveryPrice), Dependency(ExpressDeliveryPrice)],
+    )
+)
+
+flash_sale_stock = cache_registry.register(
+    CallbackArtifact(
+        "flash_sale_stock",
+        callback=sync_flash_sale_products,
+        dependencies=[Dependency(Product, fields=["flashSale"], keys=product_pks)],
+    )
+)
@@ -0,0 +1,136 @@
+import logging
+import time
+from datetime import timedelta
+from typing import Dict
+
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+from shop_app.models import Basket, IdempotencyKey, ProductsInBasketCount
+from shop_app.reservations import return_to_stock
+
+logger = logging.getLogger(__name__)
+
+
+def collect_abandoned_baskets(
+    age: float, batch_size: int = 1000, pause: float = 0.1
+) -> Dict[str, int]:
+    """
+    Функция для удаления брошенных корзин анонимных пользователей. Корзина считается брошенной, если она создана
+    раньше, чем age секунд назад, и ни один товар в нее не добавлялся за это время. Корзины удаляются пачками в
+    порядке id с паузой pause секунд между пачками. Товары из строк корзин возвращаются на склад одним запросом на
+    пачку. Заблокированные параллельными запросами корзины пропускаются до следующего запуска. Возвращает
+    количество удаленных корзин и строк корзин и количество товаров, возвращенных на склад.
+    """
+
+    cutoff = timezone.now() - timedelta(seconds=age)
+    metrics = {"baskets": 0, "lines": 0, "returned": 0}
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            basket_pks = list(
+                Basket.objects.filter(
+                    user__isnull=True, created_at__lt=cutoff, pk__gt=last_pk
+                )
+                .exclude(products_in_basket_count__reserved_until__gte=cutoff)
+                .select_for_update(skip_locked=True)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not basket_pks:
+                break
+            lines = ProductsInBasketCount.objects.filter(
+                basket__in=basket_pks, count_in_basket__gt=0
+            )
+            returned = lines.aggregate(returned=Sum("count_in_basket"))["returned"]
+            if returned:
+                return_to_stock(lines)
+            _, deleted = Basket.objects.filter(pk__in=basket_pks).delete()
+            metrics["baskets"] += deleted.get(Basket._meta.label, 0)
+            metrics["lines"] += deleted.get(ProductsInBasketCount._meta.label, 0)
+            metrics["returned"] += returned or 0
+        last_pk = basket_pks[-1]
+        if len(basket_pks) < batch_size:
+            break
+        time.sleep(pause)
+    return metrics
+
+
+def collect_expired_sessions(batch_size: int = 1000, pause: float = 0.1) -> int:
+    """
+    Функция для удаления сессий с истекшим сроком действия пачками в порядке срока действия с паузой pause секунд
+    между пачками. Возвращает количество удаленных сессий.
+    """
+
+    now = timezone.now()
+    deleted = 0
+    last = None
+    while True:
+        sessions = Session.objects.filter(expire_date__lt=now)
+        if last is not None:
+            sessions = sessions.filter(
+                Q(expire_date__gt=last[0])
+                | Q(expire_date=last[0], session_key__gt=last[1])
+            )
+        keys = list(
+            sessions.order_by("expire_date", "session_key").values_list(
+                "expire_date", "session_key"
+            )[:batch_size]
+        )
+        if not keys:
+            break
+        deleted += Session.objects.filter(
+            session_key__in=[session_key for _, session_key in keys]
+        ).delete()[0]
+        last = keys[-1]
+        if len(keys) < batch_size:
+            break
+        time.sleep(pause)
+    return deleted
+
+
+def collect_expired_idempotency_keys(batch_size: int = 1000, pause: float = 0.1) -> int:
+    """
+    Функция для удаления ключей идемпотентности с истекшим сроком хранения пачками в порядке id с паузой pause секунд
+    между пачками. Возвращает количество удаленных ключей.
+    """
+
+    now = timezone.now()
+    deleted = 0
+    while True:
+        pks = list(
+            IdempotencyKey.objects.filter(expires_at__lt=now)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not pks:
+            break
+        deleted += IdempotencyKey.objects.filter(pk__in=pks).delete()[0]
+        if len(pks) < batch_size:
+            break
+        time.sleep(pause)
+    return deleted
+
+
+def collect_garbage(
+    age: float, batch_size: int = 1000, pause: float = 0.1
+) -> Dict[str, int]:
+    """
+    Функция для удаления брошенных корзин анонимных пользователей, сессий с истекшим сроком действия и ключей
+    идемпотентности с истекшим сроком хранения. Возвращает и записывает в журнал количество удаленных записей и время
+    работы.
+    """
+
+    started = time.monotonic()
+    metrics = collect_abandoned_baskets(age, batch_size, pause)
+    metrics["sessions"] = collect_expired_sessions(batch_size, pause)
+    metrics["idempotency_keys"] = collect_expired_idempotency_keys(batch_size, pause)
+    metrics["duration_ms"] = int((time.monotonic() - started) * 1000)
+    logger.info(
+        "Удалено корзин: %(baskets)s, строк корзин: %(lines)s, сессий: %(sessions)s, "
+        "ключей идемпотентности: %(idempotency_keys)s, "
+        "возвращено товаров на склад: %(returned)s за %(duration_ms)s мс",
+        metrics,
+    )
+    return metrics
@@ -0,0 +1,246 @@
+"""
+Корзины анонимных пользователей в подписанном cookie.
+
+В режиме BASKET_ANONYMOUS_STORAGE = "cookie" корзина анонимного пользователя не создает строк в таблицах сессий и
+корзин: id товаров и их количество хранятся в cookie, подписанном SECRET_KEY. Товары на складе за такой корзиной не
+резервируются, поэтому при каждом чтении количество товаров в cookie сверяется с остатками. В БД корзина
+записывается одной пачкой при входе в учетную запись или оформлении заказа.
+"""
+
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.request import Request
+
+from catalog_app.models import Product
+from catalog_app.utils import prefetch_product_list
+from shop_app.models import Basket
+from shop_app.pricing import cookie_basket_totals
+from shop_app.serializers import ProductInBasketListSerializer
+from shop_app.utils import add_lines_to_basket, get_basket
+
+COOKIE_SALT = "shop_app.cookie_basket"
+
+
+def cookie_basket_enabled(request: Request) -> bool:
+    """Функция для проверки, хранится ли корзина пользователя в cookie."""
+
+    return (
+        settings.BASKET_ANONYMOUS_STORAGE == "cookie"
+        and not request.user.is_authenticated
+    )
+
+
+def encode_lines(lines: Dict[int, int]) -> str:
+    """Функция для записи строк корзины в компактном виде: id:количество через |."""
+
+    return "|".join(
+        "{product}:{count}".format(product=product_id, count=count)
+        for product_id, count in sorted(lines.items())
+    )
+
+
+def decode_lines(value: str) -> Dict[int, int]:
+    """Функция для чтения строк корзины из cookie. Некорректные строки пропускаются."""
+
+    lines = {}
+    for line in value.split("|"):
+        product_id, _, count = line.partition(":")
+        if product_id.isdigit() and count.isdigit() and int(count) > 0:
+            lines[int(product_id)] = int(count)
+    return lines
+
+
+def read_cookie_lines(request: Request) -> Dict[int, int]:
+    """Функция для чтения строк корзины из cookie без сверки с остатками. Cookie с неверной подписью игнорируется."""
+
+    value = request.get_signed_cookie(
+        settings.BASKET_COOKIE_NAME,
+        default="",
+        salt=COOKIE_SALT,
+        max_age=settings.BASKET_COOKIE_MAX_AGE,
+    )
+    return decode_lines(value)
+
+
+def get_cookie_basket(request: Request) -> Dict[int, int]:
+    """
+    Функция для получения строк корзины из cookie. Количество товаров уменьшается до остатков на складе, товары,
+    которых нет в наличии, удаляются из корзины. Пустая корзина не выполняет запросов к БД. Корзина запоминается
+    на время запроса.
+    """
+
+    http_request = getattr(request, "_request", request)
+    lines = getattr(http_request, "_cookie_basket", None)
+    if lines is not None:
+        return lines
+    cookie_lines = read_cookie_lines(request)
+    lines = {}
+    if cookie_lines:
+        stock = dict(
+            Product.objects.filter(pk__in=list(cookie_lines)).values_list("pk", "count")
+        )
+        for product_id, count in cookie_lines.items():
+            if stock.get(product_id, 0) > 0:
+                lines[product_id] = min(count, stock[product_id])
+    http_request._cookie_basket = lines
+    # Cookie перезаписывается, если корзина изменилась после сверки с остатками
+    http_request._cookie_basket_changed = lines != cookie_lines
+    return lines
+
+
+def set_cookie_basket(request: Request, lines: Dict[int, int]) -> None:
+    """Функция для изменения строк корзины. Cookie записывается в ответ функцией store_cookie_basket."""
+
+    http_request = getattr(request, "_request", request)
+    http_request._cookie_basket = lines
+    http_request._cookie_basket_changed = True
+
+
+def store_cookie_basket(request: Request, response: HttpResponse) -> None:
+    """Функция для записи измененной корзины в cookie ответа. Пустая корзина удаляет cookie."""
+
+    http_request = getattr(request, "_request", request)
+    if not getattr(http_request, "_cookie_basket_changed", False):
+        return
+    lines = http_request._cookie_basket
+    if lines:
+        response.set_signed_cookie(
+            settings.BASKET_COOKIE_NAME,
+            encode_lines(lines),
+            salt=COOKIE_SALT,
+            max_age=settings.BASKET_COOKIE_MAX_AGE,
+            httponly=True,
+            samesite="Lax",
+        )
+    else:
+        response.delete_cookie(settings.BASKET_COOKIE_NAME, samesite="Lax")
+
+
+def cookie_basket_summary(request: Request) -> Dict:
+    """
+    Функция для получения количества товаров в корзине из cookie и их стоимости. Стоимость считается
+    cookie_basket_totals, как в предварительном расчете корзины, одним запросом с учетом остатков на складе.
+    Сводка не сохраняется в сессии, чтобы не создавать сессии анонимным пользователям.
+    """
+
+    return cookie_basket_totals(read_cookie_lines(request))
+
+
+def cookie_basket_serializer(lines: Dict[int, int]) -> ProductInBasketListSerializer:
+    """Функция для получения сериалайзера товаров в корзине из cookie."""
+
+    products = prefetch_product_list(Product.objects.filter(pk__in=list(lines)))
+    return ProductInBasketListSerializer(products, context={"counts": lines}, many=True)
+
+
+def add_to_cookie_basket(
+    request: Request, product_id: int, count: int
+) -> ProductInBasketListSerializer:
+    """Функция для добавления товара в корзину из cookie. Товар на складе не резервируется."""
+
+    lines = dict(get_cookie_basket(request))
+    if product_id not in lines and len(lines) >= settings.BASKET_COOKIE_MAX_LINES:
+        raise ValidationError({"count": "В корзине слишком много товаров"})
+    stock = (
+        Product.objects.filter(pk=product_id).values_list("count", flat=True).first()
+    )
+    if stock is None:
+        raise NotFound("Товар не найден")
+    if stock < lines.get(product_id, 0) + count:
+        raise ValidationError({"count": "Недостаточно товара на складе"})
+    lines[product_id] = lines.get(product_id, 0) + count
+    set_cookie_basket(request, lines)
+    return cookie_basket_serializer(lines)
+
+
+def remove_from_cookie_basket(
+    request: Request, product_id: int, count: int
+) -> ProductInBasketListSerializer:
+    """Функция для удаления товара из корзины из cookie."""
+
+    lines = dict(get_cookie_basket(request))
+    if lines.get(product_id, 0) < count:
+        raise ValidationError({"count": "Недостаточно товара в корзине"})
+    lines[product_id] -= count
+    if not lines[product_id]:
+        del lines[product_id]
+    set_cookie_basket(request, lines)
+    return cookie_basket_serializer(lines)
+
+
+def update_cookie_basket(
+    request: Request, changes: List[Dict]
+) -> ProductInBasketListSerializer:
+    """
+    Функция для изменения количества нескольких товаров в корзине из cookie. Изменения применяются все или ни одного,
+    остатки товаров проверяются одним запросом. При ошибке выбрасывается ValidationError со списком ошибок по строкам.
+    """
+
+    lines = dict(get_cookie_basket(request))
+    deltas = defaultdict(int)
+    for change in changes:
+        deltas[change["id"]] += change["count"]
+    stock = dict(Product.objects.filter(pk__in=list(deltas)).values_list("pk", "count"))
+    errors = {}
+    for product_id, delta in deltas.items():
+        count = lines.get(product_id, 0) + delta
+        if product_id not in stock:
+            errors[product_id] = {"id": ["Товар не найден"]}
+        elif count < 0:
+            errors[product_id] = {"count": ["Недостаточно товара в корзине"]}
+        elif count > stock[product_id]:
+            errors[product_id] = {"count": ["Недостаточно товара на складе"]}
+        elif count:
+            lines[product_id] = count
+        else:
+            lines.pop(product_id, None)
+    if not errors and len(lines) > settings.BASKET_COOKIE_MAX_LINES:
+        errors = {
+            product_id: {"count": ["В корзине слишком много товаров"]}
+            for product_id in deltas
+            if product_id not in get_cookie_basket(request)
+        }
+    if errors:
+        raise ValidationError([errors.get(change["id"], {}) for change in changes])
+    set_cookie_basket(request, lines)
+    return cookie_basket_serializer(lines)
+
+
+def persist_cookie_basket(request: Request) -> Optional[Basket]:
+    """
+    Функция для записи корзины из cookie в БД при входе в учетную запись или оформлении заказа. Товары
+    резервируются на складе в пределах остатков, строки добавляются в корзину пользователя одним запросом. Запись
+    выполняется постоянным количеством запросов независимо от количества товаров, cookie удаляется из ответа.
+    Возвращает корзину в БД или None, если записывать нечего.
+    """
+
+    if settings.BASKET_ANONYMOUS_STORAGE != "cookie":
+        return None
+    cookie_lines = read_cookie_lines(request)
+    if not cookie_lines:
+        return None
+    set_cookie_basket(request, {})
+    with transaction.atomic():
+        products = {
+            product.pk: product
+            for product in Product.objects.select_for_update()
+            .filter(pk__in=list(cookie_lines), count__gt=0)
+            .order_by("pk")
+        }
+        lines = {}
+        for product_id, count in cookie_lines.items():
+            product = products.get(product_id)
+            if product is not None:
+                lines[product_id] = min(count, product.count)
+                product.count -= lines[product_id]
+        if not lines:
+            return None
+        Product.objects.bulk_update(list(products.values()), ["count"])
+        basket = get_basket(request, create=True)
+        add_lines_to_basket(basket, lines)
+    return basket
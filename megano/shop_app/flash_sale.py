@@ -0,0 +1,417 @@
+import json
+import logging
+import uuid
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from catalog_app.models import Product
+from shop_app.models import Basket, ProductsInBasketCount
+from shop_app.reservations import reservation_deadline
+
+logger = logging.getLogger(__name__)
+
+STOCK_KEY = "flash_sale:stock:{product}"
+CLAIMS_KEY = "flash_sale:claims"
+LOCK_KEY = "flash_sale:lock"
+PENDING_KEY = "flash_sale:pending:{basket}"
+REJECTED_KEY = "flash_sale:rejected:{basket}"
+
+# Результаты скрипта списания остатка
+NOT_IN_SALE = -1
+SOLD_OUT = -2
+
+# Проверка и списание остатка выполняются в Redis атомарно, заявка ставится в очередь на запись в БД
+CLAIM_SCRIPT = """
+local stock = redis.call('GET', KEYS[1])
+if not stock then
+    return -1
+end
+if tonumber(stock) < tonumber(ARGV[1]) then
+    return -2
+end
+redis.call('RPUSH', KEYS[2], ARGV[2])
+redis.call('HINCRBY', KEYS[3], ARGV[3], ARGV[1])
+redis.call('EXPIRE', KEYS[3], ARGV[4])
+return redis.call('DECRBY', KEYS[1], ARGV[1])
+"""
+
+POP_SCRIPT = """
+local claims = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+redis.call('LTRIM', KEYS[1], #claims, -1)
+return claims
+"""
+
+# Остаток в Redis равен остатку в БД за вычетом заявок, которые еще не записаны в БД
+RECONCILE_SCRIPT = """
+local pending = 0
+for _, raw in ipairs(redis.call('LRANGE', KEYS[2], 0, -1)) do
+    local claim = cjson.decode(raw)
+    if claim['product'] == tonumber(ARGV[1]) then
+        pending = pending + claim['count']
+    end
+end
+local stock = math.max(tonumber(ARGV[2]) - pending, 0)
+local previous = redis.call('GET', KEYS[1])
+redis.call('SET', KEYS[1], stock)
+if not previous then
+    return {-1, stock}
+end
+return {tonumber(previous), stock}
+"""
+
+
+class FlashSaleClaimsPending(APIException):
+    """
+    Исключение для оформления заказа, пока заявки флеш-распродажи корзины не записаны в БД. Родитель:
+    APIException.
+    """
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Товары флеш-распродажи еще добавляются в корзину"
+    default_code = "flash_sale_claims_pending"
+
+    def __init__(self) -> None:
+        """Метод для создания исключения с интервалом повтора запроса."""
+
+        super().__init__()
+        # Интервал повтора запроса для заголовка Retry-After
+        self.wait = settings.FLASH_SALE_CHECKOUT_RETRY
+
+
+class FlashSaleStore:
+    """Хранилище остатков товаров флеш-распродажи и очереди заявок в Redis. Родитель: object."""
+
+    def __init__(self, client: redis.Redis) -> None:
+        """Метод для создания хранилища и регистрации скриптов Lua."""
+
+        self.client = client
+        self._claim = client.register_script(CLAIM_SCRIPT)
+        self._pop = client.register_script(POP_SCRIPT)
+        self._reconcile = client.register_script(RECONCILE_SCRIPT)
+
+    @staticmethod
+    def stock_key(product_id: int) -> str:
+        """Метод для получения ключа остатка товара."""
+
+        return STOCK_KEY.format(product=product_id)
+
+    @staticmethod
+    def pending_key(basket_id: int) -> str:
+        """Метод для получения ключа заявок корзины, которые еще не записаны в БД."""
+
+        return PENDING_KEY.format(basket=basket_id)
+
+    @staticmethod
+    def rejected_key(basket_id: int) -> str:
+        """Метод для получения ключа отклоненных заявок корзины, о которых еще не сообщено пользователю."""
+
+        return REJECTED_KEY.format(basket=basket_id)
+
+    def start(self, product_id: int, count: int) -> bool:
+        """Метод для загрузки остатка товара в Redis. Уже загруженный остаток не перезаписывается."""
+
+        return bool(self.client.set(self.stock_key(product_id), count, nx=True))
+
+    def stop(self, product_id: int) -> None:
+        """Метод для удаления остатка товара из Redis. Заявки из очереди записываются в БД как обычно."""
+
+        self.client.delete(self.stock_key(product_id))
+
+    def stock(self, product_id: int) -> Optional[int]:
+        """Метод для получения остатка товара в Redis."""
+
+        stock = self.client.get(self.stock_key(product_id))
+        return None if stock is None else int(stock)
+
+    def claim(self, basket_id: int, product_id: int, count: int) -> int:
+        """
+        Метод для атомарного списания остатка и постановки заявки в очередь. Возвращает остаток после списания,
+        NOT_IN_SALE для товара вне распродажи или SOLD_OUT при недостаточном остатке.
+        """
+
+        claim = json.dumps(
+            {
+                "id": uuid.uuid4().hex,
+                "basket": basket_id,
+                "product": product_id,
+                "count": count,
+            }
+        )
+        return self._claim(
+            keys=[self.stock_key(product_id), CLAIMS_KEY, self.pending_key(basket_id)],
+            args=[count, claim, product_id, settings.BASKET_RESERVATION_TTL],
+        )
+
+    def pending(self, basket_id: int) -> Dict[int, int]:
+        """Метод для получения количества товаров в заявках корзины, которые еще не записаны в БД, по id товара."""
+
+        return {
+            int(product_id): int(count)
+            for product_id, count in self.client.hgetall(
+                self.pending_key(basket_id)
+            ).items()
+            if int(count) > 0
+        }
+
+    def settle(self, claims: List[Dict], rejected: List[Dict]) -> None:
+        """
+        Метод для снятия записанных в БД и отклоненных заявок из заявок корзин. Отклоненные заявки сохраняются, чтобы
+        сообщить о них пользователю.
+        """
+
+        rejected_ids = {claim["id"] for claim in rejected}
+        pipeline = self.client.pipeline()
+        for claim in claims:
+            pipeline.hincrby(
+                self.pending_key(claim["basket"]), claim["product"], -claim["count"]
+            )
+            if claim["id"] in rejected_ids:
+                rejected_key = self.rejected_key(claim["basket"])
+                pipeline.hincrby(rejected_key, claim["product"], claim["count"])
+                pipeline.expire(rejected_key, settings.BASKET_RESERVATION_TTL)
+        pipeline.execute()
+
+    def pop_rejected(self, basket_id: int) -> Dict[int, int]:
+        """Метод для получения и удаления количества товаров в отклоненных заявках корзины по id товара."""
+
+        pipeline = self.client.pipeline()
+        pipeline.hgetall(self.rejected_key(basket_id))
+        pipeline.delete(self.rejected_key(basket_id))
+        rejected, _ = pipeline.execute()
+        return {int(product_id): int(count) for product_id, count in rejected.items()}
+
+    def pop_claims(self, batch_size: int) -> List[Dict]:
+        """Метод для извлечения пачки заявок из начала очереди."""
+
+        return [
+            json.loads(claim)
+            for claim in self._pop(keys=[CLAIMS_KEY], args=[batch_size])
+        ]
+
+    def return_claims(self, claims: List[Dict]) -> None:
+        """Метод для возврата заявок в начало очереди после неудачной записи в БД."""
+
+        if claims:
+            self.client.lpush(
+                CLAIMS_KEY, *[json.dumps(claim) for claim in reversed(claims)]
+            )
+
+    def reconcile(self, product_id: int, db_count: int) -> Tuple[Optional[int], int]:
+        """Метод для приведения остатка в Redis к остатку в БД. Возвращает прежний и новый остатки."""
+
+        previous, stock = self._reconcile(
+            keys=[self.stock_key(product_id), CLAIMS_KEY], args=[product_id, db_count]
+        )
+        return (None if previous == NOT_IN_SALE else previous), stock
+
+    def product_ids(self) -> List[int]:
+        """Метод для получения id товаров, остатки которых загружены в Redis."""
+
+        return [
+            int(key.decode().rsplit(":", 1)[1])
+            for key in self.client.scan_iter(STOCK_KEY.format(product="*"))
+        ]
+
+    def lock(self, blocking_timeout: float = 0) -> redis.lock.Lock:
+        """
+        Метод для получения блокировки записи заявок и сверки остатков. По умолчанию блокировка не ожидается, если
+        ее держит другой воркер.
+        """
+
+        return self.client.lock(LOCK_KEY, timeout=60, blocking_timeout=blocking_timeout)
+
+
+_store = None
+
+
+def get_flash_sale_store() -> Optional[FlashSaleStore]:
+    """Функция для получения хранилища флеш-распродажи. Пустой адрес Redis отключает флеш-распродажи."""
+
+    global _store
+    if not settings.FLASH_SALE_REDIS_URL:
+        return None
+    if _store is None:
+        _store = FlashSaleStore(redis.Redis.from_url(settings.FLASH_SALE_REDIS_URL))
+    return _store
+
+
+def write_claims(claims: Iterable[Dict]) -> List[Dict]:
+    """
+    Функция для записи пачки заявок в БД одной транзакцией: остатки товаров и строки корзин обновляются пакетно.
+    Заявки, которые не удалось записать (корзина удалена, в БД не хватает товара), возвращаются. Их остаток
+    возвращается в Redis при сверке.
+    """
+
+    claims = list(claims)
+    rejected = []
+    with transaction.atomic():
+        products = Product.objects.select_for_update().in_bulk(
+            {claim["product"] for claim in claims}
+        )
+        baskets = set(
+            Basket.objects.filter(
+                pk__in={claim["basket"] for claim in claims}
+            ).values_list("pk", flat=True)
+        )
+        accepted = defaultdict(int)
+        for claim in claims:
+            product = products.get(claim["product"])
+            if (
+                product is None
+                or claim["basket"] not in baskets
+                or product.count < claim["count"]
+            ):
+                rejected.append(claim)
+                continue
+            product.count -= claim["count"]
+            accepted[(claim["basket"], claim["product"])] += claim["count"]
+        if not accepted:
+            return rejected
+        Product.objects.bulk_update(list(products.values()), ["count"])
+        reserved_until = reservation_deadline()
+        lines = {
+            (line.basket_id, line.product_id): line
+            for line in ProductsInBasketCount.objects.select_for_update().filter(
+                basket_id__in={basket for basket, _ in accepted},
+                product_id__in={product for _, product in accepted},
+            )
+        }
+        new_lines = []
+        for key, count in accepted.items():
+            line = lines.get(key)
+            if line is None:
+                new_lines.append(
+                    ProductsInBasketCount(
+                        basket_id=key[0],
+                        product_id=key[1],
+                        count_in_basket=count,
+                        reserved_until=reserved_until,
+                    )
+                )
+            else:
+                line.count_in_basket += count
+                line.reserved_until = reserved_until
+        ProductsInBasketCount.objects.bulk_update(
+            [line for key, line in lines.items() if key in accepted],
+            ["count_in_basket", "reserved_until"],
+        )
+        ProductsInBasketCount.objects.bulk_create(new_lines)
+    return rejected
+
+
+def write_claims_batch(store: FlashSaleStore, claims: List[Dict]) -> int:
+    """
+    Функция для записи пачки заявок, снятых с очереди, в БД. При ошибке заявки возвращаются в очередь. Возвращает
+    количество записанных заявок.
+    """
+
+    try:
+        rejected = write_claims(claims)
+    except Exception:
+        store.return_claims(claims)
+        raise
+    store.settle(claims, rejected)
+    if rejected:
+        logger.warning("Отклонены заявки флеш-распродажи: %s", rejected)
+    return len(claims) - len(rejected)
+
+
+def flush_claims(store: FlashSaleStore, batch_size: int = 500) -> int:
+    """Функция для записи заявок из очереди Redis в БД пачками. Возвращает количество записанных заявок."""
+
+    lock = store.lock()
+    if not lock.acquire():
+        return 0
+    written = 0
+    try:
+        while True:
+            claims = store.pop_claims(batch_size)
+            if not claims:
+                break
+            written += write_claims_batch(store, claims)
+            if len(claims) < batch_size:
+                break
+    finally:
+        lock.release()
+    return written
+
+
+def flush_basket_claims(
+    store: FlashSaleStore, basket_id: int, batch_size: int = 500, wait: float = 0
+) -> bool:
+    """
+    Функция для записи в БД заявок корзины перед оформлением заказа. Очередь записывается по порядку, пока у
+    корзины не останется незаписанных заявок. Блокировка записи ожидается не дольше wait секунд. Возвращает
+    False, если заявки корзины записать не удалось.
+    """
+
+    if not store.pending(basket_id):
+        return True
+    lock = store.lock(blocking_timeout=wait)
+    if not lock.acquire():
+        return False
+    try:
+        while store.pending(basket_id):
+            claims = store.pop_claims(batch_size)
+            if not claims:
+                break
+            write_claims_batch(store, claims)
+    finally:
+        lock.release()
+    return not store.pending(basket_id)
+
+
+def reconcile_stock(store: FlashSaleStore) -> Dict[int, Tuple[Optional[int], int]]:
+    """
+    Функция для сверки остатков товаров флеш-распродажи в Redis с БД. Остатки товаров, снятых с распродажи,
+    удаляются из Redis. Возвращает расхождения: id товара - прежний и новый остатки в Redis.
+    """
+
+    lock = store.lock()
+    if not lock.acquire():
+        return {}
+    drift = {}
+    try:
+        sale_counts = dict(
+            Product.objects.filter(flashSale=True).values_list("pk", "count")
+        )
+        for product_id in store.product_ids():
+            if product_id not in sale_counts:
+                store.stop(product_id)
+        for product_id, db_count in sale_counts.items():
+            previous, stock = store.reconcile(product_id, db_count)
+            if previous != stock:
+                drift[product_id] = (previous, stock)
+    finally:
+        lock.release()
+    if drift:
+        logger.warning("Исправлены остатки флеш-распродажи: %s", drift)
+    return drift
+
+
+def sync_flash_sale_products(product_ids: Optional[Iterable[int]]) -> None:
+    """
+    Функция для загрузки в Redis остатков товаров, поставленных на флеш-распродажу, и удаления остатков товаров,
+    снятых с нее. Без списка id выполняется полная сверка.
+    """
+
+    store = get_flash_sale_store()
+    if store is None:
+        return
+    if product_ids is None:
+        reconcile_stock(store)
+        return
+    products = Product.objects.filter(pk__in=list(product_ids)).values_list(
+        "pk", "flashSale", "count"
+    )
+    for product_id, flash_sale, count in products:
+        if flash_sale:
+            store.start(product_id, count)
+        else:
+            store.stop(product_id)
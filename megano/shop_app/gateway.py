@@ -0,0 +1,337 @@
+"""
+Адаптеры платежного шлюза.
+
+Воркер celery списывает оплату через интерфейс PaymentGateway. HttpGateway - клиент HTTP API платежного шлюза,
+SimulatorGateway - симулятор платежной системы в процессе воркера. Симулятор с настраиваемой задержкой, долей сбоев,
+отказов и таймаутов и ограничением пропускной способности также запускается отдельным сервисом командой
+payment_gateway_simulator, что позволяет измерять пропускную способность и задержки оплаты без настоящего шлюза.
+"""
+
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from decimal import Decimal
+from typing import Dict, Optional
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+
+DECLINED_ERROR = "Оплата отклонена платежной системой"
+
+# Заголовки запросов к платежному шлюзу и уведомлений шлюза
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+SIGNATURE_HEADER = "X-Gateway-Signature"
+
+
+class GatewayError(Exception):
+    """Исключение для временной ошибки платежного шлюза, после которой запрос можно повторить. Родитель: Exception."""
+
+
+class GatewayTimeout(GatewayError):
+    """Исключение для превышения времени ожидания ответа платежного шлюза. Родитель: GatewayError."""
+
+
+class GatewayRateLimited(GatewayError):
+    """Исключение для превышения ограничения количества запросов к платежному шлюзу. Родитель: GatewayError."""
+
+
+def charge_result(status: str, transaction: str = "", error: str = "") -> Dict:
+    """Функция для получения результата списания в формате ответа платежного шлюза."""
+
+    return {"status": status, "transaction": transaction, "error": error}
+
+
+def sign_webhook(body: bytes, secret: str) -> str:
+    """Функция для получения подписи HMAC-SHA256 тела уведомления платежного шлюза."""
+
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_webhook(body: bytes, signature: str, secret: str) -> bool:
+    """Функция для проверки подписи уведомления платежного шлюза."""
+
+    return hmac.compare_digest(sign_webhook(body, secret), signature)
+
+
+class PaymentGateway(ABC):
+    """Интерфейс адаптера платежного шлюза. Родитель: ABC."""
+
+    @abstractmethod
+    def charge(
+        self,
+        payment_id: int,
+        amount: Decimal,
+        card_number: str,
+        idempotency_key: str,
+        callback_url: str = "",
+    ) -> Dict:
+        """
+        Метод для списания оплаты. Возвращает результат со статусом "paid", "failed" или "pending", если результат
+        будет отправлен шлюзом на callback_url. Повторный запрос с тем же idempotency_key возвращает результат первого
+        запроса без повторного списания. Временные ошибки шлюза выбрасываются исключением GatewayError.
+        """
+
+    @abstractmethod
+    def status(self, idempotency_key: str) -> Optional[Dict]:
+        """
+        Метод для получения результата списания по ключу идемпотентности. Возвращает None, если шлюз не получал
+        запрос с этим ключом. Временные ошибки шлюза выбрасываются исключением GatewayError.
+        """
+
+
+class PaymentSimulator:
+    """
+    Симулятор платежной системы. Списание занимает latency секунд с нормальным разбросом jitter, доли запросов
+    failure_rate и timeout_rate завершаются временной ошибкой и таймаутом, доля decline_rate отклоняется. Количество
+    списаний в секунду ограничивается rate_limit (0 - без ограничения). Карты с нечетным номером или номером,
+    оканчивающимся на 0, всегда отклоняются. Родитель: object.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        decline_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        timeout_delay: float = 30.0,
+        rate_limit: float = 0.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        """Метод для создания симулятора. timeout_delay - время ответа на запрос, завершающийся таймаутом."""
+
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.decline_rate = decline_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_delay = timeout_delay
+        self.rate_limit = rate_limit
+        self.random = random.Random(seed)
+        self.results = {}
+        self.in_flight = set()
+        self.charges = 0
+        self._tokens = rate_limit
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """Метод для получения разрешения на списание по алгоритму token bucket. Вызывается под блокировкой."""
+
+        if not self.rate_limit:
+            return True
+        now = time.monotonic()
+        self._tokens = min(
+            self.rate_limit, self._tokens + (now - self._updated) * self.rate_limit
+        )
+        self._updated = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def process(self, card_number: str, idempotency_key: str) -> Dict:
+        """
+        Метод для списания оплаты. Результат запоминается по ключу идемпотентности. Повторный запрос во время
+        обработки первого возвращает статус "pending". Запрос, завершившийся таймаутом, успевает списать оплату,
+        поэтому повтор с тем же ключом возвращает ее результат.
+        """
+
+        with self._lock:
+            if idempotency_key in self.results:
+                return self.results[idempotency_key]
+            if idempotency_key in self.in_flight:
+                return charge_result("pending")
+            if not self.acquire():
+                raise GatewayRateLimited("Превышено ограничение количества запросов")
+            self.in_flight.add(idempotency_key)
+            roll = self.random.random()
+            declined = self.random.random() < self.decline_rate
+            delay = max(self.random.gauss(self.latency, self.jitter), 0)
+        try:
+            if roll < self.failure_rate:
+                time.sleep(delay)
+                raise GatewayError("Платежная система временно недоступна")
+            time.sleep(delay)
+            if declined or int(card_number) % 2 or card_number.endswith("0"):
+                result = charge_result("failed", uuid.uuid4().hex, DECLINED_ERROR)
+            else:
+                result = charge_result("paid", uuid.uuid4().hex)
+            with self._lock:
+                self.results[idempotency_key] = result
+                self.charges += 1
+            if roll < self.failure_rate + self.timeout_rate:
+                time.sleep(self.timeout_delay)
+                raise GatewayTimeout("Платежная система не ответила")
+            return result
+        finally:
+            with self._lock:
+                self.in_flight.discard(idempotency_key)
+
+    def lookup(self, idempotency_key: str) -> Optional[Dict]:
+        """
+        Метод для получения результата списания по ключу идемпотентности без списания. Для запроса в обработке
+        возвращает статус "pending", для неизвестного ключа - None.
+        """
+
+        with self._lock:
+            if idempotency_key in self.results:
+                return self.results[idempotency_key]
+            if idempotency_key in self.in_flight:
+                return charge_result("pending")
+        return None
+
+
+class SimulatorGateway(PaymentGateway):
+    """Адаптер симулятора платежной системы в процессе воркера. Родитель: PaymentGateway."""
+
+    def __init__(self, simulator: PaymentSimulator) -> None:
+        """Метод для создания адаптера симулятора."""
+
+        self.simulator = simulator
+
+    def charge(
+        self,
+        payment_id: int,
+        amount: Decimal,
+        card_number: str,
+        idempotency_key: str,
+        callback_url: str = "",
+    ) -> Dict:
+        """Метод для списания оплаты симулятором. Результат возвращается сразу, уведомления не отправляются."""
+
+        return self.simulator.process(card_number, idempotency_key)
+
+    def status(self, idempotency_key: str) -> Optional[Dict]:
+        """Метод для получения результата списания симулятора по ключу идемпотентности."""
+
+        return self.simulator.lookup(idempotency_key)
+
+
+class HttpGateway(PaymentGateway):
+    """Адаптер HTTP API платежного шлюза. Родитель: PaymentGateway."""
+
+    def __init__(self, url: str, timeout: float = 10) -> None:
+        """Метод для создания адаптера. timeout - время ожидания ответа шлюза в секундах."""
+
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def charge(
+        self,
+        payment_id: int,
+        amount: Decimal,
+        card_number: str,
+        idempotency_key: str,
+        callback_url: str = "",
+    ) -> Dict:
+        """Метод для списания оплаты запросом POST /charges. Ответ 404 считается отказом в оплате."""
+
+        result = self.send(
+            Request(
+                "{url}/charges".format(url=self.url),
+                data=json.dumps(
+                    {
+                        "payment": payment_id,
+                        "amount": str(amount),
+                        "card_number": card_number,
+                        "callback_url": callback_url,
+                    }
+                ).encode(),
+                headers={
+                    "Content-Type": "application/json",
+                    IDEMPOTENCY_HEADER: idempotency_key,
+                },
+                method="POST",
+            )
+        )
+        return result or charge_result("failed", error=DECLINED_ERROR)
+
+    def status(self, idempotency_key: str) -> Optional[Dict]:
+        """Метод для получения результата списания запросом GET /charges/<ключ>. Ответ 404 возвращает None."""
+
+        return self.send(
+            Request(
+                "{url}/charges/{key}".format(
+                    url=self.url, key=quote(idempotency_key, safe="")
+                )
+            )
+        )
+
+    def send(self, request: Request) -> Optional[Dict]:
+        """
+        Метод для отправки запроса к шлюзу. Ответы 429 и 5xx, таймауты и ошибки соединения выбрасываются
+        исключениями GatewayError, на ответ 404 возвращается None, остальные ошибки шлюза считаются отказом в оплате.
+        """
+
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except HTTPError as error:
+            if error.code == 404:
+                return None
+            if error.code == 429:
+                raise GatewayRateLimited(str(error)) from error
+            if error.code >= 500:
+                raise GatewayError(str(error)) from error
+            return charge_result("failed", error=DECLINED_ERROR)
+        except TimeoutError as error:
+            raise GatewayTimeout(str(error)) from error
+        except URLError as error:
+            if isinstance(error.reason, TimeoutError):
+                raise GatewayTimeout(str(error)) from error
+            raise GatewayError(str(error)) from error
+
+
+def charge_with_retries(
+    gateway: PaymentGateway,
+    payment_id: int,
+    idempotency_key: str,
+    amount: Decimal,
+    card_number: str,
+    callback_url: str = "",
+    attempts: int = 3,
+    backoff: float = 0.5,
+) -> Dict:
+    """
+    Функция для списания оплаты с повтором временных ошибок шлюза. Все попытки выполняются с ключом идемпотентности
+    idempotency_key, поэтому повтор после таймаута не списывает оплату дважды. Пауза между попытками растет
+    экспоненциально начиная с backoff секунд. После последней неудачной попытки выбрасывается GatewayError.
+    """
+
+    for attempt in range(attempts):
+        try:
+            return gateway.charge(
+                payment_id, amount, card_number, idempotency_key, callback_url
+            )
+        except GatewayError:
+            if attempt + 1 == attempts:
+                raise
+            time.sleep(backoff * 2**attempt)
+
+
+_gateway = None
+
+
+def get_payment_gateway() -> PaymentGateway:
+    """
+    Функция для получения адаптера платежного шлюза. Пустой адрес шлюза включает симулятор в процессе воркера с
+    настройками PAYMENT_SIMULATOR.
+    """
+
+    global _gateway
+    if _gateway is None:
+        if settings.PAYMENT_GATEWAY_URL:
+            _gateway = HttpGateway(
+                settings.PAYMENT_GATEWAY_URL, settings.PAYMENT_GATEWAY_TIMEOUT
+            )
+        else:
+            _gateway = SimulatorGateway(PaymentSimulator(**settings.PAYMENT_SIMULATOR))
+    return _gateway
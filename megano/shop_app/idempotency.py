@@ -0,0 +1,157 @@
+"""
+Идемпотентность POST-запросов оформления заказа и оплаты.
+
+Клиент передает в заголовке Idempotency-Key ключ, который не меняется при повторах запроса. Первый запрос с ключом
+занимает ключ в БД до выполнения. Повтор выполненного запроса получает сохраненный ответ без повторного создания
+заказа или оплаты, повтор во время выполнения первого запроса получает ответ 409. Ключ запроса, завершившегося
+ошибкой, освобождается, поэтому исправленный запрос можно отправить с тем же ключом. Ответ сохраняется в той же
+транзакции, что и созданный заказ или оплата: после сбоя между фиксацией и сохранением ответа повтор не создаст
+заказ или оплату второй раз.
+"""
+
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.request import Request
+from rest_framework.response import Response
+from shop_app.models import IdempotencyKey
+
+# Заголовок, в котором клиент передает ключ идемпотентности
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+# Соль HMAC хэша тела запроса
+FINGERPRINT_SALT = "shop_app.idempotency.request_fingerprint"
+
+
+class IdempotencyKeyInFlight(APIException):
+    """Исключение для повтора запроса, первый запрос с тем же ключом еще выполняется. Родитель: APIException."""
+
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Запрос с этим ключом идемпотентности еще выполняется"
+    default_code = "idempotency_key_in_flight"
+
+    def __init__(self) -> None:
+        """Метод для создания исключения с интервалом повтора запроса."""
+
+        super().__init__()
+        # Интервал повтора запроса для заголовка Retry-After
+        self.wait = settings.IDEMPOTENCY_KEY_RETRY
+
+
+class IdempotencyKeyMismatch(APIException):
+    """Исключение для повтора ключа идемпотентности с другим телом запроса. Родитель: APIException."""
+
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "Ключ идемпотентности уже использован с другим запросом"
+    default_code = "idempotency_key_mismatch"
+
+
+class IdempotentReplay(Exception):
+    """Исключение для повтора выполненного запроса с сохраненным ответом. Родитель: Exception."""
+
+    def __init__(self, record: IdempotencyKey) -> None:
+        """Метод для создания исключения с ключом выполненного запроса."""
+
+        super().__init__(record.key)
+        self.record = record
+
+    def response(self) -> Response:
+        """Метод для получения сохраненного ответа."""
+
+        headers = {"Location": self.record.location} if self.record.location else None
+        return Response(
+            self.record.response, status=self.record.status_code, headers=headers
+        )
+
+
+def request_owner(request: Request) -> str:
+    """
+    Функция для получения владельца ключа идемпотентности: пользователя или сессии анонимного пользователя.
+    Сессия без ключа сохраняется, чтобы повтор запроса пришел с тем же cookie сессии.
+    """
+
+    if request.user.is_authenticated:
+        return "user:{pk}".format(pk=request.user.pk)
+    if request.session.session_key is None:
+        request.session.save()
+        request.session.modified = True
+    return "session:{key}".format(key=request.session.session_key)
+
+
+def request_fingerprint(request: Request) -> str:
+    """
+    Функция для получения хэша тела запроса, с которым сравнивается тело повторов запроса. Тело запроса оплаты
+    содержит данные карты, поэтому хэш подписывается HMAC-SHA256 с ключом SECRET_KEY: по хэшу в БД данные карты не
+    подобрать перебором.
+    """
+
+    data = json.dumps(request.data, sort_keys=True, default=str)
+    return salted_hmac(FINGERPRINT_SALT, data, algorithm="sha256").hexdigest()
+
+
+def claim_idempotency_key(request: Request, key: str) -> IdempotencyKey:
+    """
+    Функция для занятия ключа идемпотентности запросом. Ключ с истекшим сроком хранения и ключ запроса, не
+    завершившегося до locked_until, занимаются заново. Повтор выполненного запроса выбрасывает исключение
+    IdempotentReplay с сохраненным ответом, повтор выполняющегося запроса - исключение IdempotencyKeyInFlight.
+    """
+
+    if len(key) > IdempotencyKey._meta.get_field("key").max_length:
+        raise ValidationError({IDEMPOTENCY_HEADER: "Слишком длинный ключ"})
+    now = timezone.now()
+    claim = {
+        "fingerprint": request_fingerprint(request),
+        "status_code": None,
+        "response": None,
+        "location": "",
+        "locked_until": now + timedelta(seconds=settings.IDEMPOTENCY_KEY_LOCK),
+        "expires_at": now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+    }
+    with transaction.atomic():
+        record, created = IdempotencyKey.objects.select_for_update().get_or_create(
+            owner=request_owner(request), path=request.path, key=key, defaults=claim
+        )
+        if created:
+            return record
+        if record.expires_at <= now or (
+            record.status_code is None and record.locked_until <= now
+        ):
+            for field, value in claim.items():
+                setattr(record, field, value)
+            record.save(update_fields=list(claim))
+            return record
+    if record.fingerprint != claim["fingerprint"]:
+        raise IdempotencyKeyMismatch()
+    if record.status_code is None:
+        raise IdempotencyKeyInFlight()
+    raise IdempotentReplay(record)
+
+
+def complete_idempotency_key(record: IdempotencyKey, response: Response) -> None:
+    """
+    Функция для сохранения ответа выполненного запроса. Ключ запроса, завершившегося ошибкой, освобождается.
+    Вызывается в транзакции, которая создает заказ или оплату, поэтому ответ сохраняется вместе с ними.
+    """
+
+    if response.status_code >= status.HTTP_400_BAD_REQUEST:
+        release_idempotency_key(record)
+        return
+    record.status_code = response.status_code
+    IdempotencyKey.objects.filter(pk=record.pk).update(
+        status_code=response.status_code,
+        response=response.data,
+        location=response.get("Location", ""),
+        locked_until=None,
+    )
+
+
+def release_idempotency_key(record: IdempotencyKey) -> None:
+    """Функция для освобождения ключа идемпотентности запроса, завершившегося ошибкой."""
+
+    IdempotencyKey.objects.filter(pk=record.pk, status_code__isnull=True).delete()
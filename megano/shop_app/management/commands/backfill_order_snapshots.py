@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandParser
+from shop_app.snapshots import backfill_order_snapshots
+
+
+class Command(BaseCommand):
+    """
+    Команда для записи снимков товаров в строки заказов, оформленных до появления снимков. Строки обрабатываются
+    пачками, повторный запуск продолжает работу с необработанных строк. Родитель: BaseCommand.
+    """
+
+    help = "Запись снимков товаров в строки исторических заказов"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Метод для добавления аргументов команды."""
+
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--pause", type=float, default=0.1, help="Пауза между пачками, с"
+        )
+
+    def handle(self, *args, **options) -> None:
+        """Метод для запуска команды."""
+
+        metrics = backfill_order_snapshots(options["batch_size"], options["pause"])
+        self.stdout.write(
+            "Обработано строк заказов: {lines}, пачек: {batches}".format(**metrics)
+        )
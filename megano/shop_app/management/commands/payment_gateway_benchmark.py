@@ -0,0 +1,128 @@
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from statistics import quantiles
+from typing import Dict
+
+from django.core.management.base import BaseCommand, CommandParser
+from shop_app.gateway import (
+    GatewayError,
+    HttpGateway,
+    PaymentGateway,
+    PaymentSimulator,
+    SimulatorGateway,
+    charge_with_retries,
+)
+
+
+def run_benchmark(
+    gateway: PaymentGateway,
+    payments: int,
+    concurrency: int,
+    attempts: int = 3,
+    backoff: float = 0.5,
+    first_payment: int = 1,
+) -> Dict:
+    """
+    Функция для нагрузочного теста платежного шлюза. Выполняет payments списаний в concurrency потоков с повтором
+    временных ошибок. Возвращает пропускную способность, процентили задержки, количество списаний по статусам
+    и количество списаний, завершившихся ошибкой после всех попыток.
+    """
+
+    def charge(payment_id: int) -> tuple:
+        started = time.monotonic()
+        try:
+            status = charge_with_retries(
+                gateway,
+                payment_id,
+                "benchmark-{payment}".format(payment=payment_id),
+                0,
+                "12345678",
+                "",
+                attempts,
+                backoff,
+            )["status"]
+        except GatewayError:
+            status = "error"
+        return status, time.monotonic() - started
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(
+            executor.map(charge, range(first_payment, first_payment + payments))
+        )
+    elapsed = time.monotonic() - started
+    latencies = sorted(latency for _, latency in results)
+    percentiles = (
+        quantiles(latencies, n=100, method="inclusive")
+        if len(latencies) > 1
+        else latencies * 99
+    )
+    statuses = Counter(status for status, _ in results)
+    return {
+        "payments": payments,
+        "elapsed": elapsed,
+        "throughput": payments / elapsed if elapsed else 0,
+        "p50": percentiles[49],
+        "p95": percentiles[94],
+        "p99": percentiles[98],
+        "statuses": dict(statuses),
+        "errors": statuses["error"],
+    }
+
+
+class Command(BaseCommand):
+    """
+    Команда для нагрузочного теста платежного шлюза. Без адреса шлюза списания выполняются симулятором в процессе
+    команды. Родитель: BaseCommand.
+    """
+
+    help = "Нагрузочный тест платежного шлюза"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Метод для добавления аргументов команды."""
+
+        parser.add_argument("--url", default="", help="Адрес платежного шлюза")
+        parser.add_argument("--payments", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument("--attempts", type=int, default=3)
+        parser.add_argument("--backoff", type=float, default=0.5)
+        parser.add_argument("--timeout", type=float, default=10)
+        parser.add_argument("--latency", type=float, default=0.2, help="Задержка, с")
+        parser.add_argument("--failure-rate", type=float, default=0.0)
+        parser.add_argument(
+            "--rate-limit", type=float, default=0.0, help="Списаний в секунду"
+        )
+        parser.add_argument(
+            "--first-payment",
+            type=int,
+            default=int(time.time()),
+            help="id первой оплаты, id определяют ключи идемпотентности",
+        )
+
+    def handle(self, *args, **options) -> None:
+        """Метод для запуска команды."""
+
+        if options["url"]:
+            gateway = HttpGateway(options["url"], options["timeout"])
+        else:
+            gateway = SimulatorGateway(
+                PaymentSimulator(
+                    latency=options["latency"],
+                    failure_rate=options["failure_rate"],
+                    rate_limit=options["rate_limit"],
+                )
+            )
+        metrics = run_benchmark(
+            gateway,
+            options["payments"],
+            options["concurrency"],
+            options["attempts"],
+            options["backoff"],
+            options["first_payment"],
+        )
+        self.stdout.write(
+            "Списаний: {payments} за {elapsed:.2f} с, {throughput:.1f} в секунду\n"
+            "Задержка: p50 {p50:.3f} с, p95 {p95:.3f} с, p99 {p99:.3f} с\n"
+            "Статусы: {statuses}, ошибок: {errors}".format(**metrics)
+        )
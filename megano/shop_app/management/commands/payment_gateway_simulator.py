@@ -0,0 +1,197 @@
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+from urllib.error import URLError
+from urllib.parse import unquote
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from shop_app.gateway import (
+    IDEMPOTENCY_HEADER,
+    SIGNATURE_HEADER,
+    GatewayError,
+    GatewayRateLimited,
+    GatewayTimeout,
+    PaymentSimulator,
+    charge_result,
+    sign_webhook,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SimulatorHandler(BaseHTTPRequestHandler):
+    """
+    Обработчик HTTP API симулятора платежной системы: POST /charges со списанием оплаты и GET /charges/<ключ> с
+    результатом списания по ключу идемпотентности. Если в запросе передан callback_url, ответ 202 возвращается сразу,
+    а результат отправляется подписанным уведомлением. Без ключа подписи запросы с callback_url отклоняются.
+    Родитель: BaseHTTPRequestHandler.
+    """
+
+    simulator = None
+    webhook_secret = ""
+
+    def send_json(self, code: int, data: Dict) -> None:
+        """Метод для отправки ответа в формате JSON."""
+
+        body = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def notify(self, callback_url: str, payment_id: int, card_number: str, key: str):
+        """
+        Метод для списания оплаты в фоне и отправки результата уведомлением на callback_url. Списание, завершившееся
+        таймаутом, выполнено, поэтому в уведомлении передается его результат.
+        """
+
+        try:
+            result = self.simulator.process(card_number, key)
+        except GatewayTimeout:
+            result = self.simulator.lookup(key)
+        except GatewayError as error:
+            result = charge_result("failed", error=str(error))
+        body = json.dumps(dict(result, payment=payment_id)).encode()
+        request = Request(
+            callback_url,
+            data=body,
+            headers={
+                "Content-Type": "application/json",
+                SIGNATURE_HEADER: sign_webhook(body, self.webhook_secret),
+            },
+            method="POST",
+        )
+        try:
+            with urlopen(request, timeout=10):
+                pass
+        except URLError as error:
+            logger.warning("Не удалось отправить уведомление %s: %s", key, error)
+
+    def do_GET(self) -> None:
+        """Метод для обработки запроса результата списания по ключу идемпотентности."""
+
+        prefix, _, key = self.path.rstrip("/").rpartition("/")
+        result = self.simulator.lookup(unquote(key)) if prefix == "/charges" else None
+        if result is None:
+            self.send_json(404, {"error": "Not found"})
+            return
+        self.send_json(200, result)
+
+    def do_POST(self) -> None:
+        """Метод для обработки запроса на списание оплаты."""
+
+        if self.path.rstrip("/") != "/charges":
+            self.send_json(404, {"error": "Not found"})
+            return
+        key = self.headers.get(IDEMPOTENCY_HEADER)
+        try:
+            charge = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            card_number = charge["card_number"]
+        except (TypeError, ValueError, KeyError):
+            self.send_json(400, {"error": "Неверный формат запроса"})
+            return
+        if not key:
+            self.send_json(400, {"error": "Не передан ключ идемпотентности"})
+            return
+        if charge.get("callback_url"):
+            if not self.webhook_secret:
+                self.send_json(400, {"error": "Не задан ключ подписи уведомлений"})
+                return
+            threading.Thread(
+                target=self.notify,
+                args=(charge["callback_url"], charge.get("payment"), card_number, key),
+                daemon=True,
+            ).start()
+            self.send_json(202, charge_result("pending"))
+            return
+        try:
+            self.send_json(200, self.simulator.process(card_number, key))
+        except GatewayRateLimited as error:
+            self.send_json(429, {"error": str(error)})
+        except GatewayTimeout as error:
+            self.send_json(504, {"error": str(error)})
+        except GatewayError as error:
+            self.send_json(503, {"error": str(error)})
+
+    def log_message(self, format: str, *args) -> None:
+        """Метод для отключения журнала запросов, который замедляет нагрузочные тесты."""
+
+
+def build_server(
+    host: str, port: int, simulator: PaymentSimulator, webhook_secret: str
+) -> ThreadingHTTPServer:
+    """Функция для создания сервера симулятора платежной системы."""
+
+    handler = type(
+        "Handler",
+        (SimulatorHandler,),
+        {"simulator": simulator, "webhook_secret": webhook_secret},
+    )
+    return ThreadingHTTPServer((host, port), handler)
+
+
+class Command(BaseCommand):
+    """
+    Команда для запуска симулятора платежной системы с HTTP API шлюза. Задержка, доли сбоев, отказов и таймаутов
+    и ограничение пропускной способности задаются аргументами. Родитель: BaseCommand.
+    """
+
+    help = "Локальный симулятор платежной системы"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Метод для добавления аргументов команды."""
+
+        parser.add_argument("--host", default="0.0.0.0")
+        parser.add_argument("--port", type=int, default=8090)
+        parser.add_argument("--latency", type=float, default=0.2, help="Задержка, с")
+        parser.add_argument(
+            "--jitter", type=float, default=0.05, help="Разброс задержки, с"
+        )
+        parser.add_argument("--failure-rate", type=float, default=0.0)
+        parser.add_argument("--decline-rate", type=float, default=0.0)
+        parser.add_argument("--timeout-rate", type=float, default=0.0)
+        parser.add_argument(
+            "--timeout-delay", type=float, default=30.0, help="Время таймаута, с"
+        )
+        parser.add_argument(
+            "--rate-limit", type=float, default=0.0, help="Списаний в секунду"
+        )
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument(
+            "--webhook-secret",
+            default=settings.PAYMENT_WEBHOOK_SECRET,
+            help="Ключ подписи уведомлений",
+        )
+
+    def handle(self, *args, **options) -> None:
+        """Метод для запуска сервера симулятора."""
+
+        simulator = PaymentSimulator(
+            latency=options["latency"],
+            jitter=options["jitter"],
+            failure_rate=options["failure_rate"],
+            decline_rate=options["decline_rate"],
+            timeout_rate=options["timeout_rate"],
+            timeout_delay=options["timeout_delay"],
+            rate_limit=options["rate_limit"],
+            seed=options["seed"],
+        )
+        server = build_server(
+            options["host"], options["port"], simulator, options["webhook_secret"]
+        )
+        self.stdout.write(
+            "Симулятор платежной системы: http://{host}:{port}/charges".format(
+                host=options["host"], port=options["port"]
+            )
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
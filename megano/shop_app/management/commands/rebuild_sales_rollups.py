@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandParser
+from shop_app.analytics import rebuild_sales_rollups
+
+
+class Command(BaseCommand):
+    """
+    Команда для пересчета продаж по дням с начала. Нужна после первого развертывания таблиц продаж, чтобы учесть
+    заказы, оплаченные до их появления. Родитель: BaseCommand.
+    """
+
+    help = "Пересчет продаж по дням по всем оплаченным заказам"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Метод для добавления аргументов команды."""
+
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options) -> None:
+        """Метод для запуска команды."""
+
+        metrics = rebuild_sales_rollups(options["batch_size"])
+        self.stdout.write(
+            "Учтено оплаченных заказов: {orders}, пачек: {batches}".format(**metrics)
+        )
@@ -0,0 +1,126 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import fakeredis
+import redis
+from django.core.management.base import BaseCommand, CommandParser
+from shop_app.waiting_room import WaitingRoom
+
+
+class Command(BaseCommand):
+    """
+    Команда для нагрузочного тестирования комнаты ожидания. Имитирует одновременный приход тысяч клиентов на
+    оформление заказа к серверу с ограниченным количеством воркеров и сравнивает задержку оформления без комнаты
+    ожидания и с ней. Родитель: BaseCommand.
+    """
+
+    help = "Нагрузочный тест комнаты ожидания оформления заказов"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Метод для добавления аргументов команды."""
+
+        parser.add_argument("--clients", type=int, default=2000)
+        parser.add_argument("--workers", type=int, default=20)
+        parser.add_argument("--capacity", type=int, default=20)
+        parser.add_argument(
+            "--service-time", type=float, default=0.02, help="Время оформления, с"
+        )
+        parser.add_argument(
+            "--poll-interval", type=float, default=0.05, help="Интервал опроса, с"
+        )
+        parser.add_argument(
+            "--redis-url", default="", help="Адрес Redis (по умолчанию fakeredis)"
+        )
+
+    def checkout(self, workers: threading.Semaphore, service_time: float) -> float:
+        """Метод для имитации оформления заказа на сервере с ограниченным количеством воркеров."""
+
+        started = time.perf_counter()
+        with workers:
+            time.sleep(service_time)
+        return time.perf_counter() - started
+
+    def client(
+        self,
+        room: Optional[WaitingRoom],
+        workers: threading.Semaphore,
+        options: dict,
+    ) -> Tuple[float, float, int]:
+        """
+        Метод для имитации клиента. Возвращает задержку оформления, общее время с учетом ожидания в очереди и
+        начальную позицию в очереди.
+        """
+
+        started = time.perf_counter()
+        first_position = 0
+        token = None
+        if room is not None:
+            token = room.new_token("checkout")
+            position = first_position = room.enter(token)
+            while position:
+                # Клиенты в конце очереди опрашивают позицию реже
+                time.sleep(
+                    options["poll_interval"] * max(1, position / options["capacity"])
+                )
+                position = room.enter(token)
+        latency = self.checkout(workers, options["service_time"])
+        if token is not None:
+            room.leave(token)
+        return latency, time.perf_counter() - started, first_position
+
+    def run(self, room: Optional[WaitingRoom], options: dict) -> List[tuple]:
+        """Метод для одновременного запуска всех клиентов."""
+
+        workers = threading.Semaphore(options["workers"])
+        with ThreadPoolExecutor(max_workers=options["clients"]) as executor:
+            futures = [
+                executor.submit(self.client, room, workers, options)
+                for _ in range(options["clients"])
+            ]
+            return [future.result() for future in futures]
+
+    def report(self, title: str, results: List[tuple]) -> None:
+        """Метод для вывода задержек оформления."""
+
+        total = len(results)
+        latencies = sorted(result[0] for result in results)
+        durations = sorted(result[1] for result in results)
+        self.stdout.write(title)
+        self.stdout.write(
+            "  Задержка оформления p50: {p50:.0f} мс, p95: {p95:.0f} мс, max: {max:.0f} мс".format(
+                p50=latencies[total // 2] * 1000,
+                p95=latencies[int(total * 0.95)] * 1000,
+                max=latencies[-1] * 1000,
+            )
+        )
+        self.stdout.write(
+            "  Общее время p50: {p50:.0f} мс, p95: {p95:.0f} мс, max. позиция в очереди: {position}".format(
+                p50=durations[total // 2] * 1000,
+                p95=durations[int(total * 0.95)] * 1000,
+                position=max(result[2] for result in results),
+            )
+        )
+
+    def handle(self, *args, **options) -> None:
+        """Метод для запуска нагрузочного теста и вывода результатов."""
+
+        if options["redis_url"]:
+            client = redis.Redis.from_url(options["redis_url"])
+        else:
+            client = fakeredis.FakeRedis()
+        room = WaitingRoom(
+            client,
+            rooms={"checkout": options["capacity"]},
+            queue_timeout=max(30, options["clients"] * options["service_time"]),
+        )
+        self.stdout.write(
+            "Клиентов: {clients}, воркеров: {workers}, мест в комнате: {capacity}".format(
+                clients=options["clients"],
+                workers=options["workers"],
+                capacity=options["capacity"],
+            )
+        )
+        self.report("Без комнаты ожидания:", self.run(None, options))
+        self.report("С комнатой ожидания:", self.run(room, options))
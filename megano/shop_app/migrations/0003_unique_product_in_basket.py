@@ -0,0 +1,39 @@
+# Generated by Django 4.2.2 on 2026-10-18 23:34
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_duplicate_basket_lines(apps, schema_editor):
+    """Функция для объединения повторяющихся строк корзины перед созданием ограничения уникальности."""
+
+    ProductsInBasketCount = apps.get_model("shop_app", "ProductsInBasketCount")
+    duplicates = (
+        ProductsInBasketCount.objects.values("basket", "product")
+        .annotate(lines=Count("id"), total=Sum("count_in_basket"))
+        .filter(lines__gt=1)
+    )
+    for duplicate in duplicates:
+        lines = ProductsInBasketCount.objects.filter(
+            basket=duplicate["basket"], product=duplicate["product"]
+        ).order_by("id")
+        first = lines.first()
+        lines.exclude(id=first.id).delete()
+        first.count_in_basket = duplicate["total"]
+        first.save(update_fields=["count_in_basket"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop_app", "0002_alter_order_phone"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_basket_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="productsinbasketcount",
+            constraint=models.UniqueConstraint(
+                fields=("basket", "product"), name="unique_product_in_basket"
+            ),
+        ),
+    ]
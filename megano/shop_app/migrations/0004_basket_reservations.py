@@ -0,0 +1,42 @@
+# Generated by Django 4.2.2 on 2026-10-18 23:36
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def reserve_existing_basket_lines(apps, schema_editor):
+    """Функция для установки срока резерва товарам, добавленным в корзины до появления резервов."""
+
+    ProductsInBasketCount = apps.get_model("shop_app", "ProductsInBasketCount")
+    ProductsInBasketCount.objects.filter(count_in_basket__gt=0).update(
+        reserved_until=timezone.now()
+        + timedelta(seconds=settings.BASKET_RESERVATION_TTL)
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop_app", "0003_unique_product_in_basket"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productsinbasketcount",
+            name="reserved_until",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Товар зарезервирован до"
+            ),
+        ),
+        migrations.RunPython(reserve_existing_basket_lines, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="productsinbasketcount",
+            index=models.Index(
+                condition=models.Q(("count_in_basket__gt", 0)),
+                fields=["reserved_until"],
+                name="basket_reservation_expiry_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.2 on 2026-10-18 23:46
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop_app", "0004_basket_reservations"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="basket",
+            name="created_at",
+            field=models.DateTimeField(
+                auto_now_add=True,
+                default=django.utils.timezone.now,
+                verbose_name="Дата создания",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="basket",
+            index=models.Index(
+                condition=models.Q(("user__isnull", True)),
+                fields=["created_at"],
+                name="anonymous_basket_created_idx",
+            ),
+        ),
+    ]
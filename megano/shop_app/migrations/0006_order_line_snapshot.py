@@ -0,0 +1,48 @@
+# Generated by Django 4.2.2 on 2026-10-18 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop_app", "0005_basket_created_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productsinordercount",
+            name="price",
+            field=models.DecimalField(
+                decimal_places=2, max_digits=10, null=True, verbose_name="Цена"
+            ),
+        ),
+        migrations.AddField(
+            model_name="productsinordercount",
+            name="salePrice",
+            field=models.DecimalField(
+                decimal_places=2,
+                max_digits=10,
+                null=True,
+                verbose_name="Цена со скидкой",
+            ),
+        ),
+        migrations.AddField(
+            model_name="productsinordercount",
+            name="snapshot_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Дата сохранения товара в заказе"
+            ),
+        ),
+        migrations.AddField(
+            model_name="productsinordercount",
+            name="thumbnail",
+            field=models.CharField(
+                blank=True, max_length=255, verbose_name="Ссылка на изображение"
+            ),
+        ),
+        migrations.AddField(
+            model_name="productsinordercount",
+            name="title",
+            field=models.CharField(blank=True, max_length=50, verbose_name="Название"),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.2 on 2026-10-19 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop_app", "0006_order_line_snapshot"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["profile", "-createdAt", "-id"],
+                name="order_profile_created_idx",
+            ),
+        ),
+    ]
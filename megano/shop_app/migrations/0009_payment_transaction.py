@@ -0,0 +1,21 @@
+# Generated by Django 4.2.2 on 2026-10-19 00:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop_app", "0008_payment"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payment",
+            name="transaction",
+            field=models.CharField(
+                blank=True,
+                max_length=64,
+                verbose_name="Id транзакции платежной системы",
+            ),
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 4.2.2 on 2026-10-19 00:12
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop_app", "0009_payment_transaction"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IdempotencyKey",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "owner",
+                    models.CharField(max_length=64, verbose_name="Владелец ключа"),
+                ),
+                (
+                    "path",
+                    models.CharField(max_length=255, verbose_name="Адрес запроса"),
+                ),
+                (
+                    "key",
+                    models.CharField(
+                        max_length=255, verbose_name="Ключ идемпотентности"
+                    ),
+                ),
+                (
+                    "fingerprint",
+                    models.CharField(max_length=64, verbose_name="Хэш тела запроса"),
+                ),
+                (
+                    "status_code",
+                    models.PositiveSmallIntegerField(
+                        blank=True, null=True, verbose_name="Код ответа"
+                    ),
+                ),
+                (
+                    "response",
+                    models.JSONField(
+                        blank=True,
+                        encoder=django.core.serializers.json.DjangoJSONEncoder,
+                        null=True,
+                        verbose_name="Тело ответа",
+                    ),
+                ),
+                (
+                    "location",
+                    models.CharField(
+                        blank=True,
+                        max_length=255,
+                        verbose_name="Заголовок Location ответа",
+                    ),
+                ),
+                (
+                    "locked_until",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Срок выполнения запроса"
+                    ),
+                ),
+                (
+                    "expires_at",
+                    models.DateTimeField(verbose_name="Срок хранения ключа"),
+                ),
+            ],
+            options={
+                "verbose_name": "Ключ идемпотентности",
+                "verbose_name_plural": "Ключи идемпотентности",
+                "indexes": [
+                    models.Index(
+                        fields=["expires_at"], name="idempotency_key_expiry_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="idempotencykey",
+            constraint=models.UniqueConstraint(
+                fields=("owner", "path", "key"), name="unique_idempotency_key"
+            ),
+        ),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 4.2.2 on 2026-10-19 00:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Коды статусов заказа и их числовые значения в БД
+STATUS_CODES = {"created": 1, "confirmed": 2, "paid": 3}
+
+STATUS_CHOICES = [(1, "Создан"), (2, "Подтвержден"), (3, "Оплачен")]
+
+
+def statuses_to_numbers(apps, schema_editor):
+    """Функция для записи статусов заказов числами, по одному запросу на статус."""
+
+    Order = apps.get_model("shop_app", "Order")
+    for code, number in STATUS_CODES.items():
+        Order.objects.filter(status=code).update(status_number=number)
+
+
+def numbers_to_statuses(apps, schema_editor):
+    """Функция для записи статусов заказов кодами при откате миграции."""
+
+    Order = apps.get_model("shop_app", "Order")
+    for code, number in STATUS_CODES.items():
+        Order.objects.filter(status_number=number).update(status=code)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop_app", "0010_idempotency_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="status_number",
+            field=models.PositiveSmallIntegerField(
+                choices=STATUS_CHOICES, default=1, verbose_name="Статус"
+            ),
+        ),
+        migrations.RunPython(statuses_to_numbers, numbers_to_statuses),
+        migrations.RemoveField(
+            model_name="order",
+            name="status",
+        ),
+        migrations.RenameField(
+            model_name="order",
+            old_name="status_number",
+            new_name="status",
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                condition=models.Q(("status", 3)),
+                fields=["createdAt"],
+                name="order_paid_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                condition=models.Q(("status__in", [1, 2])),
+                fields=["createdAt"],
+                name="order_open_created_idx",
+            ),
+        ),
+        migrations.CreateModel(
+            name="OrderStatusHistory",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "from_status",
+                    models.PositiveSmallIntegerField(
+                        choices=STATUS_CHOICES, verbose_name="Прежний статус"
+                    ),
+                ),
+                (
+                    "to_status",
+                    models.PositiveSmallIntegerField(
+                        choices=STATUS_CHOICES, verbose_name="Новый статус"
+                    ),
+                ),
+                (
+                    "changed_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата перехода"
+                    ),
+                ),
+                (
+                    "order",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="status_history",
+                        to="shop_app.order",
+                        verbose_name="Заказ",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Переход статуса заказа",
+                "verbose_name_plural": "Переходы статусов заказов",
+            },
+        ),
+    ]
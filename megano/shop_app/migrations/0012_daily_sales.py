@@ -0,0 +1,218 @@
+# Generated by Django 4.2.2 on 2026-10-19 00:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog_app", "0003_product_flash_sale"),
+        ("shop_app", "0011_order_status_enum"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CategoryDailySales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="День")),
+                (
+                    "units",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Продано товаров"
+                    ),
+                ),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Выручка",
+                    ),
+                ),
+                (
+                    "orders",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Количество заказов"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Продажи категории за день",
+                "verbose_name_plural": "Продажи категорий по дням",
+            },
+        ),
+        migrations.CreateModel(
+            name="DeliveryDailySales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="День")),
+                (
+                    "units",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Продано товаров"
+                    ),
+                ),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Выручка",
+                    ),
+                ),
+                (
+                    "orders",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Количество заказов"
+                    ),
+                ),
+                (
+                    "deliveryType",
+                    models.CharField(max_length=20, verbose_name="Тип доставки"),
+                ),
+            ],
+            options={
+                "verbose_name": "Продажи по типу доставки за день",
+                "verbose_name_plural": "Продажи по типам доставки по дням",
+            },
+        ),
+        migrations.CreateModel(
+            name="ProductDailySales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="День")),
+                (
+                    "units",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Продано товаров"
+                    ),
+                ),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Выручка",
+                    ),
+                ),
+                (
+                    "orders",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Количество заказов"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Продажи товара за день",
+                "verbose_name_plural": "Продажи товаров по дням",
+            },
+        ),
+        migrations.CreateModel(
+            name="SalesWatermark",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        max_length=50, unique=True, verbose_name="Название"
+                    ),
+                ),
+                (
+                    "position",
+                    models.BigIntegerField(default=0, verbose_name="Id записи истории"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Дата изменения"),
+                ),
+            ],
+            options={
+                "verbose_name": "Отметка продаж по дням",
+                "verbose_name_plural": "Отметки продаж по дням",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="orderstatushistory",
+            index=models.Index(
+                condition=models.Q(("to_status", 3)),
+                fields=["id"],
+                name="order_history_paid_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="productdailysales",
+            name="product",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="daily_sales",
+                to="catalog_app.product",
+                verbose_name="Товар",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="deliverydailysales",
+            constraint=models.UniqueConstraint(
+                fields=("day", "deliveryType"), name="unique_delivery_daily_sales"
+            ),
+        ),
+        migrations.AddField(
+            model_name="categorydailysales",
+            name="category",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="daily_sales",
+                to="catalog_app.category",
+                verbose_name="Категория",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="productdailysales",
+            constraint=models.UniqueConstraint(
+                fields=("day", "product"), name="unique_product_daily_sales"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="categorydailysales",
+            constraint=models.UniqueConstraint(
+                fields=("day", "category"), name="unique_category_daily_sales"
+            ),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.2 on 2026-10-19 00:41
+
+from django.db import migrations, models
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+
+def number_attempts(apps, schema_editor):
+    """Функция для нумерации оплат каждого заказа в порядке создания."""
+
+    Payment = apps.get_model("shop_app", "Payment")
+    numbered = Payment.objects.annotate(
+        number=Window(RowNumber(), partition_by=[F("order_id")], order_by=F("pk").asc())
+    ).values_list("pk", "number")
+    for pk, number in numbered:
+        if number > 1:
+            Payment.objects.filter(pk=pk).update(attempt=number)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop_app", "0012_daily_sales"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payment",
+            name="attempt",
+            field=models.PositiveSmallIntegerField(
+                default=1, verbose_name="Номер попытки оплаты заказа"
+            ),
+        ),
+        migrations.RunPython(number_attempts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="payment",
+            constraint=models.UniqueConstraint(
+                fields=("order", "attempt"), name="unique_payment_attempt"
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.2 on 2026-10-19 01:06
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_descriptions(apps, schema_editor):
+    """Функция для записи описания товара в строки заказов, снимок которых записан без описания, одним запросом."""
+
+    Product = apps.get_model("catalog_app", "Product")
+    ProductsInOrderCount = apps.get_model("shop_app", "ProductsInOrderCount")
+    ProductsInOrderCount.objects.filter(snapshot_at__isnull=False).update(
+        description=Subquery(
+            Product.objects.filter(pk=OuterRef("product_id")).values("description")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog_app", "0003_product_flash_sale"),
+        ("shop_app", "0013_payment_attempt"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productsinordercount",
+            name="description",
+            field=models.CharField(blank=True, max_length=200, verbose_name="Описание"),
+        ),
+        migrations.RunPython(fill_descriptions, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,11 @@
-from catalog_app.models import Product
+from catalog_app.models import Category, Product
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from users_app.models import Profile
 
+from megano.cache_registry import InvalidatingQuerySet
+
 
 class Basket(models.Model):
     """Модель корзины с товарами. Родитель: Model."""
@@ -15,6 +18,7 @@ class Basket(models.Model):
         verbose_name="Пользователь",
     )
     session_id = models.CharField(null=True, max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     products = models.ManyToManyField(
         Product,
         through="ProductsInBasketCount",
@@ -31,6 +35,13 @@ class Basket(models.Model):
     class Meta:
         verbose_name = "Корзина"
         verbose_name_plural = "Корзины"
+        indexes = [
+            models.Index(
+                fields=["created_at"],
+                name="anonymous_basket_created_idx",
+                condition=models.Q(user__isnull=True),
+            )
+        ]
 
 
 class ProductsInBasketCount(models.Model):
@@ -51,6 +62,9 @@ class ProductsInBasketCount(models.Model):
     count_in_basket = models.PositiveSmallIntegerField(
         default=0, verbose_name="Количество товаров в корзине"
     )
+    reserved_until = models.DateTimeField(
+        null=True, blank=True, verbose_name="Товар зарезервирован до"
+    )
 
     def __str__(self) -> str:
         """Метод для вывода количества товаров в корзине в качестве названия модели."""
@@ -63,6 +77,32 @@ class ProductsInBasketCount(models.Model):
     class Meta:
         verbose_name = "Количество товаров в корзине"
         verbose_name_plural = "Количества товаров в корзине"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["basket", "product"], name="unique_product_in_basket"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["reserved_until"],
+                name="basket_reservation_expiry_idx",
+                condition=models.Q(count_in_basket__gt=0),
+            )
+        ]
+
+
+class OrderStatus(models.IntegerChoices):
+    """Статусы заказа. В БД статус хранится числом, в API передается кодом статуса. Родитель: IntegerChoices."""
+
+    CREATED = 1, "Создан"
+    CONFIRMED = 2, "Подтвержден"
+    PAID = 3, "Оплачен"
+
+    @property
+    def code(self) -> str:
+        """Метод для получения кода статуса в API."""
+
+        return self.name.lower()
 
 
 class Order(models.Model):
@@ -77,7 +117,9 @@ class Order(models.Model):
     totalCost = models.DecimalField(
         decimal_places=2, max_digits=10, null=True, verbose_name="Итоговая стоимость"
     )
-    status = models.CharField(max_length=20, default="created", verbose_name="Статус")
+    status = models.PositiveSmallIntegerField(
+        choices=OrderStatus.choices, default=OrderStatus.CREATED, verbose_name="Статус"
+    )
     city = models.CharField(max_length=50, verbose_name="Город")
     address = models.CharField(max_length=150, verbose_name="Адрес")
     products = models.ManyToManyField(
@@ -98,6 +140,62 @@ class Order(models.Model):
         verbose_name = "Заказ"
         verbose_name_plural = "Заказы"
         ordering = ["-createdAt"]
+        indexes = [
+            models.Index(
+                fields=["profile", "-createdAt", "-id"],
+                name="order_profile_created_idx",
+            ),
+            models.Index(
+                fields=["createdAt"],
+                name="order_paid_created_idx",
+                condition=models.Q(status=OrderStatus.PAID),
+            ),
+            models.Index(
+                fields=["createdAt"],
+                name="order_open_created_idx",
+                condition=models.Q(
+                    status__in=[OrderStatus.CREATED, OrderStatus.CONFIRMED]
+                ),
+            ),
+        ]
+
+
+class OrderStatusHistory(models.Model):
+    """Модель перехода заказа из одного статуса в другой. Родитель: Model."""
+
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name="status_history",
+        verbose_name="Заказ",
+    )
+    from_status = models.PositiveSmallIntegerField(
+        choices=OrderStatus.choices, verbose_name="Прежний статус"
+    )
+    to_status = models.PositiveSmallIntegerField(
+        choices=OrderStatus.choices, verbose_name="Новый статус"
+    )
+    changed_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата перехода")
+
+    def __str__(self) -> str:
+        """Метод для вывода названия перехода."""
+
+        return "Заказ № {order}: {from_status} -> {to_status}".format(
+            order=self.order_id,
+            from_status=self.get_from_status_display(),
+            to_status=self.get_to_status_display(),
+        )
+
+    class Meta:
+        verbose_name = "Переход статуса заказа"
+        verbose_name_plural = "Переходы статусов заказов"
+        indexes = [
+            models.Index(
+                fields=["id"],
+                name="order_history_paid_idx",
+                condition=models.Q(to_status=OrderStatus.PAID),
+            )
+        ]
 
 
 class ProductsInOrderCount(models.Model):
@@ -118,12 +216,116 @@ class ProductsInOrderCount(models.Model):
     count_in_order = models.PositiveSmallIntegerField(
         default=0, verbose_name="Количество товаров в заказе"
     )
+    title = models.CharField(max_length=50, blank=True, verbose_name="Название")
+    description = models.CharField(max_length=200, blank=True, verbose_name="Описание")
+    price = models.DecimalField(
+        decimal_places=2, max_digits=10, null=True, verbose_name="Цена"
+    )
+    salePrice = models.DecimalField(
+        decimal_places=2, max_digits=10, null=True, verbose_name="Цена со скидкой"
+    )
+    thumbnail = models.CharField(
+        max_length=255, blank=True, verbose_name="Ссылка на изображение"
+    )
+    snapshot_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Дата сохранения товара в заказе"
+    )
 
     class Meta:
         verbose_name = "Количество товаров в заказе"
         verbose_name_plural = "Количества товаров в заказе"
 
 
+class Payment(models.Model):
+    """Модель оплаты заказа. Родитель: Model."""
+
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name="payments",
+        verbose_name="Заказ",
+    )
+    attempt = models.PositiveSmallIntegerField(
+        default=1, verbose_name="Номер попытки оплаты заказа"
+    )
+    status = models.CharField(max_length=20, default="pending", verbose_name="Статус")
+    error = models.CharField(max_length=150, blank=True, verbose_name="Ошибка")
+    transaction = models.CharField(
+        max_length=64, blank=True, verbose_name="Id транзакции платежной системы"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+
+    def __str__(self) -> str:
+        """Метод для вывода названия оплаты."""
+
+        return "Оплата заказа № {order}: {status}".format(
+            order=self.order_id, status=self.status
+        )
+
+    @property
+    def idempotency_key(self) -> str:
+        """
+        Метод для получения ключа идемпотентности списания в платежном шлюзе. Ключ определяется заказом и номером
+        попытки оплаты, поэтому все запросы списания по одной попытке шлюз выполняет не больше одного раза.
+        """
+
+        return "order-{order}-attempt-{attempt}".format(
+            order=self.order_id, attempt=self.attempt
+        )
+
+    class Meta:
+        verbose_name = "Оплата"
+        verbose_name_plural = "Оплаты"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["order", "attempt"], name="unique_payment_attempt"
+            )
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """
+    Модель ключа идемпотентности POST-запроса. Ключ выполняющегося запроса хранится без ответа до locked_until,
+    ключ выполненного запроса хранится вместе с ответом до expires_at. Родитель: Model.
+    """
+
+    owner = models.CharField(max_length=64, verbose_name="Владелец ключа")
+    path = models.CharField(max_length=255, verbose_name="Адрес запроса")
+    key = models.CharField(max_length=255, verbose_name="Ключ идемпотентности")
+    fingerprint = models.CharField(max_length=64, verbose_name="Хэш тела запроса")
+    status_code = models.PositiveSmallIntegerField(
+        null=True, blank=True, verbose_name="Код ответа"
+    )
+    response = models.JSONField(
+        null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name="Тело ответа"
+    )
+    location = models.CharField(
+        max_length=255, blank=True, verbose_name="Заголовок Location ответа"
+    )
+    locked_until = models.DateTimeField(
+        null=True, blank=True, verbose_name="Срок выполнения запроса"
+    )
+    expires_at = models.DateTimeField(verbose_name="Срок хранения ключа")
+
+    def __str__(self) -> str:
+        """Метод для вывода названия ключа идемпотентности."""
+
+        return "Ключ идемпотентности {key}: {path}".format(key=self.key, path=self.path)
+
+    class Meta:
+        verbose_name = "Ключ идемпотентности"
+        verbose_name_plural = "Ключи идемпотентности"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "path", "key"], name="unique_idempotency_key"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["expires_at"], name="idempotency_key_expiry_idx")
+        ]
+
+
 class DeliveryPrice(models.Model):
     """Модель стоимости доставки. Родитель: Model."""
 
@@ -134,6 +336,8 @@ class DeliveryPrice(models.Model):
         decimal_places=2, max_digits=10, verbose_name="Стоимость"
     )
 
+    objects = InvalidatingQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Стоимость доставки"
         verbose_name_plural = "Стоимость доставки"
@@ -146,6 +350,94 @@ class ExpressDeliveryPrice(models.Model):
         decimal_places=2, max_digits=10, verbose_name="Стоимость"
     )
 
+    objects = InvalidatingQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Стоимость экспресс доставки"
         verbose_name_plural = "Стоимость экспресс доставки"
+
+
+class DailySales(models.Model):
+    """Абстрактная модель продаж за день: количество товаров, выручка и количество заказов. Родитель: Model."""
+
+    day = models.DateField(verbose_name="День")
+    units = models.PositiveIntegerField(default=0, verbose_name="Продано товаров")
+    revenue = models.DecimalField(
+        decimal_places=2, max_digits=14, default=0, verbose_name="Выручка"
+    )
+    orders = models.PositiveIntegerField(default=0, verbose_name="Количество заказов")
+
+    class Meta:
+        abstract = True
+
+
+class ProductDailySales(DailySales):
+    """Модель продаж товара за день. Родитель: DailySales."""
+
+    product = models.ForeignKey(
+        Product,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name="daily_sales",
+        verbose_name="Товар",
+    )
+
+    class Meta:
+        verbose_name = "Продажи товара за день"
+        verbose_name_plural = "Продажи товаров по дням"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "product"], name="unique_product_daily_sales"
+            )
+        ]
+
+
+class CategoryDailySales(DailySales):
+    """Модель продаж категории товаров за день. Родитель: DailySales."""
+
+    category = models.ForeignKey(
+        Category,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name="daily_sales",
+        verbose_name="Категория",
+    )
+
+    class Meta:
+        verbose_name = "Продажи категории за день"
+        verbose_name_plural = "Продажи категорий по дням"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "category"], name="unique_category_daily_sales"
+            )
+        ]
+
+
+class DeliveryDailySales(DailySales):
+    """Модель продаж с типом доставки за день. Выручка включает стоимость доставки. Родитель: DailySales."""
+
+    deliveryType = models.CharField(max_length=20, verbose_name="Тип доставки")
+
+    class Meta:
+        verbose_name = "Продажи по типу доставки за день"
+        verbose_name_plural = "Продажи по типам доставки по дням"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "deliveryType"], name="unique_delivery_daily_sales"
+            )
+        ]
+
+
+class SalesWatermark(models.Model):
+    """
+    Модель отметки обработанных оплат заказов: id последней записи истории статусов, учтенной в продажах по дням.
+    Родитель: Model.
+    """
+
+    name = models.CharField(max_length=50, unique=True, verbose_name="Название")
+    position = models.BigIntegerField(default=0, verbose_name="Id записи истории")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+
+    class Meta:
+        verbose_name = "Отметка продаж по дням"
+        verbose_name_plural = "Отметки продаж по дням"
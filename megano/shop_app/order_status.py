@@ -0,0 +1,62 @@
+"""
+Переходы заказа между статусами.
+
+Статус заказа меняется только по разрешенным переходам TRANSITIONS. Переход выполняется запросом UPDATE с условием
+на прежний статус (compare-and-set), поэтому из параллельных подтверждений или оплат одного заказа переход
+выполняет только один запрос. Каждый переход записывается в историю статусов заказа.
+"""
+
+from django.db import transaction
+from shop_app.models import Order, OrderStatus, OrderStatusHistory
+
+# Разрешенные переходы: статус заказа и статусы, в которые заказ может перейти из него
+TRANSITIONS = {
+    OrderStatus.CREATED: (OrderStatus.CONFIRMED,),
+    OrderStatus.CONFIRMED: (OrderStatus.PAID,),
+    OrderStatus.PAID: (),
+}
+
+
+class OrderTransitionError(Exception):
+    """Исключение для перехода заказа в статус, не разрешенный из текущего статуса. Родитель: Exception."""
+
+    def __init__(self, order: Order, status: OrderStatus) -> None:
+        """Метод для создания исключения с заказом и статусом, в который заказ не может перейти."""
+
+        self.order = order
+        self.status = status
+        super().__init__(
+            "Заказ № {order} в статусе {current} не может перейти в статус {status}".format(
+                order=order.pk,
+                current=OrderStatus(order.status).code,
+                status=OrderStatus(status).code,
+            )
+        )
+
+
+def transition_order(order: Order, status: OrderStatus, **fields) -> OrderStatus:
+    """
+    Функция для перехода заказа в статус status с записью полей fields. Прежний статус берется из order, если
+    статус заказа изменился параллельным запросом, статус перечитывается из БД и переход повторяется. После перехода
+    статус и поля записываются в order. Возвращает прежний статус. Если переход из текущего статуса не разрешен,
+    выбрасывается исключение OrderTransitionError.
+    """
+
+    while True:
+        current = OrderStatus(order.status)
+        if status not in TRANSITIONS[current]:
+            raise OrderTransitionError(order, status)
+        with transaction.atomic():
+            updated = Order.objects.filter(pk=order.pk, status=current).update(
+                status=status, **fields
+            )
+            if updated:
+                OrderStatusHistory.objects.create(
+                    order_id=order.pk, from_status=current, to_status=status
+                )
+        if updated:
+            order.status = status
+            for field, value in fields.items():
+                setattr(order, field, value)
+            return current
+        order.status = Order.objects.values_list("status", flat=True).get(pk=order.pk)
@@ -0,0 +1,172 @@
+"""
+События оплаты заказов.
+
+Оплата выполняется воркером celery, представление оплаты сразу возвращает id оплаты. Воркер публикует изменения
+статуса оплаты в канал Redis, а асинхронное представление передает их клиенту потоком Server-Sent Events. Без Redis
+поток передает текущий статус оплаты и закрывается, клиент переподключается через интервал retry.
+"""
+
+import json
+import logging
+import time
+from datetime import timedelta
+from typing import AsyncIterator, Dict, Optional
+
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from shop_app.gateway import GatewayError, PaymentGateway, charge_result
+from shop_app.models import Order, OrderStatus, Payment
+from shop_app.order_status import OrderTransitionError, transition_order
+from shop_app.serializers import PaymentStatusSerializer
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_CHANNEL = "payment:{payment}"
+
+# Статусы, после которых статус оплаты больше не меняется
+FINAL_STATUSES = ("paid", "failed")
+
+UNAVAILABLE_ERROR = "Платежная система недоступна"
+
+
+def payment_status(payment: Payment) -> Dict:
+    """Функция для получения статуса оплаты в формате ответа API."""
+
+    return dict(PaymentStatusSerializer(payment).data)
+
+
+_client = None
+
+
+def get_payment_events_client() -> Optional[redis.Redis]:
+    """Функция для получения клиента Redis для событий оплаты. Пустой адрес Redis отключает публикацию событий."""
+
+    global _client
+    if not settings.PAYMENT_EVENTS_REDIS_URL:
+        return None
+    if _client is None:
+        _client = redis.Redis.from_url(settings.PAYMENT_EVENTS_REDIS_URL)
+    return _client
+
+
+def publish_payment_status(payment: Payment) -> None:
+    """Функция для публикации статуса оплаты подписчикам. Ошибка Redis не прерывает оплату."""
+
+    client = get_payment_events_client()
+    if client is None:
+        return
+    try:
+        client.publish(
+            PAYMENT_CHANNEL.format(payment=payment.pk),
+            json.dumps(payment_status(payment)),
+        )
+    except redis.RedisError as error:
+        logger.warning(
+            "Не удалось опубликовать статус оплаты %s: %s", payment.pk, error
+        )
+
+
+def apply_payment_result(payment_id: int, result: Dict) -> Optional[Payment]:
+    """
+    Функция для записи результата списания из ответа или уведомления платежного шлюза. Окончательный статус
+    записывается только в оплату в статусе "pending", поэтому повторные уведомления шлюза не меняют оплату. Статус
+    публикуется подписчикам после фиксации транзакции. Возвращает оплату или None, если оплата не найдена.
+    """
+
+    with transaction.atomic():
+        payment = Payment.objects.select_for_update().filter(pk=payment_id).first()
+        if (
+            payment is None
+            or payment.status in FINAL_STATUSES
+            or result["status"] not in FINAL_STATUSES
+        ):
+            return payment
+        payment.status = result["status"]
+        payment.transaction = result.get("transaction", "")
+        payment.error = result.get("error", "")
+        payment.save(update_fields=["status", "transaction", "error", "updated_at"])
+        if payment.status == "paid":
+            order = Order.objects.only("status").get(pk=payment.order_id)
+            try:
+                transition_order(order, OrderStatus.PAID)
+            except OrderTransitionError as error:
+                logger.warning("Оплата %s: %s", payment.pk, error)
+        transaction.on_commit(lambda: publish_payment_status(payment))
+    return payment
+
+
+def reconcile_pending_payments(gateway: PaymentGateway, age: float, batch: int) -> int:
+    """
+    Функция для сверки с платежным шлюзом до batch оплат, которые остаются в статусе "pending" дольше age секунд,
+    например после таймаута шлюза или потерянного уведомления. Результат списания запрашивается у шлюза по ключу
+    идемпотентности оплаты. Окончательный результат записывается в оплату, оплата, запрос списания которой шлюз не
+    получал, отмечается неуспешной, а при ошибке шлюза остается в статусе "pending" до следующей сверки. Возвращает
+    количество оплат с окончательным статусом.
+    """
+
+    stale = Payment.objects.filter(
+        status="pending", created_at__lt=timezone.now() - timedelta(seconds=age)
+    ).order_by("pk")[:batch]
+    resolved = 0
+    for payment in stale:
+        try:
+            result = gateway.status(payment.idempotency_key)
+        except GatewayError as error:
+            logger.warning("Не удалось сверить оплату %s: %s", payment.pk, error)
+            continue
+        if result is None:
+            result = charge_result("failed", error=UNAVAILABLE_ERROR)
+        if result["status"] in FINAL_STATUSES:
+            apply_payment_result(payment.pk, result)
+            resolved += 1
+    return resolved
+
+
+def sse_event(data: Dict, retry: Optional[int] = None) -> str:
+    """Функция для записи статуса оплаты в формате события Server-Sent Events."""
+
+    event = "event: status\ndata: {data}\n\n".format(data=json.dumps(data))
+    if retry is not None:
+        event = "retry: {retry}\n{event}".format(retry=retry, event=event)
+    return event
+
+
+async def payment_events(payment_id: int) -> AsyncIterator[str]:
+    """
+    Функция для получения потока событий оплаты. Подписка на канал оформляется до чтения текущего статуса, поэтому
+    изменения статуса между чтением и подпиской не теряются. Поток закрывается после окончательного статуса или
+    через PAYMENT_EVENTS_TIMEOUT секунд, в паузах передаются комментарии, чтобы прокси не закрывали соединение.
+    """
+
+    retry = int(settings.PAYMENT_EVENTS_RETRY * 1000)
+    if not settings.PAYMENT_EVENTS_REDIS_URL:
+        payment = await Payment.objects.aget(pk=payment_id)
+        yield sse_event(payment_status(payment), retry)
+        return
+    channel = PAYMENT_CHANNEL.format(payment=payment_id)
+    client = redis.asyncio.Redis.from_url(settings.PAYMENT_EVENTS_REDIS_URL)
+    pubsub = client.pubsub()
+    try:
+        await pubsub.subscribe(channel)
+        payment = await Payment.objects.aget(pk=payment_id)
+        data = payment_status(payment)
+        yield sse_event(data, retry)
+        deadline = time.monotonic() + settings.PAYMENT_EVENTS_TIMEOUT
+        while data["status"] not in FINAL_STATUSES and time.monotonic() < deadline:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True,
+                timeout=settings.PAYMENT_EVENTS_HEARTBEAT,
+            )
+            if message is None:
+                yield ": heartbeat\n\n"
+                continue
+            data = json.loads(message["data"])
+            yield sse_event(data)
+    finally:
+        await pubsub.unsubscribe(channel)
+        await pubsub.close()
+        await client.close()
@@ -0,0 +1,187 @@
+"""
+Расчет стоимости корзины и заказов.
+
+Стоимость товаров, скидки по действующим акциям, стоимость обычной и экспресс доставки считаются по одним правилам
+для предпросмотра корзины, подтверждения заказа и пересчета пачки заказов. Стоимость доставки читается из кэша
+delivery_prices, который сбрасывается при изменении стоимости доставки в админке. Стоимость товаров корзины или
+пачки заказов считается одним агрегирующим запросом, все суммы считаются в Decimal и округляются до копеек.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Iterable, Optional, Tuple
+
+from catalog_app.models import Product
+from django.db.models import Case, DecimalField, F, Q, Sum, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from shop_app.cache import delivery_prices
+from shop_app.models import (
+    Basket,
+    DeliveryPrice,
+    ExpressDeliveryPrice,
+    ProductsInBasketCount,
+    ProductsInOrderCount,
+)
+
+CENT = Decimal("0.01")
+
+PRICE_FIELD = DecimalField(max_digits=12, decimal_places=2)
+
+DeliveryPrices = Tuple[Optional[DeliveryPrice], Optional[ExpressDeliveryPrice]]
+
+
+def money(value: Decimal) -> Decimal:
+    """Функция для округления суммы до копеек."""
+
+    return Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def sale_price(product: str = "") -> Case:
+    """
+    Функция для получения выражения цены товара с учетом скидки, которая действует сегодня. product - путь к товару
+    от модели запроса, например "product__".
+    """
+
+    today = timezone.localdate()
+    return Case(
+        When(
+            Q(**{product + "sale__dateFrom__lte": today})
+            & Q(**{product + "sale__dateTo__gte": today}),
+            then=F(product + "sale__salePrice"),
+        ),
+        default=F(product + "price"),
+        output_field=PRICE_FIELD,
+    )
+
+
+def line_sums(count: str, price, unit_price) -> Dict:
+    """Функция для получения выражений стоимости товаров и скидки для агрегирующего запроса по строкам."""
+
+    return {
+        "subtotal": Coalesce(
+            Sum(F(count) * price, output_field=PRICE_FIELD), Decimal(0)
+        ),
+        "discount": Coalesce(
+            Sum(F(count) * (price - unit_price), output_field=PRICE_FIELD), Decimal(0)
+        ),
+    }
+
+
+def price_totals(
+    subtotal: Decimal,
+    discount: Decimal,
+    delivery_type: str,
+    prices: Optional[DeliveryPrices] = None,
+) -> Dict:
+    """
+    Функция для расчета стоимости доставки и итоговой стоимости по стоимости товаров и скидке. Обычная доставка
+    бесплатна, если стоимость товаров со скидкой не меньше порога бесплатной доставки, экспресс доставка
+    оплачивается всегда.
+    """
+
+    delivery_price, express_delivery_price = prices or delivery_prices.get()
+    goods = subtotal - discount
+    delivery = express = Decimal(0)
+    if (
+        goods
+        and delivery_price is not None
+        and goods < delivery_price.free_delivery_point
+    ):
+        delivery = delivery_price.price
+    if delivery_type == "express" and express_delivery_price is not None:
+        express = express_delivery_price.price
+    return {
+        "subtotal": money(subtotal),
+        "discount": money(discount),
+        "delivery": money(delivery),
+        "express": money(express),
+        "total": money(goods + delivery + express),
+    }
+
+
+def price_lines(
+    lines: Iterable[Tuple[Decimal, Optional[Decimal], int]],
+    delivery_type: str,
+    prices: Optional[DeliveryPrices] = None,
+) -> Dict:
+    """
+    Функция для расчета стоимости строк, загруженных в память. Строка - цена, цена со скидкой (None - без скидки)
+    и количество товара.
+    """
+
+    subtotal = discount = Decimal(0)
+    for price, discounted, count in lines:
+        subtotal += price * count
+        if discounted is not None:
+            discount += (price - discounted) * count
+    return price_totals(subtotal, discount, delivery_type, prices)
+
+
+def basket_totals(basket: Optional[Basket], delivery_type: str = "ordinary") -> Dict:
+    """
+    Функция для расчета стоимости корзины в БД одним агрегирующим запросом. Возвращает количество товаров и
+    стоимость корзины.
+    """
+
+    sums = {"count": 0, "subtotal": Decimal(0), "discount": Decimal(0)}
+    if basket is not None:
+        sums = ProductsInBasketCount.objects.filter(
+            basket=basket, count_in_basket__gt=0
+        ).aggregate(
+            count=Coalesce(Sum("count_in_basket"), 0),
+            **line_sums("count_in_basket", F("product__price"), sale_price("product__"))
+        )
+    totals = price_totals(sums["subtotal"], sums["discount"], delivery_type)
+    return dict(totals, count=sums["count"])
+
+
+def cookie_basket_totals(
+    lines: Dict[int, int], delivery_type: str = "ordinary"
+) -> Dict:
+    """
+    Функция для расчета стоимости корзины из cookie одним запросом к товарам. Количество товара ограничивается
+    остатком на складе. Возвращает количество товаров и стоимость корзины.
+    """
+
+    products = Product.objects.filter(pk__in=list(lines), count__gt=0).values_list(
+        "pk", "count", "price", sale_price()
+    )
+    priced = [
+        (price, unit_price, min(lines[product_id], stock))
+        for product_id, stock, price, unit_price in products
+    ]
+    totals = price_lines(priced, delivery_type)
+    return dict(totals, count=sum(count for _, _, count in priced))
+
+
+def order_totals(order_ids: Iterable[int]) -> Dict[int, Dict]:
+    """
+    Функция для расчета стоимости пачки заказов одним агрегирующим запросом. Строки со снимком считаются по ценам
+    снимка, строки без снимка - по текущим ценам товаров с учетом действующих скидок. Возвращает стоимость
+    по id заказа.
+    """
+
+    snapshot = Q(snapshot_at__isnull=False)
+    price = Case(
+        When(snapshot, then=F("price")),
+        default=F("product__price"),
+        output_field=PRICE_FIELD,
+    )
+    unit_price = Case(
+        When(snapshot, then=Coalesce("salePrice", "price")),
+        default=sale_price("product__"),
+        output_field=PRICE_FIELD,
+    )
+    rows = (
+        ProductsInOrderCount.objects.filter(order__in=list(order_ids))
+        .values("order", "order__deliveryType")
+        .annotate(**line_sums("count_in_order", price, unit_price))
+        .order_by()
+    )
+    prices = delivery_prices.get()
+    return {
+        row["order"]: price_totals(
+            row["subtotal"], row["discount"], row["order__deliveryType"], prices
+        )
+        for row in rows
+    }
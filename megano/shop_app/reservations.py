@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+from typing import Dict
+
+from catalog_app.models import Product
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Case,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from shop_app.models import ProductsInBasketCount
+
+
+def reservation_deadline() -> datetime:
+    """Функция для получения времени окончания резерва товара, добавленного в корзину."""
+
+    return timezone.now() + timedelta(seconds=settings.BASKET_RESERVATION_TTL)
+
+
+def return_to_stock(lines: QuerySet) -> int:
+    """
+    Функция для возврата на склад товаров из строк корзин одним запросом UPDATE независимо от количества строк и
+    товаров. Возвращает количество обновленных продуктов.
+    """
+
+    returned_counts = (
+        lines.filter(product=OuterRef("pk"))
+        .values("product")
+        .annotate(returned=Sum("count_in_basket"))
+        .values("returned")
+    )
+    return Product.objects.filter(pk__in=lines.values("product")).update(
+        count=F("count") + Subquery(returned_counts)
+    )
+
+
+def release_expired_reservations(batch_size: int = 500) -> int:
+    """
+    Функция для возврата на склад товаров из просроченных резервов корзин. Строки корзин обрабатываются пачками:
+    на каждую пачку выполняется три запроса (блокировка строк, возврат остатков, обнуление строк) независимо от
+    количества строк. Заблокированные параллельными запросами строки пропускаются до следующего запуска.
+    """
+
+    released = 0
+    while True:
+        with transaction.atomic():
+            line_pks = list(
+                ProductsInBasketCount.objects.filter(
+                    count_in_basket__gt=0, reserved_until__lt=timezone.now()
+                )
+                .select_for_update(skip_locked=True)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not line_pks:
+                break
+            lines = ProductsInBasketCount.objects.filter(pk__in=line_pks)
+            return_to_stock(lines)
+            lines.update(count_in_basket=0, reserved_until=None)
+        released += len(line_pks)
+        if len(line_pks) < batch_size:
+            break
+    return released
+
+
+def annotate_stock(products: QuerySet) -> QuerySet:
+    """
+    Функция для добавления к QuerySet продуктов остатков на складе. count - доступный остаток (без товаров в
+    корзинах), reserved_count - товары в действующих резервах корзин, on_hand_count - товары на складе с учетом
+    резервов, available_count - товары на складе за вычетом действующих резервов (просроченные, но еще не
+    возвращенные резервы считаются доступными).
+    """
+
+    now = timezone.now()
+    return products.annotate(
+        reserved_count=Coalesce(
+            Sum(
+                "products_in_basket_count__count_in_basket",
+                filter=Q(products_in_basket_count__reserved_until__gte=now),
+            ),
+            0,
+        ),
+        held_count=Coalesce(
+            Sum(
+                "products_in_basket_count__count_in_basket",
+                filter=Q(products_in_basket_count__reserved_until__isnull=False),
+            ),
+            0,
+        ),
+    ).annotate(
+        on_hand_count=F("count") + F("held_count"),
+        available_count=F("on_hand_count") - F("reserved_count"),
+    )
+
+
+def delta_case(deltas: Dict[int, int], field: str = "pk") -> Case:
+    """Функция для получения выражения CASE, которое выбирает изменение количества по id товара."""
+
+    return Case(
+        *[
+            When(**{field: product_id}, then=Value(delta))
+            for product_id, delta in deltas.items()
+        ],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
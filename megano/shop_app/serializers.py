@@ -1,10 +1,26 @@
 import time
+from collections import defaultdict
 from datetime import datetime
 from typing import Dict, List
 
 from catalog_app.serializers import ProductListSerializer
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
-from shop_app.models import Order, Product
+from shop_app.models import (
+    CategoryDailySales,
+    DeliveryDailySales,
+    Order,
+    OrderStatus,
+    Payment,
+    Product,
+    ProductDailySales,
+    ProductsInBasketCount,
+    ProductsInOrderCount,
+)
+from shop_app.reservations import delta_case
+from shop_app.snapshots import snapshot_line
 
 
 class ProductInBasketListSerializer(ProductListSerializer):
@@ -15,10 +31,11 @@ class ProductInBasketListSerializer(ProductListSerializer):
     def get_count(self, obj: Product) -> int:
         """Метод для получения количества товара в корзине."""
 
-        products_in_basket_count = obj.products_in_basket_count.get(
-            basket=self.context["basket"]
-        )
-        return products_in_basket_count.count_in_basket
+        counts = self.context.get("counts")
+        if counts is not None:
+            # Корзина анонимного пользователя хранится в cookie
+            return counts[obj.pk]
+        return obj.count_in_basket
 
 
 class ProductUpdateBasketSerializer(serializers.ModelSerializer):
@@ -31,45 +48,204 @@ class ProductUpdateBasketSerializer(serializers.ModelSerializer):
         fields = ["id", "count"]
 
 
-class ProductInOrderListSerializer(ProductListSerializer):
-    """Сериалайзер для отображения списка товаров в заказе. Родитель: ProductListSerializer."""
+class BasketChangeSerializer(serializers.Serializer):
+    """
+    Сериалайзер для изменения количества товара в корзине: положительное количество добавляется в корзину,
+    отрицательное удаляется из корзины. Родитель: Serializer.
+    """
 
-    count = serializers.SerializerMethodField()
+    id = serializers.IntegerField()
+    count = serializers.IntegerField()
 
-    def get_count(self, obj: Product) -> int:
-        """Метод для получения количества товара в заказе."""
+    def validate_count(self, value: int) -> int:
+        """Метод для валидации изменения количества товара."""
+
+        if value:
+            return value
+        raise serializers.ValidationError("Количество товара не изменяется!")
+
+
+class BasketSummarySerializer(serializers.Serializer):
+    """Сериалайзер для отображения количества товаров в корзине и их стоимости. Родитель: Serializer."""
+
+    count = serializers.IntegerField()
+    subtotal = serializers.DecimalField(max_digits=12, decimal_places=2)
 
-        products_in_order_count = obj.products_in_order_count.filter(
-            order__in=self.context["orders"]
-        ).first()
-        return products_in_order_count.count_in_order
 
+class BasketPreviewSerializer(BasketSummarySerializer):
+    """
+    Сериалайзер для отображения стоимости корзины со скидками и стоимостью доставки. Родитель:
+    BasketSummarySerializer.
+    """
 
-class OrderCreateSerializer(serializers.ModelSerializer):
-    """Сериалайзер для создания заказа. Родитель: ModelSerializer."""
+    discount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    delivery = serializers.DecimalField(max_digits=12, decimal_places=2)
+    express = serializers.DecimalField(max_digits=12, decimal_places=2)
+    total = serializers.DecimalField(max_digits=12, decimal_places=2)
 
-    products = ProductListSerializer(many=True)
+
+class OrderLineImageSerializer(serializers.Serializer):
+    """Сериалайзер изображения товара в заказе. Родитель: Serializer."""
+
+    src = serializers.CharField()
+    alt = serializers.CharField()
+
+
+class ProductInOrderListSerializer(serializers.ModelSerializer):
+    """
+    Сериалайзер для отображения списка товаров в заказе из снимков товаров в строках заказа. Строки без снимка
+    выводятся из товаров, загруженных функцией prefetch_order_products. Родитель: ModelSerializer.
+    """
+
+    id = serializers.IntegerField(source="product_id")
+    count = serializers.IntegerField(source="count_in_order")
+    images = serializers.SerializerMethodField()
 
     class Meta:
-        model = Order
-        fields = ["products"]
+        model = ProductsInOrderCount
+        fields = ["id", "title", "description", "price", "salePrice", "count", "images"]
+
+    def to_representation(self, instance: ProductsInOrderCount) -> Dict:
+        """Метод для заполнения снимка товара в строке заказа, подтвержденного до появления снимков."""
+
+        if instance.snapshot_at is None:
+            snapshot_line(instance, instance.product)
+        return super().to_representation(instance)
+
+    @extend_schema_field(OrderLineImageSerializer(many=True))
+    def get_images(self, obj: ProductsInOrderCount) -> list:
+        """Метод для получения изображения товара в формате списка изображений каталога."""
 
-    def create(self, validated_data: List[Dict]) -> Order:
-        """Метод для создания заказа."""
+        if not obj.thumbnail:
+            return []
+        return [{"src": obj.thumbnail, "alt": obj.title}]
 
-        products = validated_data.pop("products")
-        order = Order.objects.create()
-        for product in products:
-            order.products.add(
-                product["id"], through_defaults={"count_in_order": product["count"]}
+
+class OrderLineSerializer(serializers.Serializer):
+    """
+    Сериалайзер строки создаваемого заказа: id товара, количество и цена, по которой товар был показан в корзине.
+    Остальные поля товара, которые передает клиент, игнорируются. Родитель: Serializer.
+    """
+
+    id = serializers.IntegerField()
+    count = serializers.IntegerField(min_value=1)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+
+
+class OrderCreateSerializer(serializers.Serializer):
+    """
+    Сериалайзер для создания заказа. Все строки заказа проверяются одним запросом, ошибки возвращаются по строкам.
+    Корзина, товары которой зарезервированы для заказа, передается в контексте. Родитель: Serializer.
+    """
+
+    products = OrderLineSerializer(many=True)
+
+    def validate_products(self, lines: List[Dict]) -> List[Dict]:
+        """
+        Метод для проверки наличия товаров и цен. Товары блокируются до конца транзакции, к остатку на складе
+        добавляется резерв товара в корзине пользователя. Повторяющиеся строки одного товара суммируются.
+        """
+
+        counts = defaultdict(int)
+        for line in lines:
+            counts[line["id"]] += line["count"]
+        basket = self.context.get("basket")
+        reserved = ProductsInBasketCount.objects.filter(
+            basket=basket, product=OuterRef("pk")
+        ).values("count_in_basket")[:1]
+        products = {
+            product["pk"]: product
+            for product in Product.objects.select_for_update()
+            .filter(pk__in=list(counts))
+            .annotate(reserved=Coalesce(Subquery(reserved), 0))
+            .order_by("pk")
+            .values("pk", "count", "price", "reserved")
+        }
+        errors = []
+        for line in lines:
+            product = products.get(line["id"])
+            if product is None:
+                errors.append({"id": ["Товар не найден"]})
+            elif "price" in line and line["price"] != product["price"]:
+                errors.append({"price": ["Цена товара изменилась"]})
+            elif counts[line["id"]] > product["count"] + product["reserved"]:
+                errors.append({"count": ["Недостаточно товара на складе"]})
+            else:
+                errors.append({})
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return [
+            {
+                "id": product_id,
+                "count": count,
+                "reserved": min(count, products[product_id]["reserved"]),
+            }
+            for product_id, count in counts.items()
+        ]
+
+    def create(self, validated_data: Dict) -> Order:
+        """
+        Метод для создания заказа. Профиль и контакты пользователя передаются в метод save. Строки заказа создаются
+        одним запросом, товары сверх резерва в корзине списываются со склада одним запросом.
+        """
+
+        lines = validated_data.pop("products")
+        order = Order.objects.create(**validated_data)
+        ProductsInOrderCount.objects.bulk_create(
+            ProductsInOrderCount(
+                order=order, product_id=line["id"], count_in_order=line["count"]
+            )
+            for line in lines
+        )
+        from_stock = {
+            line["id"]: line["count"] - line["reserved"]
+            for line in lines
+            if line["count"] > line["reserved"]
+        }
+        if from_stock:
+            Product.objects.filter(pk__in=list(from_stock)).update(
+                count=F("count") - delta_case(from_stock)
             )
         return order
 
 
+class OrderStatusField(serializers.ChoiceField):
+    """Поле статуса заказа, который хранится в БД числом и передается в API кодом статуса. Родитель: ChoiceField."""
+
+    def __init__(self, **kwargs) -> None:
+        """Метод для создания поля с кодами статусов заказа."""
+
+        kwargs.setdefault("read_only", True)
+        super().__init__(choices=[status.code for status in OrderStatus], **kwargs)
+
+    def to_representation(self, value: int) -> str:
+        """Метод для получения кода статуса заказа."""
+
+        return OrderStatus(value).code
+
+
+class OrderListSerializer(serializers.ModelSerializer):
+    """Сериалайзер для отображения списка заказов без товаров. Родитель: ModelSerializer."""
+
+    status = OrderStatusField()
+
+    class Meta:
+        model = Order
+        fields = [
+            "id",
+            "createdAt",
+            "deliveryType",
+            "paymentType",
+            "totalCost",
+            "status",
+        ]
+
+
 class OrderDetailSerializer(serializers.ModelSerializer):
     """Сериалайзер для отображения детальной страницы заказа. Родитель: ModelSerializer."""
 
-    products = ProductInOrderListSerializer(many=True)
+    status = OrderStatusField()
+    products = serializers.SerializerMethodField()
 
     class Meta:
         model = Order
@@ -88,6 +264,14 @@ class OrderDetailSerializer(serializers.ModelSerializer):
             "products",
         ]
 
+    @extend_schema_field(ProductInOrderListSerializer(many=True))
+    def get_products(self, obj: Order) -> list:
+        """Метод для получения списка товаров в заказе из строк заказа, загруженных функцией prefetch_order_products."""
+
+        return ProductInOrderListSerializer(
+            obj.products_in_order_count.all(), many=True
+        ).data
+
 
 class OrderUpdateSerializer(serializers.ModelSerializer):
     """Сериалайзер для подтверждения заказа. Родитель: ModelSerializer."""
@@ -108,6 +292,14 @@ class OrderUpdateSerializer(serializers.ModelSerializer):
         ]
 
 
+class PaymentStatusSerializer(serializers.ModelSerializer):
+    """Сериалайзер статуса оплаты заказа. Родитель: ModelSerializer."""
+
+    class Meta:
+        model = Payment
+        fields = ["id", "order", "status", "error"]
+
+
 class PaymentSerializer(serializers.Serializer):
     """Сериалайзер для оплаты заказа. Родитель: Serializer."""
 
@@ -154,3 +346,47 @@ class PaymentSerializer(serializers.Serializer):
         if today > card_date:
             raise serializers.ValidationError("Карта просрочена!")
         return data
+
+
+class SalesPeriodSerializer(serializers.Serializer):
+    """Сериалайзер периода отчета о продажах. Родитель: Serializer."""
+
+    dateFrom = serializers.DateField(required=False)
+    dateTo = serializers.DateField(required=False)
+
+
+class DailySalesSerializer(serializers.ModelSerializer):
+    """Сериалайзер продаж за день. Родитель: ModelSerializer."""
+
+    day = serializers.DateField(format="%Y-%m-%d")
+
+    class Meta:
+        fields = ["day", "units", "revenue", "orders"]
+
+
+class ProductDailySalesSerializer(DailySalesSerializer):
+    """Сериалайзер продаж товара за день. Родитель: DailySalesSerializer."""
+
+    title = serializers.CharField(source="product.title", default=None)
+
+    class Meta(DailySalesSerializer.Meta):
+        model = ProductDailySales
+        fields = DailySalesSerializer.Meta.fields + ["product", "title"]
+
+
+class CategoryDailySalesSerializer(DailySalesSerializer):
+    """Сериалайзер продаж категории товаров за день. Родитель: DailySalesSerializer."""
+
+    title = serializers.CharField(source="category.title", default=None)
+
+    class Meta(DailySalesSerializer.Meta):
+        model = CategoryDailySales
+        fields = DailySalesSerializer.Meta.fields + ["category", "title"]
+
+
+class DeliveryDailySalesSerializer(DailySalesSerializer):
+    """Сериалайзер продаж по типу доставки за день. Родитель: DailySalesSerializer."""
+
+    class Meta(DailySalesSerializer.Meta):
+        model = DeliveryDailySales
+        fields = DailySalesSerializer.Meta.fields + ["deliveryType"]
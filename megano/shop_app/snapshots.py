@@ -0,0 +1,105 @@
+"""
+Снимки товаров в строках заказов.
+
+При подтверждении заказа в строки заказа записываются название и краткое описание товара, цена, цена со скидкой
+и ссылка на первое изображение. История заказов выводится из таблиц заказов без соединения с товарами, категориями,
+изображениями, тэгами и отзывами и показывает цену на момент оформления заказа, а не текущую цену.
+"""
+
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from catalog_app.models import Image, Product
+from django.db import transaction
+from django.db.models import Prefetch, QuerySet
+from django.utils import timezone
+from shop_app.models import ProductsInOrderCount
+
+# Поля строки заказа, в которые записывается снимок товара
+SNAPSHOT_FIELDS = [
+    "title",
+    "description",
+    "price",
+    "salePrice",
+    "thumbnail",
+    "snapshot_at",
+]
+
+
+def snapshot_products(products: QuerySet) -> QuerySet:
+    """Функция для загрузки товаров вместе со скидкой и изображениями, которые записываются в снимок."""
+
+    return products.select_related("sale").prefetch_related(
+        Prefetch("images", queryset=Image.objects.order_by("pk"))
+    )
+
+
+def snapshot_line(
+    line: ProductsInOrderCount, product: Product, now: Optional[datetime] = None
+) -> ProductsInOrderCount:
+    """
+    Функция для заполнения снимка товара в строке заказа без сохранения в БД. Цена со скидкой записывается, если
+    скидка действует на дату снимка.
+    """
+
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    sale = product.sale
+    images = list(product.images.all())
+    line.title = product.title
+    line.description = product.description
+    line.price = product.price
+    line.salePrice = (
+        sale.salePrice if sale and sale.dateFrom <= today <= sale.dateTo else None
+    )
+    line.thumbnail = images[0].src.url if images else ""
+    line.snapshot_at = now
+    return line
+
+
+def snapshot_order_lines(lines: QuerySet) -> List[ProductsInOrderCount]:
+    """
+    Функция для записи снимков товаров в строки заказов. Строки и товары загружаются и сохраняются постоянным
+    количеством запросов независимо от количества строк. Возвращает строки со снимками.
+    """
+
+    lines = list(
+        lines.prefetch_related(
+            Prefetch("product", queryset=snapshot_products(Product.objects.all()))
+        )
+    )
+    now = timezone.now()
+    for line in lines:
+        snapshot_line(line, line.product, now)
+    ProductsInOrderCount.objects.bulk_update(lines, SNAPSHOT_FIELDS)
+    return lines
+
+
+def backfill_order_snapshots(batch_size: int = 500, pause: float = 0.1) -> Dict:
+    """
+    Функция для записи снимков товаров в строки заказов, оформленных до появления снимков. Строки обрабатываются
+    пачками в порядке id с паузой pause секунд между пачками, каждая пачка записывается отдельной транзакцией.
+    Возвращает количество обработанных строк и пачек.
+    """
+
+    metrics = {"lines": 0, "batches": 0}
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            lines = snapshot_order_lines(
+                ProductsInOrderCount.objects.filter(
+                    snapshot_at__isnull=True, pk__gt=last_pk
+                )
+                .select_for_update(skip_locked=True)
+                .order_by("pk")[:batch_size]
+            )
+        if not lines:
+            break
+        metrics["lines"] += len(lines)
+        metrics["batches"] += 1
+        last_pk = lines[-1].pk
+        if len(lines) < batch_size:
+            break
+        time.sleep(pause)
+    return metrics
@@ -1,16 +1,113 @@
-import time
+import logging
 
 from celery import shared_task
-from shop_app.models import Order
+from django.conf import settings
+
+from shop_app.analytics import update_sales_rollups
+from shop_app.cleanup import collect_garbage
+from shop_app.flash_sale import flush_claims, get_flash_sale_store, reconcile_stock
+from shop_app.gateway import GatewayError, charge_with_retries, get_payment_gateway
+from shop_app.models import Payment
+from shop_app.payments import apply_payment_result, reconcile_pending_payments
+from shop_app.reservations import release_expired_reservations
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def payment(payment_pk: int, card_num: str) -> str:
+    """
+    Функция для оплаты заказа через платежный шлюз. Временные ошибки шлюза повторяются с ключом идемпотентности
+    попытки оплаты заказа. Если шлюз отправляет результат уведомлением на PAYMENT_WEBHOOK_URL, оплата остается в
+    статусе "pending" до уведомления. После ошибки последней попытки результат списания неизвестен, поэтому оплата
+    также остается в статусе "pending" до уведомления или сверки задачей reconcile_payments. Возвращает статус оплаты.
+    """
+
+    order_payment = Payment.objects.select_related("order").get(pk=payment_pk)
+    if order_payment.status != "pending":
+        return order_payment.status
+    try:
+        result = charge_with_retries(
+            get_payment_gateway(),
+            order_payment.pk,
+            order_payment.idempotency_key,
+            order_payment.order.totalCost or 0,
+            card_num,
+            settings.PAYMENT_WEBHOOK_URL,
+            settings.PAYMENT_GATEWAY_ATTEMPTS,
+            settings.PAYMENT_GATEWAY_BACKOFF,
+        )
+    except GatewayError as error:
+        logger.warning("Не удалось выполнить оплату %s: %s", payment_pk, error)
+        return order_payment.status
+    return apply_payment_result(payment_pk, result).status
+
+
+@shared_task
+def reconcile_payments() -> int:
+    """
+    Функция для сверки с платежным шлюзом оплат, оставшихся в статусе "pending". Периодически запускается celery
+    beat. Возвращает количество оплат с окончательным статусом.
+    """
+
+    return reconcile_pending_payments(
+        get_payment_gateway(),
+        settings.PAYMENT_RECONCILE_AGE,
+        settings.PAYMENT_RECONCILE_BATCH,
+    )
+
+
+@shared_task
+def release_basket_reservations() -> int:
+    """
+    Функция для возврата на склад товаров из просроченных резервов корзин. Периодически запускается celery beat.
+    """
+
+    return release_expired_reservations(settings.BASKET_RESERVATION_RELEASE_BATCH)
 
 
 @shared_task
-def payment(order_pk: str, card_num: str) -> str:
-    """Функция для выполнения фиктивной оплаты."""
-
-    time.sleep(3)
-    order = Order.objects.get(id=order_pk)
-    if int(card_num) % 2 == 0 and not card_num.endswith("0"):
-        order.status = "paid"
-        order.save(update_fields=["status"])
-    return order.status
+def write_flash_sale_claims() -> int:
+    """
+    Функция для записи заявок флеш-распродажи из очереди Redis в БД пачками. Периодически запускается celery beat.
+    """
+
+    store = get_flash_sale_store()
+    if store is None:
+        return 0
+    return flush_claims(store, settings.FLASH_SALE_WRITE_BATCH)
+
+
+@shared_task
+def reconcile_flash_sale_stock() -> int:
+    """
+    Функция для сверки остатков флеш-распродажи в Redis с БД. Периодически запускается celery beat. Возвращает
+    количество исправленных остатков.
+    """
+
+    store = get_flash_sale_store()
+    if store is None:
+        return 0
+    return len(reconcile_stock(store))
+
+
+@shared_task
+def collect_basket_garbage() -> dict:
+    """
+    Функция для удаления брошенных корзин анонимных пользователей и сессий с истекшим сроком действия. Периодически
+    запускается celery beat. Возвращает количество удаленных записей.
+    """
+
+    return collect_garbage(
+        settings.BASKET_GC_AGE, settings.BASKET_GC_BATCH, settings.BASKET_GC_PAUSE
+    )
+
+
+@shared_task
+def update_daily_sales() -> dict:
+    """
+    Функция для добавления в продажи по дням заказов, оплаченных после отметки. Периодически запускается celery beat.
+    Возвращает количество учтенных заказов и пачек.
+    """
+
+    return update_sales_rollups(settings.SALES_ROLLUP_BATCH)
@@ -1,15 +1,73 @@
 import json
 import os
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from typing import Optional
+from unittest import mock
 
-from catalog_app.models import Category, Image, Product
+import fakeredis
+import fakeredis.aioredis
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from rest_framework.exceptions import ValidationError
 from rest_framework.test import APITestCase
-from shop_app.models import Basket, DeliveryPrice, Order, ProductsInBasketCount
-from users_app.models import Profile
 
+from catalog_app.models import Category, Image, Product, Sale
 from megano import settings
 from megano.celery import app
+from shop_app.analytics import update_sales_rollups
+from shop_app.cache import delivery_prices
+from shop_app.cleanup import collect_garbage
+from shop_app.cookie_basket import decode_lines
+from shop_app.flash_sale import FlashSaleStore, flush_claims, reconcile_stock
+from shop_app.gateway import (
+    GatewayError,
+    GatewayRateLimited,
+    HttpGateway,
+    PaymentSimulator,
+    SimulatorGateway,
+    charge_result,
+    charge_with_retries,
+    get_payment_gateway,
+    sign_webhook,
+)
+from shop_app.idempotency import FINGERPRINT_SALT
+from shop_app.management.commands.payment_gateway_benchmark import run_benchmark
+from shop_app.management.commands.payment_gateway_simulator import build_server
+from shop_app.models import (
+    Basket,
+    CategoryDailySales,
+    DeliveryDailySales,
+    DeliveryPrice,
+    ExpressDeliveryPrice,
+    IdempotencyKey,
+    Order,
+    OrderStatus,
+    Payment,
+    ProductDailySales,
+    ProductsInBasketCount,
+    ProductsInOrderCount,
+)
+from shop_app.order_status import OrderTransitionError, transition_order
+from shop_app.payments import publish_payment_status, reconcile_pending_payments
+from shop_app.pricing import basket_totals, order_totals
+from shop_app.reservations import annotate_stock, release_expired_reservations
+from shop_app.snapshots import snapshot_order_lines
+from shop_app.utils import reserve_product_in_basket
+from shop_app.waiting_room import TOKEN_HEADER, WaitingRoom
+from users_app.models import Profile
 
 
 class BasketViewTestCase(APITestCase):
@@ -94,27 +152,204 @@ class BasketViewTestCase(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(recieved_data, [])
 
+    def test_add_product_to_basket_insufficient_stock(self) -> None:
+        """Метод для тестирования добавления в корзину большего количества товара, чем есть на складе."""
 
-class OrderCreateViewTestCase(APITestCase):
-    """Тест представления создания заказов. Родитель: APITestCase."""
+        stock = Product.objects.get(pk=self.product.pk).count
+        response = self.client.post(
+            reverse("basket"), {"id": self.product.id, "count": stock + 1}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("count", json.loads(response.content))
+        self.assertEqual(Product.objects.get(pk=self.product.pk).count, stock)
 
-    @classmethod
-    def setUpClass(cls) -> None:
+    def test_get_empty_basket_anonymous(self) -> None:
+        """Метод для тестирования получения пустой корзины анонимным пользователем без запросов к БД."""
+
+        self.client.logout()
+        baskets_count = Basket.objects.count()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("basket"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), [])
+        self.assertEqual(Basket.objects.count(), baskets_count)
+
+    def test_add_product_to_basket_anonymous(self) -> None:
+        """Метод для тестирования создания корзины анонимного пользователя при первом добавлении товара."""
+
+        self.client.logout()
+        baskets_count = Basket.objects.count()
+        response = self.client.post(
+            reverse("basket"), {"id": self.product.id, "count": 1}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Basket.objects.count(), baskets_count + 1)
+        basket_id = self.client.session["basket"][1]
+        response = self.client.get(reverse("basket"))
+        self.assertEqual(json.loads(response.content)[0]["count"], 1)
+        self.assertTrue(
+            ProductsInBasketCount.objects.filter(
+                basket_id=basket_id, product=self.product
+            ).exists()
+        )
+
+
+class BasketBatchViewTestCase(APITestCase):
+    """Тест представления для изменения количества нескольких товаров в корзине. Родитель: APITestCase."""
+
+    def setUp(self) -> None:
         """Метод для предварительной подготовки БД к проведению теста."""
 
-        Order.objects.all().delete()
-        cls.image = Image.objects.create(
+        image = Image.objects.create(
             src=os.path.join(
                 settings.MEDIA_ROOT / "catalog_app_images", "test_product.jpg"
             )
         )
-        cls.category = Category.objects.create(
-            title="test_category_title", image=cls.image
+        category = Category.objects.create(title="test_category_title", image=image)
+        self.products = [
+            Product.objects.create(
+                category=category,
+                price=100,
+                count=5,
+                title="test_product_title",
+                description="test_description",
+                fullDescription="test_fullDescription",
+                freeDelivery=False,
+                limited=False,
+            )
+            for _ in range(2)
+        ]
+        self.user = User.objects.create_user(username="test_user")
+        self.basket = Basket.objects.create(user=self.user)
+        reserve_product_in_basket(self.basket, self.products[0].pk, 3)
+        self.client.force_login(self.user)
+
+    def stock(self) -> list:
+        """Метод для получения остатков товаров на складе."""
+
+        return list(
+            Product.objects.filter(pk__in=[product.pk for product in self.products])
+            .order_by("pk")
+            .values_list("count", flat=True)
         )
-        cls.product = Product.objects.create(
-            category=cls.category,
+
+    def test_batch_update(self) -> None:
+        """Метод для тестирования изменения количества нескольких товаров одним запросом."""
+
+        response = self.client.post(
+            reverse("basket_batch"),
+            [
+                {"id": self.products[0].pk, "count": -2},
+                {"id": self.products[1].pk, "count": 3},
+                {"id": self.products[1].pk, "count": 1},
+            ],
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {product["id"]: product["count"] for product in response.json()},
+            {self.products[0].pk: 1, self.products[1].pk: 4},
+        )
+        self.assertEqual(self.stock(), [4, 1])
+
+    def test_batch_update_all_or_nothing(self) -> None:
+        """Метод для тестирования отказа от всех изменений и ошибок по строкам при ошибке в одной строке."""
+
+        response = self.client.post(
+            reverse("basket_batch"),
+            [
+                {"id": self.products[1].pk, "count": 2},
+                {"id": self.products[0].pk, "count": -4},
+                {"id": self.products[1].pk + 100, "count": 1},
+            ],
+        )
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual(errors[0], {})
+        self.assertIn("count", errors[1])
+        self.assertIn("id", errors[2])
+        self.assertEqual(self.stock(), [2, 5])
+        self.assertEqual(
+            ProductsInBasketCount.objects.get(basket=self.basket).count_in_basket, 3
+        )
+
+    def test_basket_summary(self) -> None:
+        """Метод для тестирования сводки корзины одним агрегирующим запросом без записи в сессию."""
+
+        basket_summary = reverse("basket_summary")
+        self.client.post(
+            reverse("basket_batch"), [{"id": self.products[1].pk, "count": 2}]
+        )
+        self.assertEqual(
+            self.client.get(basket_summary).json(), {"count": 5, "subtotal": "500.00"}
+        )
+        # Сессия, пользователь, агрегирующий запрос по строкам корзины и два запроса стоимости доставки, которая в
+        # транзакции теста не кэшируется, без записи сессии
+        with self.assertNumQueries(5):
+            response = self.client.get(basket_summary)
+        self.assertEqual(response.json()["count"], 5)
+        self.client.delete(reverse("basket"), {"id": self.products[0].pk, "count": 1})
+        self.assertEqual(
+            self.client.get(basket_summary).json(), {"count": 4, "subtotal": "400.00"}
+        )
+        self.client.logout()
+        # Только запросы стоимости доставки
+        with self.assertNumQueries(2):
+            response = self.client.get(basket_summary)
+        self.assertEqual(response.json(), {"count": 0, "subtotal": "0.00"})
+
+    @override_settings(BASKET_ANONYMOUS_STORAGE="cookie")
+    def test_batch_update_cookie_basket(self) -> None:
+        """Метод для тестирования изменения корзины анонимного пользователя в cookie одним запросом."""
+
+        self.client.logout()
+        response = self.client.post(
+            reverse("basket_batch"),
+            [
+                {"id": self.products[0].pk, "count": 2},
+                {"id": self.products[1].pk, "count": 5},
+            ],
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+        response = self.client.post(
+            reverse("basket_batch"),
+            [
+                {"id": self.products[0].pk, "count": -2},
+                {"id": self.products[1].pk, "count": 1},
+            ],
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()[0], {})
+        response = self.client.get(reverse("basket"))
+        self.assertEqual(
+            {product["id"]: product["count"] for product in response.json()},
+            {self.products[0].pk: 2, self.products[1].pk: 5},
+        )
+        response = self.client.get(reverse("basket_summary"))
+        self.assertEqual(response.json(), {"count": 7, "subtotal": "700.00"})
+
+
+class BasketStockContentionTestCase(TransactionTestCase):
+    """
+    Тест параллельного добавления товара в корзины на PostgreSQL. Каждый поток работает в своем соединении с БД.
+    Родитель: TransactionTestCase.
+    """
+
+    threads_count = 20
+
+    def setUp(self) -> None:
+        """Метод для предварительной подготовки БД к проведению теста."""
+
+        image = Image.objects.create(
+            src=os.path.join(
+                settings.MEDIA_ROOT / "catalog_app_images", "test_product.jpg"
+            )
+        )
+        category = Category.objects.create(title="test_category_title", image=image)
+        self.product = Product.objects.create(
+            category=category,
             price=100,
-            count=1,
+            count=self.threads_count // 2,
             title="test_product_title",
             description="test_description",
             fullDescription="test_fullDescription",
@@ -122,162 +357,1017 @@ class OrderCreateViewTestCase(APITestCase):
             limited=False,
         )
 
-    @classmethod
-    def tearDownClass(cls) -> None:
-        """Метод для очистки БД после проведения теста."""
+    def run_threads(self, baskets: list) -> list:
+        """Метод для одновременного добавления товара в корзины из нескольких потоков."""
 
-        cls.product.delete()
-        cls.category.delete()
-        cls.image.delete()
+        barrier = threading.Barrier(len(baskets))
+        results = []
 
-    def test_order_create(self) -> None:
-        """Метод для тестирования создания заказа."""
+        def reserve(basket: Basket) -> None:
+            barrier.wait()
+            try:
+                with transaction.atomic():
+                    reserve_product_in_basket(basket, self.product.pk, 1)
+                results.append(True)
+            except ValidationError:
+                results.append(False)
+            finally:
+                connection.close()
 
-        response = self.client.post(
-            reverse("orders"),
-            [
-                {
-                    "id": self.product.id,
-                    "category": {
-                        "title": self.product.category.title,
-                        "image": {
-                            "src": os.path.join(
-                                settings.MEDIA_ROOT / "catalog_app_images",
-                                "test_product.jpg",
-                            ),
-                            "alt": "test_category_image",
-                        },
-                        "subcategories": [],
-                    },
-                    "price": self.product.price,
-                    "count": self.product.count,
-                    "date": self.product.date,
-                    "title": self.product.title,
-                    "description": self.product.description,
-                    "freeDelivery": self.product.freeDelivery,
-                    "images": [
-                        {
-                            "src": os.path.join(
-                                settings.MEDIA_ROOT / "catalog_app_images",
-                                "test_product.jpg",
-                            ),
-                            "alt": "test_image",
-                        }
-                    ],
-                    "tags": [],
-                    "reviews": [],
-                    "rating": 5.0,
-                }
+        threads = [
+            threading.Thread(target=reserve, args=(basket,)) for basket in baskets
+        ]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLess(time.monotonic() - start, 10)
+        return results
+
+    def test_concurrent_add_does_not_oversell(self) -> None:
+        """Метод для тестирования того, что параллельные добавления не продают больше остатка на складе."""
+
+        baskets = [
+            Basket.objects.create(session_id=str(number))
+            for number in range(self.threads_count)
+        ]
+        results = self.run_threads(baskets)
+        self.product.refresh_from_db()
+        self.assertEqual(results.count(True), self.threads_count // 2)
+        self.assertEqual(self.product.count, 0)
+        self.assertEqual(
+            ProductsInBasketCount.objects.aggregate(total=Sum("count_in_basket"))[
+                "total"
             ],
+            self.threads_count // 2,
         )
-        self.assertEqual(response.status_code, 200)
-        self.assertTrue(Order.objects.exists())
 
+    def test_concurrent_add_to_one_basket(self) -> None:
+        """Метод для тестирования параллельного добавления товара в одну корзину."""
 
-class OrderListViewTestCase(APITestCase):
-    """Тест представления списка заказов. Родитель: APITestCase."""
+        Product.objects.filter(pk=self.product.pk).update(count=self.threads_count)
+        basket = Basket.objects.create(session_id="test_session")
+        results = self.run_threads([basket] * self.threads_count)
+        line = ProductsInBasketCount.objects.get(basket=basket)
+        self.assertTrue(all(results))
+        self.assertEqual(line.count_in_basket, self.threads_count)
 
-    @classmethod
-    def setUpClass(cls) -> None:
+
+class BasketReservationTestCase(APITestCase):
+    """Тест резервов товаров в корзинах. Родитель: APITestCase."""
+
+    def setUp(self) -> None:
         """Метод для предварительной подготовки БД к проведению теста."""
 
-        cls.credentials = dict(username="test_user", password="test_password")
-        cls.user = User.objects.create_user(**cls.credentials)
-        cls.profile = Profile.objects.create(
-            user=cls.user,
-            fullName="test_name",
+        image = Image.objects.create(
+            src=os.path.join(
+                settings.MEDIA_ROOT / "catalog_app_images", "test_product.jpg"
+            )
+        )
+        category = Category.objects.create(title="test_category_title", image=image)
+        self.product = Product.objects.create(
+            category=category,
+            price=100,
+            count=10,
+            title="test_product_title",
+            description="test_description",
+            fullDescription="test_fullDescription",
+            freeDelivery=False,
+            limited=False,
+        )
+        self.baskets = [
+            Basket.objects.create(session_id=str(number)) for number in range(3)
+        ]
+        for basket in self.baskets:
+            reserve_product_in_basket(basket, self.product.pk, 2)
+        ProductsInBasketCount.objects.filter(basket__in=self.baskets[:2]).update(
+            reserved_until=timezone.now() - timedelta(seconds=1)
         )
-        cls.order = Order.objects.create(profile=cls.profile)
 
-    @classmethod
-    def tearDownClass(cls) -> None:
-        """Метод для очистки БД после проведения теста."""
+    def test_release_expired_reservations(self) -> None:
+        """Метод для тестирования возврата на склад товаров из просроченных резервов пачками."""
 
-        cls.order.delete()
-        cls.user.delete()
+        self.assertEqual(release_expired_reservations(batch_size=1), 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.count, 8)
+        self.assertEqual(
+            list(
+                ProductsInBasketCount.objects.filter(basket__in=self.baskets)
+                .order_by("basket")
+                .values_list("count_in_basket", flat=True)
+            ),
+            [0, 0, 2],
+        )
+        self.assertEqual(release_expired_reservations(), 0)
+
+    def test_annotate_stock(self) -> None:
+        """Метод для тестирования подсчета остатков на складе с учетом резервов."""
+
+        product = annotate_stock(Product.objects.filter(pk=self.product.pk)).get()
+        self.assertEqual(product.count, 4)
+        self.assertEqual(product.reserved_count, 2)
+        self.assertEqual(product.on_hand_count, 10)
+        self.assertEqual(product.available_count, 8)
+
+
+class BasketMergeOnLoginTestCase(APITestCase):
+    """Тест переноса корзины анонимной сессии в корзину пользователя при входе. Родитель: APITestCase."""
 
     def setUp(self) -> None:
         """Метод для предварительной подготовки БД к проведению теста."""
 
-        self.client.login(**self.credentials)
+        image = Image.objects.create(
+            src=os.path.join(
+                settings.MEDIA_ROOT / "catalog_app_images", "test_product.jpg"
+            )
+        )
+        category = Category.objects.create(title="test_category_title", image=image)
+        self.products = [
+            Product.objects.create(
+                category=category,
+                price=100,
+                count=10,
+                title="test_product_title",
+                description="test_description",
+                fullDescription="test_fullDescription",
+                freeDelivery=False,
+                limited=False,
+            )
+            for _ in range(3)
+        ]
 
-    def test_get_orders_list(self) -> None:
-        """Метод для тестирования получения списка заказов."""
+    def login_with_anonymous_basket(self, username: str, products: list) -> int:
+        """Метод для входа пользователя с анонимной корзиной. Возвращает количество запросов при входе."""
 
-        response = self.client.get(reverse("orders"))
-        recieved_data = json.loads(response.content)
+        self.client.logout()
+        for product in products:
+            self.client.post(reverse("basket"), {"id": product.pk, "count": 2})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("login"),
+                json.dumps({"username": username, "password": "test_password"}),
+                content_type="application/json",
+            )
         self.assertEqual(response.status_code, 200)
-        self.assertQuerySetEqual(
-            qs=Order.objects.select_related("profile").filter(profile=self.profile),
-            values=(order["id"] for order in recieved_data),
-            transform=lambda order: order.id,
+        return len(queries)
+
+    def test_merge_on_login(self) -> None:
+        """Метод для тестирования суммирования количества товаров и удаления анонимной корзины при входе."""
+
+        user = User.objects.create_user(username="test_user", password="test_password")
+        basket = Basket.objects.create(user=user)
+        reserve_product_in_basket(basket, self.products[0].pk, 1)
+        self.login_with_anonymous_basket("test_user", self.products[:2])
+        self.assertEqual(
+            dict(
+                ProductsInBasketCount.objects.filter(basket=basket).values_list(
+                    "product", "count_in_basket"
+                )
+            ),
+            {self.products[0].pk: 3, self.products[1].pk: 2},
+        )
+        self.assertFalse(Basket.objects.filter(user__isnull=True).exists())
+        self.assertEqual(self.client.session["basket"], [user.pk, basket.pk])
+        self.assertEqual(
+            list(
+                Product.objects.filter(pk__in=[p.pk for p in self.products])
+                .order_by("pk")
+                .values_list("count", flat=True)
+            ),
+            [7, 8, 10],
         )
 
+    def test_merge_queries_do_not_depend_on_basket_size(self) -> None:
+        """Метод для тестирования постоянного количества запросов при переносе корзин разного размера."""
 
-class OrderDetailViewTestCase(APITestCase):
-    """Тест представления детальной страницы заказа. Родитель: APITestCase."""
+        for username in ["small", "large"]:
+            user = User.objects.create_user(username=username, password="test_password")
+            Basket.objects.create(user=user)
+        self.assertEqual(
+            self.login_with_anonymous_basket("small", self.products[:1]),
+            self.login_with_anonymous_basket("large", self.products),
+        )
 
-    @classmethod
-    def setUpClass(cls) -> None:
+
+class BasketGarbageCollectionTestCase(APITestCase):
+    """Тест удаления брошенных корзин и сессий с истекшим сроком действия. Родитель: APITestCase."""
+
+    def setUp(self) -> None:
         """Метод для предварительной подготовки БД к проведению теста."""
 
-        cls.credentials = dict(username="test_user", password="test_password")
-        cls.user = User.objects.create_user(**cls.credentials)
-        cls.profile = Profile.objects.create(
-            user=cls.user,
-            fullName="test_name",
-        )
-        cls.order = Order.objects.create(profile=cls.profile)
-        cls.image = Image.objects.create(
+        image = Image.objects.create(
             src=os.path.join(
                 settings.MEDIA_ROOT / "catalog_app_images", "test_product.jpg"
             )
         )
-        cls.category = Category.objects.create(
-            title="test_category_title", image=cls.image
-        )
-        cls.product = Product.objects.create(
-            category=cls.category,
+        category = Category.objects.create(title="test_category_title", image=image)
+        self.product = Product.objects.create(
+            category=category,
             price=100,
-            count=1,
+            count=10,
             title="test_product_title",
             description="test_description",
             fullDescription="test_fullDescription",
             freeDelivery=False,
             limited=False,
         )
-        cls.order.products.add(cls.product)
-        cls.delivery_price = DeliveryPrice.objects.create(
-            free_delivery_point=2000.00, price=200.00
+        self.user = User.objects.create_user(username="test_user")
+        self.abandoned = [
+            Basket.objects.create(session_id=str(number)) for number in range(3)
+        ]
+        self.active = Basket.objects.create(session_id="active")
+        self.fresh = Basket.objects.create(session_id="fresh")
+        self.user_basket = Basket.objects.create(user=self.user)
+        for basket in [self.abandoned[0], self.abandoned[1], self.active]:
+            reserve_product_in_basket(basket, self.product.pk, 2)
+        long_ago = timezone.now() - timedelta(days=30)
+        ProductsInBasketCount.objects.filter(basket__in=self.abandoned).update(
+            reserved_until=long_ago
+        )
+        Basket.objects.exclude(pk=self.fresh.pk).update(created_at=long_ago)
+        now = timezone.now()
+        for number in range(3):
+            Session.objects.create(
+                session_key="expired{number}".format(number=number),
+                session_data="",
+                expire_date=now - timedelta(seconds=1),
+            )
+        Session.objects.create(
+            session_key="active", session_data="", expire_date=now + timedelta(days=1)
         )
+        for key in ("expired", "active"):
+            IdempotencyKey.objects.create(
+                owner="session:active",
+                path="/api/orders",
+                key=key,
+                fingerprint="",
+                expires_at=now + timedelta(days=-1 if key == "expired" else 1),
+            )
 
-    @classmethod
-    def tearDownClass(cls) -> None:
-        """Метод для очистки БД после проведения теста."""
+    def test_collect_garbage(self) -> None:
+        """
+        Метод для тестирования удаления брошенных корзин, сессий и ключей идемпотентности пачками с возвратом товаров
+        на склад.
+        """
 
-        cls.order.delete()
-        cls.user.delete()
-        cls.product.delete()
-        cls.category.delete()
-        cls.image.delete()
-        cls.delivery_price.delete()
+        metrics = collect_garbage(age=7 * 24 * 60 * 60, batch_size=2, pause=0)
+        self.assertEqual(
+            {key: value for key, value in metrics.items() if key != "duration_ms"},
+            {
+                "baskets": 3,
+                "lines": 2,
+                "returned": 4,
+                "sessions": 3,
+                "idempotency_keys": 1,
+            },
+        )
+        self.assertEqual(
+            list(IdempotencyKey.objects.values_list("key", flat=True)), ["active"]
+        )
+        self.assertQuerySetEqual(
+            Basket.objects.order_by("pk"),
+            [self.active, self.fresh, self.user_basket],
+        )
+        self.assertEqual(
+            list(Session.objects.values_list("session_key", flat=True)), ["active"]
+        )
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.count, 8)
+
+
+class FlashSaleTestCase(APITestCase):
+    """Тест флеш-распродажи с остатками в Redis на fakeredis. Родитель: APITestCase."""
 
     def setUp(self) -> None:
-        """Метод для предварительной подготовки БД к проведению теста."""
+        """Метод для предварительной подготовки БД и Redis к проведению теста."""
 
-        self.client.login(**self.credentials)
+        image = Image.objects.create(
+            src=os.path.join(
+                settings.MEDIA_ROOT / "catalog_app_images", "test_product.jpg"
+            )
+        )
+        category = Category.objects.create(title="test_category_title", image=image)
+        self.product = Product.objects.create(
+            category=category,
+            price=100,
+            count=3,
+            title="test_product_title",
+            description="test_description",
+            fullDescription="test_fullDescription",
+            freeDelivery=False,
+            limited=True,
+            flashSale=True,
+        )
+        self.store = FlashSaleStore(fakeredis.FakeRedis())
+        self.store.start(self.product.pk, self.product.count)
+        patcher = mock.patch(
+            "shop_app.utils.get_flash_sale_store", return_value=self.store
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
-    def test_get_order_detail(self) -> None:
-        """Метод для тестирования получения детальной информации о заказе."""
+    def test_claims_written_in_batches(self) -> None:
+        """Метод для тестирования списания остатка в Redis и последующей записи заявок в БД."""
 
-        response = self.client.get(
-            reverse("order_detail", kwargs={"pk": self.order.pk})
+        response = self.client.post(
+            reverse("basket"), {"id": self.product.id, "count": 2}
         )
         self.assertEqual(response.status_code, 200)
-        self.assertContains(response, self.order.profile.fullName)
+        self.assertEqual(
+            [(item["id"], item["count"]) for item in response.data],
+            [(self.product.id, 2)],
+        )
+        self.assertEqual(Product.objects.get(pk=self.product.pk).count, 3)
+        response = self.client.post(
+            reverse("basket"), {"id": self.product.id, "count": 2}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.store.stock(self.product.pk), 1)
+        self.assertEqual(flush_claims(self.store, batch_size=1), 1)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).count, 1)
+        line = ProductsInBasketCount.objects.get(product=self.product)
+        self.assertEqual(line.count_in_basket, 2)
+        self.assertIsNotNone(line.reserved_until)
+        response = self.client.get(reverse("basket"))
+        self.assertEqual(
+            [(item["id"], item["count"]) for item in response.data],
+            [(self.product.id, 2)],
+        )
 
-    def test_order_confirm(self) -> None:
-        """Метод для тестирования подтверждения заказа."""
+    def test_rejected_claim_reported(self) -> None:
+        """Метод для тестирования сообщения пользователю о заявке, которую не удалось записать в корзину."""
+
+        self.client.post(reverse("basket"), {"id": self.product.id, "count": 2})
+        Product.objects.filter(pk=self.product.pk).update(count=1)
+        self.assertEqual(flush_claims(self.store), 0)
+        response = self.client.get(reverse("basket"))
+        self.assertEqual(response.data, [])
+        self.assertEqual(
+            json.loads(response["Flash-Sale-Rejected"]),
+            [{"id": self.product.id, "count": 2}],
+        )
+        response = self.client.get(reverse("basket"))
+        self.assertNotIn("Flash-Sale-Rejected", response)
+
+    def test_reconcile_stock(self) -> None:
+        """Метод для тестирования сверки остатка в Redis с БД с учетом незаписанных заявок."""
+
+        basket = Basket.objects.create(session_id="test_session")
+        self.store.claim(basket.pk, self.product.pk, 1)
+        self.store.client.set(self.store.stock_key(self.product.pk), 10)
+        self.assertEqual(reconcile_stock(self.store), {self.product.pk: (10, 2)})
+        self.assertEqual(flush_claims(self.store), 1)
+        self.assertEqual(reconcile_stock(self.store), {})
+        self.assertEqual(self.store.stock(self.product.pk), 2)
+
+    def test_order_create_with_pending_claim(self) -> None:
+        """Метод для тестирования оформления заказа с заявкой флеш-распродажи, еще не записанной в БД."""
+
+        self.client.post(reverse("basket"), {"id": self.product.id, "count": 2})
+        response = self.client.post(
+            reverse("orders"), [{"id": self.product.id, "count": 2}]
+        )
+        self.assertEqual(response.status_code, 200)
+        order = Order.objects.get(pk=response.json()["orderId"])
+        self.assertEqual(
+            list(
+                order.products_in_order_count.values_list("product", "count_in_order")
+            ),
+            [(self.product.pk, 2)],
+        )
+        self.assertEqual(Product.objects.get(pk=self.product.pk).count, 1)
+        self.assertFalse(
+            ProductsInBasketCount.objects.filter(count_in_basket__gt=0).exists()
+        )
+        basket = Basket.objects.get()
+        self.assertEqual(self.store.pending(basket.pk), {})
+        self.assertEqual(flush_claims(self.store), 0)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).count, 1)
+
+    def test_order_create_claims_locked(self) -> None:
+        """Метод для тестирования повтора оформления заказа, пока заявки корзины записывает другой воркер."""
+
+        self.client.post(reverse("basket"), {"id": self.product.id, "count": 2})
+        lock = self.store.lock()
+        lock.acquire()
+        with self.settings(FLASH_SALE_CHECKOUT_WAIT=0):
+            response = self.client.post(
+                reverse("orders"), [{"id": self.product.id, "count": 2}]
+            )
+        lock.release()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "2")
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Product.objects.get(pk=self.product.pk).count, 3)
+
+
+class WaitingRoomTestCase(APITestCase):
+    """Тест комнаты ожидания оформления заказов на fakeredis. Родитель: APITestCase."""
+
+    def setUp(self) -> None:
+        """Метод для создания комнаты ожидания на одного пользователя."""
+
+        self.room = WaitingRoom(fakeredis.FakeRedis(), rooms={"checkout": 1})
+        patcher = mock.patch(
+            "shop_app.waiting_room.get_waiting_room", return_value=self.room
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_fifo_admission(self) -> None:
+        """Метод для тестирования допуска пользователей в порядке очереди."""
+
+        tokens = [self.room.new_token("checkout") for _ in range(3)]
+        self.assertEqual([self.room.enter(token) for token in tokens], [0, 1, 2])
+        self.room.leave(tokens[0])
+        self.assertEqual(self.room.enter(tokens[2]), 1)
+        self.assertEqual(self.room.enter(tokens[1]), 0)
+
+    def test_order_create_queued(self) -> None:
+        """Метод для тестирования постановки в очередь при оформлении заказа и опроса позиции."""
+
+        busy_token = self.room.new_token("checkout")
+        self.assertEqual(self.room.enter(busy_token), 0)
+        response = self.client.post(reverse("orders"), [])
+        self.assertEqual(response.status_code, 429)
+        token = json.loads(response.content)["token"]
+        self.assertEqual(json.loads(response.content)["position"], 1)
+        response = self.client.get(reverse("waiting_room", kwargs={"token": token}))
+        self.assertEqual(
+            json.loads(response.content), {"position": 1, "admitted": False}
+        )
+        self.room.leave(busy_token)
+        response = self.client.get(reverse("waiting_room", kwargs={"token": token}))
+        self.assertEqual(json.loads(response.content)["admitted"], True)
+        response = self.client.post(
+            reverse("orders"), [], headers={TOKEN_HEADER: token}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.room.enter(self.room.new_token("checkout")), 0)
+
+    def test_slot_released_after_request(self) -> None:
+        """Метод для тестирования освобождения места в комнате после выполнения допущенного запроса."""
+
+        for _ in range(3):
+            response = self.client.post(reverse("orders"), [])
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.room.client.zcard("waiting_room:checkout:active"), 0)
+
+    def test_unknown_token_not_queued(self) -> None:
+        """Метод для тестирования опроса позиции по билету, который не выдавался комнатой ожидания."""
+
+        token = self.room.new_token("checkout")
+        response = self.client.get(reverse("waiting_room", kwargs={"token": token}))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(
+            reverse("waiting_room", kwargs={"token": "unknown:token"})
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.room.client.zcard("waiting_room:checkout:queue"), 0)
+        self.assertEqual(self.room.client.zcard("waiting_room:checkout:active"), 0)
+
+
+@override_settings(BASKET_ANONYMOUS_STORAGE="cookie")
+class CookieBasketTestCase(APITestCase):
+    """Тест корзин анонимных пользователей в подписанном cookie. Родитель: APITestCase."""
+
+    def setUp(self) -> None:
+        """Метод для предварительной подготовки БД к проведению теста."""
+
+        image = Image.objects.create(
+            src=os.path.join(
+                settings.MEDIA_ROOT / "catalog_app_images", "test_product.jpg"
+            )
+        )
+        category = Category.objects.create(title="test_category_title", image=image)
+        self.products = [
+            Product.objects.create(
+                category=category,
+                price=100,
+                count=5,
+                title="test_product_title",
+                description="test_description",
+                fullDescription="test_fullDescription",
+                freeDelivery=False,
+                limited=False,
+            )
+            for _ in range(2)
+        ]
+        self.credentials = dict(username="test_user", password="test_password")
+        self.user = User.objects.create_user(**self.credentials)
+
+    def basket_cookie(self) -> dict:
+        """Метод для чтения строк корзины из cookie клиента."""
+
+        cookie = self.client.cookies[settings.BASKET_COOKIE_NAME].value
+        return decode_lines(cookie.rsplit(":", 2)[0]) if cookie else {}
+
+    def test_anonymous_basket_in_cookie(self) -> None:
+        """Метод для тестирования корзины анонимного пользователя без записей в таблицах сессий и корзин."""
+
+        baskets_count = Basket.objects.count()
+        sessions_count = Session.objects.count()
+        for product in self.products:
+            response = self.client.post(
+                reverse("basket"), {"id": product.pk, "count": 2}
+            )
+            self.assertEqual(response.status_code, 200)
+        response = self.client.delete(
+            reverse("basket"), {"id": self.products[1].pk, "count": 1}
+        )
+        self.assertEqual(
+            self.basket_cookie(), {self.products[0].pk: 2, self.products[1].pk: 1}
+        )
+        response = self.client.get(reverse("basket"))
+        self.assertEqual(
+            {product["id"]: product["count"] for product in response.json()},
+            {self.products[0].pk: 2, self.products[1].pk: 1},
+        )
+        self.assertEqual(Basket.objects.count(), baskets_count)
+        self.assertEqual(Session.objects.count(), sessions_count)
+        self.assertEqual(
+            Product.objects.get(pk=self.products[0].pk).count,
+            5,
+            "Товар не резервируется",
+        )
+
+    def test_cookie_validated_against_stock(self) -> None:
+        """Метод для тестирования сверки корзины из cookie с остатками и отклонения cookie с неверной подписью."""
+
+        self.client.post(reverse("basket"), {"id": self.products[0].pk, "count": 4})
+        self.client.post(reverse("basket"), {"id": self.products[1].pk, "count": 1})
+        Product.objects.filter(pk=self.products[0].pk).update(count=3)
+        Product.objects.filter(pk=self.products[1].pk).update(count=0)
+        response = self.client.get(reverse("basket"))
+        self.assertEqual(
+            [(product["id"], product["count"]) for product in response.json()],
+            [(self.products[0].pk, 3)],
+        )
+        self.assertEqual(self.basket_cookie(), {self.products[0].pk: 3})
+        response = self.client.post(
+            reverse("basket"), {"id": self.products[0].pk, "count": 1}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.client.cookies[settings.BASKET_COOKIE_NAME] = "{id}:5:forged".format(
+            id=self.products[0].pk
+        )
+        self.assertEqual(self.client.get(reverse("basket")).json(), [])
+
+    def test_cookie_basket_persisted_on_login(self) -> None:
+        """Метод для тестирования записи корзины из cookie в корзину пользователя при входе в учетную запись."""
+
+        basket = Basket.objects.create(user=self.user)
+        reserve_product_in_basket(basket, self.products[0].pk, 1)
+        for product in self.products:
+            self.client.post(reverse("basket"), {"id": product.pk, "count": 2})
+        with self.assertNumQueries(17):
+            response = self.client.post(
+                reverse("login"),
+                json.dumps(self.credentials),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.cookies[settings.BASKET_COOKIE_NAME].value, "")
+        self.assertEqual(
+            dict(
+                ProductsInBasketCount.objects.filter(basket=basket).values_list(
+                    "product", "count_in_basket"
+                )
+            ),
+            {self.products[0].pk: 3, self.products[1].pk: 2},
+        )
+        self.assertEqual(
+            list(
+                Product.objects.filter(pk__in=[p.pk for p in self.products])
+                .order_by("pk")
+                .values_list("count", flat=True)
+            ),
+            [2, 3],
+        )
+
+
+class LineItemQueriesTestCase(APITestCase):
+    """Тест постоянного количества запросов при выводе корзины и заказа. Родитель: APITestCase."""
+
+    def setUp(self) -> None:
+        """Метод для предварительной подготовки БД к проведению теста."""
+
+        image = Image.objects.create(
+            src=os.path.join(
+                settings.MEDIA_ROOT / "catalog_app_images", "test_product.jpg"
+            )
+        )
+        main_category = Category.objects.create(title="test_main_category", image=image)
+        category = Category.objects.create(
+            title="test_category_title",
+            image=Image.objects.create(src=image.src),
+            main_category=main_category,
+        )
+        self.products = Product.objects.bulk_create(
+            Product(
+                category=category if number % 2 else main_category,
+                price=100 + number,
+                count=10,
+                title="test_product_title",
+                description="test_description",
+                fullDescription="test_fullDescription",
+                freeDelivery=False,
+                limited=False,
+            )
+            for number in range(100)
+        )
+        Image.objects.bulk_create(
+            Image(src=image.src, product=product) for product in self.products
+        )
+        self.user = User.objects.create_user(username="test_user")
+        self.profile = Profile.objects.create(user=self.user, fullName="test_name")
+        self.client.force_login(self.user)
+
+    def test_basket_queries(self) -> None:
+        """Метод для тестирования вывода корзины с 1, 10 и 100 товарами постоянным количеством запросов."""
+
+        basket = Basket.objects.create(user=self.user)
+        # Первый запрос сохраняет id корзины в сессии
+        self.client.get(reverse("basket"))
+        for size in [1, 10, 100]:
+            ProductsInBasketCount.objects.bulk_create(
+                ProductsInBasketCount(basket=basket, product=product, count_in_basket=2)
+                for product in self.products[:size]
+            )
+            with self.subTest(size=size), self.assertNumQueries(10):
+                response = self.client.get(reverse("basket"))
+            self.assertEqual(len(response.json()), size)
+            self.assertEqual({product["count"] for product in response.json()}, {2})
+            ProductsInBasketCount.objects.filter(basket=basket).delete()
+
+    def test_order_queries(self) -> None:
+        """Метод для тестирования вывода заказа с 1, 10 и 100 товарами постоянным количеством запросов."""
+
+        for size in [1, 10, 100]:
+            order = Order.objects.create(profile=self.profile)
+            ProductsInOrderCount.objects.bulk_create(
+                ProductsInOrderCount(order=order, product=product, count_in_order=3)
+                for product in self.products[:size]
+            )
+            with self.subTest(size=size), self.assertNumQueries(6):
+                response = self.client.get(
+                    reverse("order_detail", kwargs={"pk": order.pk})
+                )
+            self.assertEqual(len(response.json()["products"]), size)
+            self.assertEqual(
+                {product["count"] for product in response.json()["products"]}, {3}
+            )
+
+
+class OrderCreateViewTestCase(APITestCase):
+    """Тест представления создания заказов. Родитель: APITestCase."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Метод для предварительной подготовки БД к проведению теста."""
+
+        Order.objects.all().delete()
+        cls.image = Image.objects.create(
+            src=os.path.join(
+                settings.MEDIA_ROOT / "catalog_app_images", "test_product.jpg"
+            )
+        )
+        cls.category = Category.objects.create(
+            title="test_category_title", image=cls.image
+        )
+        cls.product = Product.objects.create(
+            category=cls.category,
+            price=100,
+            count=1,
+            title="test_product_title",
+            description="test_description",
+            fullDescription="test_fullDescription",
+            freeDelivery=False,
+            limited=False,
+        )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Метод для очистки БД после проведения теста."""
+
+        cls.product.delete()
+        cls.category.delete()
+        cls.image.delete()
+
+    def test_order_create(self) -> None:
+        """Метод для тестирования создания заказа."""
+
+        response = self.client.post(
+            reverse("orders"),
+            [
+                {
+                    "id": self.product.id,
+                    "category": {
+                        "title": self.product.category.title,
+                        "image": {
+                            "src": os.path.join(
+                                settings.MEDIA_ROOT / "catalog_app_images",
+                                "test_product.jpg",
+                            ),
+                            "alt": "test_category_image",
+                        },
+                        "subcategories": [],
+                    },
+                    "price": self.product.price,
+                    "count": self.product.count,
+                    "date": self.product.date,
+                    "title": self.product.title,
+                    "description": self.product.description,
+                    "freeDelivery": self.product.freeDelivery,
+                    "images": [
+                        {
+                            "src": os.path.join(
+                                settings.MEDIA_ROOT / "catalog_app_images",
+                                "test_product.jpg",
+                            ),
+                            "alt": "test_image",
+                        }
+                    ],
+                    "tags": [],
+                    "reviews": [],
+                    "rating": 5.0,
+                }
+            ],
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Order.objects.exists())
+
+
+class OrderCreateLinesTestCase(APITestCase):
+    """Тест создания заказа из строк заказа с проверкой остатков и цен. Родитель: APITestCase."""
+
+    def setUp(self) -> None:
+        """Метод для предварительной подготовки БД к проведению теста."""
+
+        image = Image.objects.create(
+            src=os.path.join(
+                settings.MEDIA_ROOT / "catalog_app_images", "test_product.jpg"
+            )
+        )
+        category = Category.objects.create(title="test_category_title", image=image)
+        self.products = [
+            Product.objects.create(
+                category=category,
+                price=100,
+                count=5,
+                title="test_product_title",
+                description="test_description",
+                fullDescription="test_fullDescription",
+                freeDelivery=False,
+                limited=False,
+            )
+            for _ in range(3)
+        ]
+        self.user = User.objects.create_user(username="test_user")
+        self.basket = Basket.objects.create(user=self.user)
+        reserve_product_in_basket(self.basket, self.products[0].pk, 3)
+        reserve_product_in_basket(self.basket, self.products[1].pk, 2)
+        self.client.force_login(self.user)
+
+    def stock(self) -> list:
+        """Метод для получения остатков товаров на складе."""
+
+        return list(
+            Product.objects.filter(pk__in=[product.pk for product in self.products])
+            .order_by("pk")
+            .values_list("count", flat=True)
+        )
+
+    def test_order_create_from_lines(self) -> None:
+        """Метод для тестирования списания резерва корзины и остатков при создании заказа."""
+
+        response = self.client.post(
+            reverse("orders"),
+            [
+                {"id": self.products[0].pk, "count": 4, "price": "100.00"},
+                {"id": self.products[2].pk, "count": 1},
+            ],
+        )
+        self.assertEqual(response.status_code, 200)
+        order = Order.objects.get(pk=response.json()["orderId"])
+        self.assertEqual(
+            dict(
+                order.products_in_order_count.values_list("product", "count_in_order")
+            ),
+            {self.products[0].pk: 4, self.products[2].pk: 1},
+        )
+        self.assertEqual(self.stock(), [1, 5, 4])
+        self.assertFalse(
+            ProductsInBasketCount.objects.filter(
+                basket=self.basket, count_in_basket__gt=0
+            ).exists()
+        )
+
+    def test_order_create_line_errors(self) -> None:
+        """Метод для тестирования ошибок по строкам заказа без изменения остатков."""
+
+        response = self.client.post(
+            reverse("orders"),
+            [
+                {"id": self.products[0].pk, "count": 1},
+                {"id": self.products[1].pk, "count": 1, "price": "90.00"},
+                {"id": self.products[2].pk, "count": 6},
+                {"id": self.products[2].pk + 100, "count": 1},
+            ],
+        )
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()["products"]
+        self.assertEqual(errors[0], {})
+        self.assertIn("price", errors[1])
+        self.assertIn("count", errors[2])
+        self.assertIn("id", errors[3])
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.stock(), [2, 3, 5])
+
+    def test_order_create_queries(self) -> None:
+        """Метод для тестирования создания заказа постоянным количеством запросов."""
+
+        queries = []
+        # Первый заказ списывает резерв корзины и сохраняет id корзины в сессии
+        for size in [1, 1, 3]:
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.post(
+                    reverse("orders"),
+                    [
+                        {"id": product.pk, "count": 1}
+                        for product in self.products[:size]
+                    ],
+                )
+            self.assertEqual(response.status_code, 200)
+            queries.append(len(captured))
+        self.assertEqual(queries[1], queries[2])
+
+
+class OrderListViewTestCase(APITestCase):
+    """Тест представления списка заказов. Родитель: APITestCase."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Метод для предварительной подготовки БД к проведению теста."""
+
+        cls.credentials = dict(username="test_user", password="test_password")
+        cls.user = User.objects.create_user(**cls.credentials)
+        cls.profile = Profile.objects.create(
+            user=cls.user,
+            fullName="test_name",
+        )
+        cls.order = Order.objects.create(profile=cls.profile)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Метод для очистки БД после проведения теста."""
+
+        cls.order.delete()
+        cls.user.delete()
+
+    def setUp(self) -> None:
+        """Метод для предварительной подготовки БД к проведению теста."""
+
+        self.client.login(**self.credentials)
+
+    def test_get_orders_list(self) -> None:
+        """Метод для тестирования получения списка заказов."""
+
+        response = self.client.get(reverse("orders"))
+        recieved_data = json.loads(response.content)
+        self.assertEqual(response.status_code, 200)
+        self.assertQuerySetEqual(
+            qs=Order.objects.select_related("profile").filter(profile=self.profile),
+            values=(order["id"] for order in recieved_data["items"]),
+            transform=lambda order: order.id,
+        )
+        self.assertIsNone(recieved_data["next"])
+
+
+class OrderListPaginationTestCase(APITestCase):
+    """Тест постраничного вывода истории заказов по курсору. Родитель: APITestCase."""
+
+    def setUp(self) -> None:
+        """Метод для предварительной подготовки БД к проведению теста."""
+
+        self.user = User.objects.create_user(username="test_user")
+        self.profile = Profile.objects.create(user=self.user, fullName="test_name")
+        other_profile = Profile.objects.create(
+            user=User.objects.create_user(username="test_other_user")
+        )
+        created_at = timezone.now()
+        orders = Order.objects.bulk_create(
+            Order(profile=self.profile) for _ in range(25)
+        )
+        Order.objects.create(profile=other_profile)
+        # Заказы с одинаковой датой создания не должны пропадать на границе страниц
+        for number, order in enumerate(orders):
+            Order.objects.filter(pk=order.pk).update(
+                createdAt=created_at - timedelta(minutes=number // 3)
+            )
+        self.order_ids = list(
+            Order.objects.filter(profile=self.profile)
+            .order_by("-createdAt", "-id")
+            .values_list("pk", flat=True)
+        )
+        self.client.force_login(self.user)
+
+    def test_pages(self) -> None:
+        """Метод для тестирования обхода всех страниц истории заказов постоянным количеством запросов."""
+
+        url = reverse("orders")
+        # Первый запрос сохраняет сессию
+        self.client.get(url)
+        received = []
+        while url:
+            with self.assertNumQueries(4):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertLessEqual(len(data["items"]), 10)
+            self.assertEqual(
+                set(data["items"][0]),
+                {
+                    "id",
+                    "createdAt",
+                    "deliveryType",
+                    "paymentType",
+                    "totalCost",
+                    "status",
+                },
+            )
+            received.extend(order["id"] for order in data["items"])
+            url = data["next"]
+        self.assertEqual(received, self.order_ids)
+
+
+class OrderDetailViewTestCase(APITestCase):
+    """Тест представления детальной страницы заказа. Родитель: APITestCase."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Метод для предварительной подготовки БД к проведению теста."""
+
+        cls.credentials = dict(username="test_user", password="test_password")
+        cls.user = User.objects.create_user(**cls.credentials)
+        cls.profile = Profile.objects.create(
+            user=cls.user,
+            fullName="test_name",
+        )
+        cls.order = Order.objects.create(
+            profile=cls.profile, fullName=cls.profile.fullName
+        )
+        cls.image = Image.objects.create(
+            src=os.path.join(
+                settings.MEDIA_ROOT / "catalog_app_images", "test_product.jpg"
+            )
+        )
+        cls.category = Category.objects.create(
+            title="test_category_title", image=cls.image
+        )
+        cls.product = Product.objects.create(
+            category=cls.category,
+            price=100,
+            count=1,
+            title="test_product_title",
+            description="test_description",
+            fullDescription="test_fullDescription",
+            freeDelivery=False,
+            limited=False,
+        )
+        cls.order.products.add(cls.product)
+        cls.delivery_price = DeliveryPrice.objects.create(
+            free_delivery_point=2000.00, price=200.00
+        )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Метод для очистки БД после проведения теста."""
+
+        cls.order.delete()
+        cls.user.delete()
+        cls.product.delete()
+        cls.category.delete()
+        cls.image.delete()
+        cls.delivery_price.delete()
+
+    def setUp(self) -> None:
+        """Метод для предварительной подготовки БД к проведению теста."""
+
+        self.client.login(**self.credentials)
+
+    def test_get_order_detail(self) -> None:
+        """Метод для тестирования получения детальной информации о заказе."""
+
+        response = self.client.get(
+            reverse("order_detail", kwargs={"pk": self.order.pk})
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, self.order.profile.fullName)
+
+    def test_order_confirm(self) -> None:
+        """Метод для тестирования подтверждения заказа."""
 
         response = self.client.post(
             reverse("order_detail", kwargs={"pk": self.order.pk}),
@@ -332,6 +1422,267 @@ class OrderDetailViewTestCase(APITestCase):
         self.assertEqual(response.status_code, 200)
 
 
+class OrderCheckoutContactsTestCase(APITestCase):
+    """
+    Тест привязки профиля и контактов пользователя к заказу при оформлении и чтения заказа без записи в БД.
+    Родитель: APITestCase.
+    """
+
+    def setUp(self) -> None:
+        """Метод для предварительной подготовки БД к проведению теста."""
+
+        image = Image.objects.create(
+            src=os.path.join(
+                settings.MEDIA_ROOT / "catalog_app_images", "test_product.jpg"
+            )
+        )
+        category = Category.objects.create(title="test_category_title", image=image)
+        self.product = Product.objects.create(
+            category=category,
+            price=100,
+            count=5,
+            title="test_product_title",
+            description="test_description",
+            fullDescription="test_fullDescription",
+            freeDelivery=False,
+            limited=False,
+        )
+        self.credentials = dict(username="test_user", password="test_password")
+        self.user = User.objects.create_user(**self.credentials)
+        self.profile = Profile.objects.create(
+            user=self.user,
+            fullName="test_name",
+            email="test@email.ru",
+            phone="1234567890",
+        )
+
+    def create_order(self) -> Order:
+        """Метод для создания заказа."""
+
+        response = self.client.post(
+            reverse("orders"), [{"id": self.product.pk, "count": 1}]
+        )
+        self.assertEqual(response.status_code, 200)
+        return Order.objects.get(pk=response.json()["orderId"])
+
+    def test_checkout_fills_contacts(self) -> None:
+        """Метод для тестирования внесения профиля и контактов в заказ при создании заказа."""
+
+        self.client.force_login(self.user)
+        order = self.create_order()
+        self.assertEqual(order.profile, self.profile)
+        self.assertEqual(
+            (order.fullName, order.email, order.phone),
+            ("test_name", "test@email.ru", "1234567890"),
+        )
+
+    def test_anonymous_order_claimed_on_login(self) -> None:
+        """Метод для тестирования привязки заказа анонимного пользователя к профилю при входе в учетную запись."""
+
+        order = self.create_order()
+        confirmed_order = self.create_order()
+        transition_order(
+            confirmed_order, OrderStatus.CONFIRMED, fullName="checkout_name"
+        )
+        other_order = Order.objects.create()
+        self.assertIsNone(order.profile)
+        response = self.client.post(reverse("login"), self.credentials)
+        self.assertEqual(response.status_code, 200)
+        order.refresh_from_db()
+        self.assertEqual(order.profile, self.profile)
+        self.assertEqual(order.fullName, "test_name")
+        confirmed_order.refresh_from_db()
+        self.assertEqual(confirmed_order.profile, self.profile)
+        self.assertEqual(confirmed_order.fullName, "checkout_name")
+        other_order.refresh_from_db()
+        self.assertIsNone(other_order.profile)
+
+    def test_get_does_not_write(self) -> None:
+        """Метод для тестирования чтения детальной страницы заказа без запросов на запись."""
+
+        order = Order.objects.create()
+        self.client.force_login(self.user)
+        url = reverse("order_detail", kwargs={"pk": order.pk})
+        # Первый запрос сохраняет сессию
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [
+                query["sql"]
+                for query in queries.captured_queries
+                if query["sql"].startswith(("UPDATE", "INSERT", "DELETE"))
+            ],
+            [],
+        )
+        order.refresh_from_db()
+        self.assertIsNone(order.profile)
+
+    def test_etag(self) -> None:
+        """Метод для тестирования ответа 304 на запрос заказа с неизмененным ETag."""
+
+        order = Order.objects.create(profile=self.profile)
+        self.client.force_login(self.user)
+        url = reverse("order_detail", kwargs={"pk": order.pk})
+        response = self.client.get(url)
+        etag = response["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        Order.objects.filter(pk=order.pk).update(city="test_city")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class OrderSnapshotTestCase(APITestCase):
+    """Тест снимков товаров в строках заказов. Родитель: APITestCase."""
+
+    def setUp(self) -> None:
+        """Метод для предварительной подготовки БД к проведению теста."""
+
+        image = Image.objects.create(
+            src=os.path.join(
+                settings.MEDIA_ROOT / "catalog_app_images", "test_product.jpg"
+            )
+        )
+        category = Category.objects.create(title="test_category_title", image=image)
+        self.sale = Sale.objects.create(
+            salePrice=80,
+            dateFrom=timezone.localdate() - timedelta(days=1),
+            dateTo=timezone.localdate() + timedelta(days=1),
+        )
+        self.products = Product.objects.bulk_create(
+            Product(
+                category=category,
+                price=100 + number,
+                count=10,
+                title="test_product_title_{number}".format(number=number),
+                description="test_description",
+                fullDescription="test_fullDescription",
+                freeDelivery=False,
+                limited=False,
+                sale=self.sale if number == 0 else None,
+            )
+            for number in range(3)
+        )
+        self.image = Image.objects.create(
+            src=image.src, alt="test_image", product=self.products[0]
+        )
+        DeliveryPrice.objects.create(free_delivery_point=2000.00, price=200.00)
+        self.user = User.objects.create_user(username="test_user")
+        self.profile = Profile.objects.create(user=self.user, fullName="test_name")
+        self.client.force_login(self.user)
+        self.order = Order.objects.create(profile=self.profile)
+        ProductsInOrderCount.objects.bulk_create(
+            ProductsInOrderCount(order=self.order, product=product, count_in_order=2)
+            for product in self.products
+        )
+
+    def confirm(self) -> None:
+        """Метод для подтверждения заказа."""
+
+        response = self.client.post(
+            reverse("order_detail", kwargs={"pk": self.order.pk}),
+            {
+                "fullName": "test_name",
+                "email": "test@email.ru",
+                "phone": "1234567890",
+                "deliveryType": "free",
+                "paymentType": "online",
+                "city": "test_city",
+                "address": "test_address",
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_confirm_snapshots_lines(self) -> None:
+        """Метод для тестирования записи снимков товаров и итоговой стоимости при подтверждении заказа."""
+
+        self.confirm()
+        line = ProductsInOrderCount.objects.get(
+            order=self.order, product=self.products[0]
+        )
+        self.assertEqual(line.title, "test_product_title_0")
+        self.assertEqual(line.description, "test_description")
+        self.assertEqual(line.price, 100)
+        self.assertEqual(line.salePrice, 80)
+        self.assertEqual(line.thumbnail, self.image.src.url)
+        self.assertIsNotNone(line.snapshot_at)
+        self.assertFalse(
+            ProductsInOrderCount.objects.filter(
+                order=self.order, snapshot_at__isnull=True
+            ).exists()
+        )
+        self.order.refresh_from_db()
+        # Первый товар продается по цене со скидкой
+        self.assertEqual(self.order.totalCost, (80 + 101 + 102) * 2 + 200)
+
+    def test_history_shows_price_paid(self) -> None:
+        """Метод для тестирования вывода заказа по снимкам без запросов к товарам после изменения товара."""
+
+        self.confirm()
+        Product.objects.filter(pk=self.products[0].pk).update(
+            price=500, title="test_new_title", description="test_new_description"
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("order_detail", kwargs={"pk": self.order.pk})
+            )
+        self.assertEqual(response.status_code, 200)
+        products = response.json()["products"]
+        self.assertEqual(products[0]["title"], "test_product_title_0")
+        self.assertEqual(products[0]["description"], "test_description")
+        self.assertEqual(products[0]["price"], "100.00")
+        self.assertEqual(products[0]["salePrice"], "80.00")
+        self.assertEqual(products[0]["count"], 2)
+        self.assertEqual(
+            products[0]["images"],
+            [{"src": self.image.src.url, "alt": "test_product_title_0"}],
+        )
+        self.assertFalse(
+            any(
+                '"catalog_app_image"' in query["sql"]
+                or 'FROM "catalog_app_product" INNER' in query["sql"]
+                for query in queries.captured_queries
+            )
+        )
+
+    def test_unconfirmed_order_shows_current_product(self) -> None:
+        """Метод для тестирования вывода строк заказа без снимка из текущих данных товара."""
+
+        Product.objects.filter(pk=self.products[0].pk).update(price=500)
+        response = self.client.get(
+            reverse("order_detail", kwargs={"pk": self.order.pk})
+        )
+        self.assertEqual(response.json()["products"][0]["price"], "500.00")
+        self.assertFalse(
+            ProductsInOrderCount.objects.filter(snapshot_at__isnull=False).exists()
+        )
+
+    def test_backfill_command(self) -> None:
+        """Метод для тестирования записи снимков в строки исторических заказов пачками."""
+
+        out = StringIO()
+        with mock.patch("shop_app.snapshots.time.sleep") as sleep:
+            call_command(
+                "backfill_order_snapshots", batch_size=2, pause=0.5, stdout=out
+            )
+        self.assertIn("Обработано строк заказов: 3, пачек: 2", out.getvalue())
+        sleep.assert_called_once_with(0.5)
+        self.assertEqual(
+            sorted(ProductsInOrderCount.objects.values_list("title", "price")),
+            [
+                ("test_product_title_0", 100),
+                ("test_product_title_1", 101),
+                ("test_product_title_2", 102),
+            ],
+        )
+        call_command("backfill_order_snapshots", stdout=out)
+        self.assertIn("Обработано строк заказов: 0, пачек: 0", out.getvalue())
+
+
 class PaymentViewTestCase(APITestCase):
     """Тест представления оплаты заказа. Родитель: APITestCase."""
 
@@ -339,7 +1690,7 @@ class PaymentViewTestCase(APITestCase):
     def setUpClass(cls) -> None:
         """Метод для предварительной подготовки БД к проведению теста."""
 
-        cls.order = Order.objects.create()
+        cls.order = Order.objects.create(status=OrderStatus.CONFIRMED)
 
     @classmethod
     def tearDownClass(cls) -> None:
@@ -348,41 +1699,930 @@ class PaymentViewTestCase(APITestCase):
         cls.order.delete()
 
     def setUp(self) -> None:
-        """Метод для предварительной подготовки celery к проведению теста."""
+        """Метод для предварительной подготовки celery и симулятора платежной системы к проведению теста."""
 
         app.conf.task_always_eager = True
+        patcher = mock.patch("shop_app.gateway._gateway", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
     def tearDown(self) -> None:
         """Метод для возвращения celery к прежним настройкам после проведения теста."""
 
         app.conf.task_always_eager = False
 
+    def pay(self, number: int) -> Payment:
+        """Метод для оплаты заказа картой с номером number."""
+
+        with mock.patch("shop_app.gateway.time.sleep"), self.captureOnCommitCallbacks(
+            execute=True
+        ):
+            response = self.client.post(
+                reverse("payment", kwargs={"pk": self.order.pk}),
+                {
+                    "number": number,
+                    "name": "Test name",
+                    "month": 12,
+                    "year": 30,
+                    "code": 123,
+                },
+            )
+        self.assertEqual(response.status_code, 202)
+        payment_id = response.json()["paymentId"]
+        self.assertEqual(
+            response["Location"], reverse("payment_status", kwargs={"pk": payment_id})
+        )
+        return Payment.objects.get(pk=payment_id)
+
     def test_payment(self) -> None:
         """Метод для тестирования оплаты заказа."""
 
+        order_payment = self.pay(2222222222222222)
+        self.assertEqual(order_payment.status, "paid")
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, OrderStatus.PAID)
+        response = self.client.get(
+            reverse("payment_status", kwargs={"pk": order_payment.pk})
+        )
+        self.assertEqual(
+            response.json(),
+            {
+                "id": order_payment.pk,
+                "order": self.order.pk,
+                "status": "paid",
+                "error": "",
+            },
+        )
         response = self.client.post(
             reverse("payment", kwargs={"pk": self.order.pk}),
             {
                 "number": 2222222222222222,
                 "name": "Test name",
                 "month": 12,
-                "year": 25,
+                "year": 30,
                 "code": 123,
             },
         )
-        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.status_code, 400)
 
     def test_payment_not_complete(self) -> None:
         """Метод для тестирования оплаты заказа с нечетным номером карты."""
 
+        order_payment = self.pay(1111111111111111)
+        self.assertEqual(order_payment.status, "failed")
+        self.assertTrue(order_payment.error)
+        self.order.refresh_from_db()
+        self.assertNotEqual(self.order.status, OrderStatus.PAID)
+
+    def test_payment_returns_before_task(self) -> None:
+        """Метод для тестирования ответа до выполнения оплаты воркером celery."""
+
+        with mock.patch("shop_app.views.payment.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse("payment", kwargs={"pk": self.order.pk}),
+                    {
+                        "number": 2222222222222222,
+                        "name": "Test name",
+                        "month": 12,
+                        "year": 30,
+                        "code": 123,
+                    },
+                )
+        self.assertEqual(response.status_code, 202)
+        payment_id = response.json()["paymentId"]
+        delay.assert_called_once_with(payment_id, "2222222222222222")
+        self.assertEqual(Payment.objects.get(pk=payment_id).status, "pending")
+
+    def test_pending_payment_reused(self) -> None:
+        """Метод для тестирования повторной оплаты заказа, оплата которого еще выполняется."""
+
+        url = reverse("payment", kwargs={"pk": self.order.pk})
+        data = {
+            "number": 2222222222222222,
+            "name": "Test name",
+            "month": 12,
+            "year": 30,
+            "code": 123,
+        }
+        with mock.patch("shop_app.views.payment.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                first = self.client.post(url, data, headers={"Idempotency-Key": "a"})
+                second = self.client.post(url, data, headers={"Idempotency-Key": "b"})
+            self.assertEqual(second.status_code, 202)
+            self.assertEqual(second.json(), first.json())
+            delay.assert_called_once()
+            Payment.objects.filter(pk=first.json()["paymentId"]).update(status="failed")
+            with self.captureOnCommitCallbacks(execute=True):
+                third = self.client.post(url, data)
+        self.assertNotEqual(third.json(), first.json())
+        self.assertEqual(delay.call_count, 2)
+
+    @override_settings(PAYMENT_SIMULATOR={"failure_rate": 1})
+    def test_payment_gateway_unavailable(self) -> None:
+        """Метод для тестирования оплаты при недоступной платежной системе после всех повторов."""
+
+        order_payment = self.pay(2222222222222222)
+        self.assertEqual(order_payment.status, "pending")
+        self.assertEqual(reconcile_pending_payments(get_payment_gateway(), 0, 10), 1)
+        order_payment.refresh_from_db()
+        self.assertEqual(order_payment.status, "failed")
+        self.assertEqual(order_payment.error, "Платежная система недоступна")
+        self.order.refresh_from_db()
+        self.assertNotEqual(self.order.status, OrderStatus.PAID)
+        self.assertEqual(self.pay(2222222222222222).attempt, 2)
+
+    @override_settings(
+        PAYMENT_SIMULATOR={"timeout_rate": 1, "timeout_delay": 0},
+        PAYMENT_GATEWAY_ATTEMPTS=1,
+    )
+    def test_payment_timeout_reconciled(self) -> None:
+        """Метод для тестирования сверки оплаты, списание которой завершилось таймаутом."""
+
+        order_payment = self.pay(2222222222222222)
+        self.assertEqual(order_payment.status, "pending")
+        self.assertEqual(
+            order_payment.idempotency_key,
+            "order-{order}-attempt-1".format(order=self.order.pk),
+        )
+        self.assertEqual(reconcile_pending_payments(get_payment_gateway(), 60, 10), 0)
+        self.assertEqual(reconcile_pending_payments(get_payment_gateway(), 0, 10), 1)
+        order_payment.refresh_from_db()
+        self.assertEqual(order_payment.status, "paid")
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, OrderStatus.PAID)
+
+
+@override_settings(
+    PAYMENT_EVENTS_REDIS_URL="redis://payment-events",
+    PAYMENT_EVENTS_HEARTBEAT=0.01,
+)
+class PaymentEventsTestCase(APITestCase):
+    """Тест потока событий оплаты. Родитель: APITestCase."""
+
+    def setUp(self) -> None:
+        """Метод для предварительной подготовки БД и fakeredis к проведению теста."""
+
+        self.order = Order.objects.create()
+        self.payment = Payment.objects.create(order=self.order)
+        server = fakeredis.FakeServer()
+        patchers = [
+            mock.patch(
+                "shop_app.payments.get_payment_events_client",
+                return_value=fakeredis.FakeRedis(server=server),
+            ),
+            mock.patch(
+                "shop_app.payments.redis.asyncio.Redis.from_url",
+                return_value=fakeredis.aioredis.FakeRedis(server=server),
+            ),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_events(self) -> None:
+        """Метод для тестирования передачи изменения статуса оплаты в поток событий."""
+
+        response = await self.async_client.get(
+            reverse("payment_events", kwargs={"pk": self.payment.pk})
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = aiter(response.streaming_content)
+        first = await anext(events)
+        self.assertIn(b"retry: 2000", first)
+        self.assertIn(b'"status": "pending"', first)
+        self.assertEqual(await anext(events), b": heartbeat\n\n")
+        self.payment.status = "paid"
+        await sync_to_async(publish_payment_status)(self.payment)
+        event = await anext(events)
+        while event == b": heartbeat\n\n":
+            event = await anext(events)
+        self.assertIn(b'"status": "paid"', event)
+        with self.assertRaises(StopAsyncIteration):
+            await anext(events)
+
+    async def test_final_status(self) -> None:
+        """Метод для тестирования закрытия потока событий оплаты с окончательным статусом."""
+
+        self.payment.status = "failed"
+        await self.payment.asave(update_fields=["status"])
+        response = await self.async_client.get(
+            reverse("payment_events", kwargs={"pk": self.payment.pk})
+        )
+        events = [event async for event in response.streaming_content]
+        self.assertEqual(len(events), 1)
+        self.assertIn(b'"status": "failed"', events[0])
+
+    @override_settings(PAYMENT_EVENTS_REDIS_URL="")
+    async def test_events_without_redis(self) -> None:
+        """Метод для тестирования передачи текущего статуса оплаты без Redis."""
+
+        response = await self.async_client.get(
+            reverse("payment_events", kwargs={"pk": self.payment.pk})
+        )
+        events = [event async for event in response.streaming_content]
+        self.assertEqual(len(events), 1)
+        self.assertIn(b'"status": "pending"', events[0])
+
+    async def test_unknown_payment(self) -> None:
+        """Метод для тестирования ответа 404 для несуществующей оплаты."""
+
+        response = await self.async_client.get(
+            reverse("payment_events", kwargs={"pk": self.payment.pk + 1})
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class PaymentGatewayTestCase(APITestCase):
+    """Тест адаптеров платежного шлюза и симулятора платежной системы. Родитель: APITestCase."""
+
+    def test_simulator_idempotency(self) -> None:
+        """Метод для тестирования повторного запроса к симулятору с тем же ключом идемпотентности."""
+
+        simulator = PaymentSimulator()
+        first = simulator.process("2222", "payment-1")
+        self.assertEqual(first["status"], "paid")
+        self.assertEqual(simulator.process("2222", "payment-1"), first)
+        self.assertEqual(simulator.process("1111", "payment-2")["status"], "failed")
+        self.assertEqual(simulator.charges, 2)
+
+    def test_simulator_in_flight(self) -> None:
+        """Метод для тестирования повторного запроса во время обработки первого запроса."""
+
+        simulator = PaymentSimulator(latency=0.2)
+        thread = threading.Thread(target=simulator.process, args=("2222", "payment-1"))
+        thread.start()
+        time.sleep(0.05)
+        self.assertEqual(simulator.process("2222", "payment-1")["status"], "pending")
+        thread.join()
+        self.assertEqual(simulator.process("2222", "payment-1")["status"], "paid")
+        self.assertEqual(simulator.charges, 1)
+
+    def test_simulator_rate_limit(self) -> None:
+        """Метод для тестирования ограничения количества списаний в секунду."""
+
+        simulator = PaymentSimulator(rate_limit=2)
+        simulator.process("2222", "payment-1")
+        simulator.process("2222", "payment-2")
+        with self.assertRaises(GatewayRateLimited):
+            simulator.process("2222", "payment-3")
+
+    def test_retries_after_timeout(self) -> None:
+        """Метод для тестирования повтора с тем же ключом после таймаута без повторного списания."""
+
+        simulator = PaymentSimulator(timeout_rate=1)
+        with mock.patch("shop_app.gateway.time.sleep") as sleep:
+            result = charge_with_retries(
+                SimulatorGateway(simulator), 1, "payment-1", 100, "2222"
+            )
+        self.assertEqual(result["status"], "paid")
+        self.assertEqual(simulator.charges, 1)
+        self.assertEqual(sleep.call_args_list[-1], mock.call(0.5))
+
+    def test_retries_exhausted(self) -> None:
+        """Метод для тестирования ошибки после последней неудачной попытки."""
+
+        gateway = SimulatorGateway(PaymentSimulator(failure_rate=1))
+        with mock.patch("shop_app.gateway.time.sleep") as sleep:
+            with self.assertRaises(GatewayError):
+                charge_with_retries(
+                    gateway, 1, "payment-1", 100, "2222", attempts=3, backoff=1
+                )
+        self.assertIn(mock.call(1), sleep.call_args_list)
+        self.assertIn(mock.call(2), sleep.call_args_list)
+
+    def test_http_gateway(self) -> None:
+        """Метод для тестирования HTTP адаптера с сервером симулятора платежной системы."""
+
+        simulator = PaymentSimulator(rate_limit=1)
+        server = build_server("127.0.0.1", 0, simulator, "secret")
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        gateway = HttpGateway(
+            "http://127.0.0.1:{port}".format(port=server.server_address[1])
+        )
+        result = gateway.charge(1, 100, "2222", "payment-1")
+        self.assertEqual(result["status"], "paid")
+        self.assertEqual(gateway.charge(1, 100, "2222", "payment-1"), result)
+        self.assertEqual(gateway.status("payment-1"), result)
+        self.assertIsNone(gateway.status("payment-2"))
+        with self.assertRaises(GatewayRateLimited):
+            gateway.charge(2, 100, "2222", "payment-2")
+
+    def test_benchmark(self) -> None:
+        """Метод для тестирования нагрузочного теста платежного шлюза."""
+
+        metrics = run_benchmark(SimulatorGateway(PaymentSimulator()), 20, 4)
+        self.assertEqual(metrics["statuses"], {"paid": 20})
+        self.assertEqual(metrics["errors"], 0)
+        self.assertLessEqual(metrics["p50"], metrics["p99"])
+
+
+@override_settings(PAYMENT_WEBHOOK_SECRET="secret")
+class PaymentWebhookTestCase(APITestCase):
+    """Тест представления уведомлений платежного шлюза. Родитель: APITestCase."""
+
+    def setUp(self) -> None:
+        """Метод для предварительной подготовки БД к проведению теста."""
+
+        self.order = Order.objects.create(status=OrderStatus.CONFIRMED)
+        self.payment = Payment.objects.create(order=self.order)
+
+    def notify(self, result: dict, secret: str = "secret"):
+        """Метод для отправки уведомления платежного шлюза с результатом списания result."""
+
+        body = json.dumps(dict(result, payment=self.payment.pk)).encode()
+        return self.client.generic(
+            "POST",
+            reverse("payment_webhook"),
+            body,
+            content_type="application/json",
+            HTTP_X_GATEWAY_SIGNATURE=sign_webhook(body, secret),
+        )
+
+    def test_webhook(self) -> None:
+        """Метод для тестирования записи результата оплаты из уведомления и повторного уведомления."""
+
+        response = self.notify(charge_result("paid", "transaction"))
+        self.assertEqual(response.status_code, 200)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "paid")
+        self.assertEqual(self.payment.transaction, "transaction")
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, OrderStatus.PAID)
+        response = self.notify(charge_result("failed", "other", "error"))
+        self.assertEqual(response.status_code, 200)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "paid")
+        self.assertEqual(self.payment.transaction, "transaction")
+
+    def test_invalid_signature(self) -> None:
+        """Метод для тестирования ответа 403 на уведомление с неверной подписью."""
+
+        response = self.notify(charge_result("paid"), secret="other")
+        self.assertEqual(response.status_code, 403)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "pending")
+
+    @override_settings(PAYMENT_WEBHOOK_SECRET="")
+    def test_secret_not_set(self) -> None:
+        """Метод для тестирования ответа 403 на уведомление, если ключ подписи уведомлений не задан."""
+
+        response = self.notify(charge_result("paid"), secret="")
+        self.assertEqual(response.status_code, 403)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "pending")
+
+
+class IdempotencyTestCase(APITestCase):
+    """Тест идемпотентности запросов оформления заказа и оплаты. Родитель: APITestCase."""
+
+    def setUp(self) -> None:
+        """Метод для предварительной подготовки БД к проведению теста."""
+
+        image = Image.objects.create(
+            src=os.path.join(
+                settings.MEDIA_ROOT / "catalog_app_images", "test_product.jpg"
+            )
+        )
+        category = Category.objects.create(title="test_category_title", image=image)
+        self.product = Product.objects.create(
+            category=category,
+            price=100,
+            count=5,
+            title="test_product_title",
+            description="test_description",
+            fullDescription="test_fullDescription",
+            freeDelivery=False,
+            limited=False,
+        )
+        self.user = User.objects.create_user(username="test_user")
+        self.client.force_login(self.user)
+
+    def create_order(self, key: str, count: int = 1):
+        """Метод для оформления заказа с ключом идемпотентности key."""
+
+        return self.client.post(
+            reverse("orders"),
+            [{"id": self.product.pk, "count": count}],
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_order_replay(self) -> None:
+        """Метод для тестирования повтора оформления заказа с сохраненным ответом."""
+
+        first = self.create_order("order-key")
+        self.assertEqual(first.status_code, 200)
+        second = self.create_order("order-key")
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.count, 4)
+        self.assertEqual(self.create_order("other-key").status_code, 200)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_key_mismatch(self) -> None:
+        """Метод для тестирования ответа 422 на повтор ключа с другим телом запроса."""
+
+        self.create_order("order-key")
+        response = self.create_order("order-key", count=2)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_in_flight(self) -> None:
+        """Метод для тестирования ответа 409 во время выполнения первого запроса и занятия ключа после его срока."""
+
+        fingerprint = salted_hmac(
+            FINGERPRINT_SALT,
+            json.dumps([{"count": 1, "id": self.product.pk}]),
+            algorithm="sha256",
+        ).hexdigest()
+        record = IdempotencyKey.objects.create(
+            owner="user:{pk}".format(pk=self.user.pk),
+            path=reverse("orders"),
+            key="order-key",
+            fingerprint=fingerprint,
+            locked_until=timezone.now() + timedelta(minutes=1),
+            expires_at=timezone.now() + timedelta(days=1),
+        )
+        response = self.create_order("order-key")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertFalse(Order.objects.exists())
+        record.locked_until = timezone.now() - timedelta(seconds=1)
+        record.save(update_fields=["locked_until"])
+        self.assertEqual(self.create_order("order-key").status_code, 200)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_response_stored_with_order(self) -> None:
+        """Метод для тестирования повтора запроса, ответ на который не был отправлен после создания заказа."""
+
+        with mock.patch(
+            "rest_framework.views.APIView.finalize_response", side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.create_order("order-key")
+        order = Order.objects.get()
+        response = self.create_order("order-key")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"orderId": order.pk})
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_error_releases_key(self) -> None:
+        """Метод для тестирования освобождения ключа после ответа с ошибкой."""
+
+        response = self.create_order("order-key", count=6)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_payment_replay(self) -> None:
+        """Метод для тестирования повтора оплаты без повторной постановки оплаты в очередь celery."""
+
+        order = Order.objects.create(status=OrderStatus.CONFIRMED)
+        data = {
+            "number": 2222222222222222,
+            "name": "Test name",
+            "month": 12,
+            "year": 30,
+            "code": 123,
+        }
+        with mock.patch("shop_app.views.payment.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                responses = [
+                    self.client.post(
+                        reverse("payment", kwargs={"pk": order.pk}),
+                        data,
+                        HTTP_IDEMPOTENCY_KEY="payment-key",
+                    )
+                    for _ in range(2)
+                ]
+        self.assertEqual([response.status_code for response in responses], [202, 202])
+        self.assertEqual(responses[0].json(), responses[1].json())
+        self.assertEqual(responses[0]["Location"], responses[1]["Location"])
+        self.assertEqual(Payment.objects.filter(order=order).count(), 1)
+        delay.assert_called_once()
+
+
+class PricingTestCase(APITestCase):
+    """Тест расчета стоимости корзины и заказов. Родитель: APITestCase."""
+
+    def setUp(self) -> None:
+        """Метод для предварительной подготовки БД и кэша стоимости доставки к проведению теста."""
+
+        image = Image.objects.create(
+            src=os.path.join(
+                settings.MEDIA_ROOT / "catalog_app_images", "test_product.jpg"
+            )
+        )
+        category = Category.objects.create(title="test_category_title", image=image)
+        today = timezone.localdate()
+        sales = [
+            Sale.objects.create(
+                salePrice=79.99,
+                dateFrom=today - timedelta(days=1),
+                dateTo=today + timedelta(days=1),
+            ),
+            Sale.objects.create(
+                salePrice=50,
+                dateFrom=today - timedelta(days=10),
+                dateTo=today - timedelta(days=1),
+            ),
+        ]
+        self.products = [
+            Product.objects.create(
+                category=category,
+                price=price,
+                count=10,
+                title="test_product_title",
+                description="test_description",
+                fullDescription="test_fullDescription",
+                freeDelivery=False,
+                limited=False,
+                sale=sale,
+            )
+            for price, sale in ((100, sales[0]), (100.5, sales[1]), (30, None))
+        ]
+        self.delivery_price = DeliveryPrice.objects.create(
+            free_delivery_point=500, price=200
+        )
+        ExpressDeliveryPrice.objects.create(price=500)
+        delivery_prices.invalidate()
+        self.addCleanup(delivery_prices.invalidate)
+        self.user = User.objects.create_user(username="test_user")
+        self.client.force_login(self.user)
+
+    def test_basket_preview(self) -> None:
+        """Метод для тестирования стоимости корзины со скидками и экспресс доставкой."""
+
+        basket = Basket.objects.create(user=self.user)
+        reserve_product_in_basket(basket, self.products[0].pk, 2)
+        reserve_product_in_basket(basket, self.products[1].pk, 1)
+        reserve_product_in_basket(basket, self.products[2].pk, 3)
+        # Один запрос к строкам корзины и два запроса стоимости доставки, которая в транзакции теста не кэшируется
+        with self.assertNumQueries(3):
+            totals = basket_totals(basket, "express")
+        self.assertEqual(
+            totals,
+            {
+                "count": 6,
+                "subtotal": Decimal("390.50"),
+                "discount": Decimal("40.02"),
+                "delivery": Decimal("200.00"),
+                "express": Decimal("500.00"),
+                "total": Decimal("1050.48"),
+            },
+        )
+        response = self.client.get(reverse("basket_preview"))
+        self.assertEqual(
+            response.json(),
+            {
+                "count": 6,
+                "subtotal": "390.50",
+                "discount": "40.02",
+                "delivery": "200.00",
+                "express": "0.00",
+                "total": "550.48",
+            },
+        )
+
+    @override_settings(BASKET_ANONYMOUS_STORAGE="cookie")
+    def test_cookie_basket_preview(self) -> None:
+        """Метод для тестирования стоимости корзины из cookie с бесплатной доставкой."""
+
+        self.client.logout()
+        self.client.post(
+            reverse("basket"), {"id": self.products[0].pk, "count": 7}, format="json"
+        )
+        response = self.client.get(reverse("basket_preview"))
+        self.assertEqual(response.json()["subtotal"], "700.00")
+        self.assertEqual(response.json()["discount"], "140.07")
+        self.assertEqual(response.json()["delivery"], "0.00")
+        self.assertEqual(response.json()["total"], "559.93")
+
+    def test_delivery_price_change(self) -> None:
+        """Метод для тестирования сброса кэша стоимости доставки при ее изменении."""
+
+        basket = Basket.objects.create(user=self.user)
+        reserve_product_in_basket(basket, self.products[2].pk, 1)
+        self.assertEqual(basket_totals(basket)["delivery"], Decimal("200.00"))
+        self.delivery_price.price = 150
+        with self.captureOnCommitCallbacks(execute=True):
+            self.delivery_price.save()
+        self.assertEqual(basket_totals(basket)["delivery"], Decimal("150.00"))
+
+    def test_order_totals(self) -> None:
+        """Метод для тестирования стоимости пачки заказов одним запросом по снимкам и текущим ценам."""
+
+        orders = [
+            Order.objects.create(deliveryType=delivery_type)
+            for delivery_type in ("ordinary", "express")
+        ]
+        for order in orders:
+            ProductsInOrderCount.objects.bulk_create(
+                ProductsInOrderCount(order=order, product=product, count_in_order=2)
+                for product in self.products
+            )
+        snapshot_order_lines(orders[0].products_in_order_count.all())
+        Product.objects.filter(pk=self.products[2].pk).update(price=40)
+        # Один запрос к строкам заказов и два запроса стоимости доставки, которая в транзакции теста не кэшируется
+        with self.assertNumQueries(3):
+            totals = order_totals([order.pk for order in orders])
+        self.assertEqual(totals[orders[0].pk]["subtotal"], Decimal("461.00"))
+        self.assertEqual(totals[orders[0].pk]["total"], Decimal("620.98"))
+        self.assertEqual(totals[orders[1].pk]["subtotal"], Decimal("481.00"))
+        self.assertEqual(totals[orders[1].pk]["express"], Decimal("500.00"))
+        self.assertEqual(totals[orders[1].pk]["total"], Decimal("1140.98"))
+
+
+class OrderStatusTestCase(APITestCase):
+    """Тест переходов заказа между статусами. Родитель: APITestCase."""
+
+    def setUp(self) -> None:
+        """Метод для предварительной подготовки БД к проведению теста."""
+
+        self.order = Order.objects.create()
+
+    def test_transitions(self) -> None:
+        """Метод для тестирования разрешенных переходов и истории статусов заказа."""
+
+        with self.assertRaises(OrderTransitionError):
+            transition_order(self.order, OrderStatus.PAID)
+        previous = transition_order(self.order, OrderStatus.CONFIRMED, totalCost=100)
+        self.assertEqual(previous, OrderStatus.CREATED)
+        transition_order(self.order, OrderStatus.PAID)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, OrderStatus.PAID)
+        self.assertEqual(self.order.totalCost, 100)
+        self.assertEqual(
+            list(
+                self.order.status_history.order_by("pk").values_list(
+                    "from_status", "to_status"
+                )
+            ),
+            [
+                (OrderStatus.CREATED, OrderStatus.CONFIRMED),
+                (OrderStatus.CONFIRMED, OrderStatus.PAID),
+            ],
+        )
+
+    def test_stale_order(self) -> None:
+        """Метод для тестирования перехода заказа, статус которого изменился параллельным запросом."""
+
+        stale = Order.objects.get(pk=self.order.pk)
+        transition_order(self.order, OrderStatus.CONFIRMED)
+        with self.assertRaises(OrderTransitionError):
+            transition_order(stale, OrderStatus.CONFIRMED, totalCost=200)
+        self.assertEqual(stale.status, OrderStatus.CONFIRMED)
+        self.assertEqual(
+            transition_order(stale, OrderStatus.PAID), OrderStatus.CONFIRMED
+        )
+        self.order.refresh_from_db()
+        self.assertIsNone(self.order.totalCost)
+        self.assertEqual(self.order.status_history.count(), 2)
+
+    def test_payment_requires_confirmation(self) -> None:
+        """Метод для тестирования отказа в оплате неподтвержденного заказа."""
+
         response = self.client.post(
             reverse("payment", kwargs={"pk": self.order.pk}),
             {
-                "number": 1111111111111111,
+                "number": 2222222222222222,
                 "name": "Test name",
                 "month": 12,
-                "year": 25,
+                "year": 30,
                 "code": 123,
             },
         )
         self.assertEqual(response.status_code, 400)
+        self.assertFalse(Payment.objects.exists())
+
+
+class OrderStatusContentionTestCase(TransactionTestCase):
+    """
+    Тест параллельных переходов заказа на PostgreSQL. Каждый поток работает в своем соединении с БД.
+    Родитель: TransactionTestCase.
+    """
+
+    threads_count = 10
+
+    def test_concurrent_confirm(self) -> None:
+        """Метод для тестирования того, что из параллельных подтверждений заказ подтверждает только одно."""
+
+        order = Order.objects.create()
+        barrier = threading.Barrier(self.threads_count)
+        results = []
+
+        def confirm(total_cost: int) -> None:
+            stale = Order.objects.get(pk=order.pk)
+            barrier.wait()
+            try:
+                transition_order(stale, OrderStatus.CONFIRMED, totalCost=total_cost)
+                results.append(total_cost)
+            except OrderTransitionError:
+                pass
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=confirm, args=(number,))
+            for number in range(self.threads_count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 1)
+        order.refresh_from_db()
+        self.assertEqual(order.status, OrderStatus.CONFIRMED)
+        self.assertEqual(order.totalCost, results[0])
+        self.assertEqual(order.status_history.count(), 1)
+
+
+@override_settings(SALES_ROLLUP_LAG=0)
+class SalesRollupTestCase(APITestCase):
+    """Тест продаж по дням. Родитель: APITestCase."""
+
+    def setUp(self) -> None:
+        """Метод для предварительной подготовки БД к проведению теста."""
+
+        image = Image.objects.create(
+            src=os.path.join(
+                settings.MEDIA_ROOT / "catalog_app_images", "test_product.jpg"
+            )
+        )
+        self.category = Category.objects.create(
+            title="test_category_title", image=image
+        )
+        self.products = [
+            Product.objects.create(
+                category=self.category,
+                price=price,
+                count=10,
+                title="test_product_title",
+                description="test_description",
+                fullDescription="test_fullDescription",
+                freeDelivery=False,
+                limited=False,
+            )
+            for price in (100, 50)
+        ]
+        self.today = timezone.localdate()
+
+    def create_order(
+        self, delivery_type: str, total_cost: Optional[int], lines: list, **fields
+    ) -> Order:
+        """Метод для создания подтвержденного заказа со строками: товар, количество и поля строки."""
+
+        order = Order.objects.create(
+            deliveryType=delivery_type,
+            totalCost=total_cost,
+            status=fields.pop("status", OrderStatus.CONFIRMED),
+        )
+        for product, count, line_fields in lines:
+            ProductsInOrderCount.objects.create(
+                order=order, product=product, count_in_order=count, **line_fields
+            )
+        return order
+
+    def pay_orders(self) -> None:
+        """Метод для оплаты заказа с обычной доставкой и заказа с экспресс доставкой."""
+
+        snapshot = {
+            "price": 100,
+            "salePrice": 80,
+            "snapshot_at": timezone.now(),
+        }
+        orders = [
+            self.create_order(
+                "ordinary",
+                210,
+                [(self.products[0], 2, snapshot), (self.products[1], 1, {})],
+            ),
+            self.create_order("express", 600, [(self.products[0], 1, {})]),
+        ]
+        for order in orders:
+            transition_order(order, OrderStatus.PAID)
+
+    def sales(self, model, key_field: str) -> dict:
+        """Метод для получения продаж по дням: количество товаров, выручка и количество заказов по ключу."""
+
+        return {
+            (row.day, getattr(row, key_field)): (row.units, row.revenue, row.orders)
+            for row in model.objects.all()
+        }
+
+    def test_update(self) -> None:
+        """Метод для тестирования учета каждого оплаченного заказа в продажах по дням ровно один раз."""
+
+        self.create_order("ordinary", 100, [(self.products[0], 1, {})])
+        self.pay_orders()
+        self.assertEqual(update_sales_rollups(), {"orders": 2, "batches": 1})
+        self.assertEqual(update_sales_rollups(), {"orders": 0, "batches": 0})
+        self.assertEqual(
+            self.sales(ProductDailySales, "product_id"),
+            {
+                (self.today, self.products[0].pk): (3, 260, 2),
+                (self.today, self.products[1].pk): (1, 50, 1),
+            },
+        )
+        self.assertEqual(
+            self.sales(CategoryDailySales, "category_id"),
+            {(self.today, self.category.pk): (4, 310, 2)},
+        )
+        self.assertEqual(
+            self.sales(DeliveryDailySales, "deliveryType"),
+            {
+                (self.today, "ordinary"): (3, 210, 1),
+                (self.today, "express"): (1, 600, 1),
+            },
+        )
+        self.pay_orders()
+        self.assertEqual(update_sales_rollups(1), {"orders": 2, "batches": 2})
+        self.assertEqual(
+            self.sales(CategoryDailySales, "category_id"),
+            {(self.today, self.category.pk): (8, 620, 4)},
+        )
+
+    def test_order_without_total_cost(self) -> None:
+        """Метод для тестирования пересчета выручки заказа без итоговой стоимости."""
+
+        order = self.create_order("express", None, [(self.products[1], 3, {})])
+        transition_order(order, OrderStatus.PAID)
+        update_sales_rollups()
+        self.assertEqual(
+            self.sales(DeliveryDailySales, "deliveryType"),
+            {(self.today, "express"): (3, 150, 1)},
+        )
+
+    @override_settings(SALES_ROLLUP_LAG=60)
+    def test_lag(self) -> None:
+        """Метод для тестирования задержки учета оплат, записи истории которых могут быть еще не зафиксированы."""
+
+        self.pay_orders()
+        self.assertEqual(update_sales_rollups(), {"orders": 0, "batches": 0})
+        self.assertFalse(ProductDailySales.objects.exists())
+
+    def test_rebuild(self) -> None:
+        """Метод для тестирования пересчета продаж с заказами, оплаченными до появления истории статусов."""
+
+        for count in (3, 1):
+            self.create_order(
+                "ordinary",
+                50 * count,
+                [(self.products[1], count, {})],
+                status=OrderStatus.PAID,
+            )
+        self.pay_orders()
+        update_sales_rollups()
+        for _ in range(2):
+            out = StringIO()
+            call_command("rebuild_sales_rollups", "--batch-size", "1", stdout=out)
+            self.assertIn("Учтено оплаченных заказов: 4, пачек: 4", out.getvalue())
+            self.assertEqual(
+                self.sales(DeliveryDailySales, "deliveryType"),
+                {
+                    (self.today, "ordinary"): (7, 410, 3),
+                    (self.today, "express"): (1, 600, 1),
+                },
+            )
+
+    def test_api(self) -> None:
+        """Метод для тестирования отчетов о продажах по дням для администраторов."""
+
+        self.pay_orders()
+        update_sales_rollups()
+        url = reverse("product_daily_sales")
+        self.client.force_authenticate(User.objects.create_user(username="test_user"))
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_authenticate(
+            User.objects.create_user(username="test_admin", is_staff=True)
+        )
+        response = self.client.get(url, {"dateFrom": self.today.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["lastPage"], 1)
+        self.assertEqual(
+            response.data["items"][0],
+            {
+                "day": self.today.isoformat(),
+                "units": 3,
+                "revenue": "260.00",
+                "orders": 2,
+                "product": self.products[0].pk,
+                "title": "test_product_title",
+            },
+        )
+        tomorrow = self.today + timedelta(days=1)
+        response = self.client.get(
+            reverse("delivery_daily_sales"), {"dateFrom": tomorrow.isoformat()}
+        )
+        self.assertEqual(response.data["items"], [])
+        response = self.client.get(url, {"pageSize": 1, "currentPage": 2})
+        self.assertEqual(response.data["lastPage"], 2)
+        self.assertEqual(response.data["items"][0]["product"], self.products[1].pk)
+        response = self.client.get(
+            reverse("category_daily_sales"), {"dateTo": "not a date"}
+        )
+        self.assertEqual(response.status_code, 400)
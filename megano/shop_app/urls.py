@@ -1,9 +1,48 @@
 from django.urls import path
-from shop_app.views import BasketView, OrderDetailView, OrderListView, PaymentView
+from shop_app.views import (
+    BasketBatchView,
+    BasketPreviewView,
+    BasketSummaryView,
+    BasketView,
+    CategoryDailySalesView,
+    DeliveryDailySalesView,
+    OrderDetailView,
+    OrderListView,
+    PaymentEventsView,
+    PaymentStatusView,
+    PaymentView,
+    PaymentWebhookView,
+    ProductDailySalesView,
+    WaitingRoomView,
+)
 
 urlpatterns = [
     path("basket", BasketView.as_view(), name="basket"),
+    path("basket/batch", BasketBatchView.as_view(), name="basket_batch"),
+    path("basket/summary", BasketSummaryView.as_view(), name="basket_summary"),
+    path("basket/preview", BasketPreviewView.as_view(), name="basket_preview"),
     path("orders", OrderListView.as_view(), name="orders"),
     path("order/<int:pk>", OrderDetailView.as_view(), name="order_detail"),
     path("payment/<int:pk>", PaymentView.as_view(), name="payment"),
+    path("payments/<int:pk>", PaymentStatusView.as_view(), name="payment_status"),
+    path("payments/webhook", PaymentWebhookView.as_view(), name="payment_webhook"),
+    path(
+        "payments/<int:pk>/events", PaymentEventsView.as_view(), name="payment_events"
+    ),
+    path(
+        "analytics/sales/products",
+        ProductDailySalesView.as_view(),
+        name="product_daily_sales",
+    ),
+    path(
+        "analytics/sales/categories",
+        CategoryDailySalesView.as_view(),
+        name="category_daily_sales",
+    ),
+    path(
+        "analytics/sales/delivery",
+        DeliveryDailySalesView.as_view(),
+        name="delivery_daily_sales",
+    ),
+    path("waiting-room/<str:token>", WaitingRoomView.as_view(), name="waiting_room"),
 ]
@@ -1,66 +1,434 @@
+import hashlib
 import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
 
-from catalog_app.models import Product
-from django.db import transaction
-from django.db.models import F, Sum
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Prefetch, QuerySet, Value
+from django.http.response import HttpResponseBase
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.renderers import JSONRenderer
 from rest_framework.request import Request
+from rest_framework.response import Response
+
+from catalog_app.models import Product
+from catalog_app.utils import prefetch_product_list
+from shop_app.flash_sale import (
+    NOT_IN_SALE,
+    SOLD_OUT,
+    FlashSaleClaimsPending,
+    flush_basket_claims,
+    get_flash_sale_store,
+)
 from shop_app.models import (
     Basket,
-    DeliveryPrice,
-    ExpressDeliveryPrice,
     Order,
+    OrderStatus,
     ProductsInBasketCount,
+    ProductsInOrderCount,
 )
+from shop_app.order_status import transition_order
+from shop_app.pricing import basket_totals, price_lines
+from shop_app.reservations import delta_case, reservation_deadline, return_to_stock
 from shop_app.serializers import (
     OrderUpdateSerializer,
     ProductInBasketListSerializer,
     ProductUpdateBasketSerializer,
 )
+from shop_app.snapshots import snapshot_order_lines, snapshot_products
+from users_app.models import Profile
+
+# Ключ сессии, в котором хранятся id пользователя и id его корзины
+BASKET_SESSION_KEY = "basket"
+
+# Ключ сессии, в котором хранятся id заказов, созданных до входа пользователя в учетную запись
+ORDERS_SESSION_KEY = "orders"
+
+# Количество товара, который уже лежит в корзине, суммируется, резерв строки продлевается
+ON_LINE_CONFLICT = (
+    "ON CONFLICT (basket_id, product_id) DO UPDATE SET "
+    "count_in_basket = {table}.count_in_basket + EXCLUDED.count_in_basket, "
+    "reserved_until = EXCLUDED.reserved_until"
+)
+
+
+class OrderListViewPagination(CursorPagination):
+    """
+    Пагинатор истории заказов по курсору. Страница выбирается по индексу (profile_id, createdAt) без подсчета
+    количества заказов и смещения, поэтому время ответа не зависит от количества заказов пользователя. Родитель:
+    CursorPagination.
+    """
+
+    page_size = 10
+    ordering = ["-createdAt", "-id"]
+
+    def get_paginated_response(self, data: list) -> Response:
+        """Метод для получения страницы списка заказов со ссылками на соседние страницы."""
+
+        return Response(
+            {
+                "items": data,
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+            }
+        )
+
+
+class DailySalesListViewPagination(PageNumberPagination):
+    """
+    Пагинатор отчетов о продажах по дням. Размер страницы задается параметром pageSize, но не больше
+    max_page_size. Родитель: PageNumberPagination.
+    """
+
+    page_size = 100
+    page_query_param = "currentPage"
+    page_size_query_param = "pageSize"
+    max_page_size = 1000
+
+    def get_paginated_response(self, data: list) -> Response:
+        """Метод для получения страницы отчета о продажах по дням."""
+
+        return Response(
+            {
+                "items": data,
+                "currentPage": self.page.number,
+                "lastPage": self.page.paginator.num_pages,
+            }
+        )
+
+
+def get_basket_summary(request: Request) -> Dict:
+    """
+    Функция для получения количества товаров в корзине и их стоимости. Стоимость считается basket_totals, как в
+    предварительном расчете корзины, одним агрегирующим запросом по строкам корзины.
+    """
+
+    return basket_totals(get_basket(request))
+
+
+def find_basket_id(request: Request) -> Optional[int]:
+    """Функция для поиска id корзины пользователя или анонимной сессии в БД."""
+
+    if request.user.is_authenticated:
+        baskets = Basket.objects.filter(user=request.user)
+    elif "anonym" in request.session:
+        baskets = Basket.objects.filter(session_id=request.session["anonym"])
+    else:
+        return None
+    return baskets.values_list("pk", flat=True).first()
 
 
-def get_basket(request: Request) -> Basket:
-    """Функция для получения корзины с товарами."""
+def create_basket(request: Request) -> Basket:
+    """Функция для создания корзины пользователя или анонимной сессии."""
 
     if request.user.is_authenticated:
         basket, _ = Basket.objects.get_or_create(user=request.user)
     else:
-        try:
-            basket = Basket.objects.get(session_id=request.session["anonym"])
-        except:
-            request.session["anonym"] = str(uuid.uuid4())
-            basket = Basket.objects.create(session_id=request.session["anonym"])
+        request.session["anonym"] = str(uuid.uuid4())
+        basket = Basket.objects.create(session_id=request.session["anonym"])
     return basket
 
 
+def get_basket(request: Request, create: bool = False) -> Optional[Basket]:
+    """
+    Функция для получения корзины с товарами. Корзина запоминается на время запроса, а ее id хранится в сессии после
+    первого поиска, поэтому повторные обращения к корзине не выполняют запросов к БД. Корзина создается только при
+    create=True (добавление товара), иначе при отсутствии корзины возвращается None.
+    """
+
+    http_request = getattr(request, "_request", request)
+    basket = getattr(http_request, "_basket", None)
+    if basket is not None:
+        return basket
+    user_id = request.user.pk
+    session_basket = request.session.get(BASKET_SESSION_KEY)
+    if session_basket is not None and session_basket[0] == user_id:
+        basket_id = session_basket[1]
+        # Корзина могла быть удалена после сохранения ее id в сессии
+        if create and not Basket.objects.filter(pk=basket_id).exists():
+            basket_id = None
+    else:
+        basket_id = find_basket_id(request)
+    if basket_id is not None:
+        basket = Basket(pk=basket_id, user_id=user_id)
+    elif create:
+        basket = create_basket(request)
+    else:
+        return None
+    if session_basket != [user_id, basket.pk]:
+        request.session[BASKET_SESSION_KEY] = [user_id, basket.pk]
+    http_request._basket = basket
+    return basket
+
+
+def basket_products(basket: Basket) -> QuerySet:
+    """
+    Функция для получения товаров в корзине с количеством товара в корзине count_in_basket. Товары выводятся
+    ProductInBasketListSerializer постоянным количеством запросов независимо от количества товаров.
+    """
+
+    return prefetch_product_list(
+        Product.objects.filter(
+            products_in_basket_count__basket=basket,
+            products_in_basket_count__count_in_basket__gt=0,
+        ).annotate(count_in_basket=F("products_in_basket_count__count_in_basket"))
+    )
+
+
+def basket_serializer(basket: Basket) -> ProductInBasketListSerializer:
+    """
+    Функция для получения сериалайзера товаров в корзине вместе с заявками флеш-распродажи, которые еще не записаны
+    в БД воркером celery. Количество товаров в отклоненных заявках по id товара передается в контексте
+    сериалайзера rejected, после чего отклоненные заявки удаляются.
+    """
+
+    products = basket_products(basket)
+    store = get_flash_sale_store()
+    if store is None:
+        return ProductInBasketListSerializer(products, many=True)
+    pending = store.pending(basket.pk)
+    products = list(products)
+    in_basket = {product.pk: product for product in products}
+    missing = [product_id for product_id in pending if product_id not in in_basket]
+    if missing:
+        for product in prefetch_product_list(
+            Product.objects.filter(pk__in=missing).annotate(count_in_basket=Value(0))
+        ):
+            products.append(product)
+            in_basket[product.pk] = product
+    for product_id, count in pending.items():
+        if product_id in in_basket:
+            in_basket[product_id].count_in_basket += count
+    return ProductInBasketListSerializer(
+        products, many=True, context={"rejected": store.pop_rejected(basket.pk)}
+    )
+
+
+def prefetch_order_products(orders: QuerySet) -> QuerySet:
+    """
+    Функция для загрузки строк заказов, которые выводит OrderDetailSerializer, постоянным количеством запросов
+    независимо от количества заказов и товаров. Строки со снимком товара выводятся без соединения с товарами,
+    товары загружаются только для строк, в которые снимок еще не записан.
+    """
+
+    return orders.prefetch_related(
+        Prefetch(
+            "products_in_order_count",
+            queryset=ProductsInOrderCount.objects.order_by("pk"),
+        ),
+        Prefetch(
+            "products_in_order_count__product",
+            queryset=snapshot_products(
+                Product.objects.filter(
+                    pk__in=ProductsInOrderCount.objects.filter(
+                        snapshot_at__isnull=True
+                    ).values("product")
+                )
+            ),
+        ),
+    )
+
+
+def reserve_product_in_basket(basket: Basket, product_id: int, count: int) -> None:
+    """
+    Функция для переноса товара со склада в корзину. Остаток уменьшается одним условным запросом UPDATE без
+    чтения продукта, поэтому параллельные добавления не продают больше, чем есть на складе. Резерв строки корзины
+    продлевается на BASKET_RESERVATION_TTL секунд. Вызывается внутри транзакции.
+    """
+
+    reserved = Product.objects.filter(pk=product_id, count__gte=count).update(
+        count=F("count") - count
+    )
+    if not reserved:
+        if not Product.objects.filter(pk=product_id).exists():
+            raise NotFound("Товар не найден")
+        raise ValidationError({"count": "Недостаточно товара на складе"})
+    reserved_until = reservation_deadline()
+    lines = ProductsInBasketCount.objects.filter(basket=basket, product_id=product_id)
+    if lines.update(
+        count_in_basket=F("count_in_basket") + count, reserved_until=reserved_until
+    ):
+        return
+    try:
+        with transaction.atomic():
+            ProductsInBasketCount.objects.create(
+                basket=basket,
+                product_id=product_id,
+                count_in_basket=count,
+                reserved_until=reserved_until,
+            )
+    except IntegrityError:
+        # Строку корзины одновременно создал параллельный запрос
+        lines.update(
+            count_in_basket=F("count_in_basket") + count, reserved_until=reserved_until
+        )
+
+
+def add_lines_to_basket(basket: Basket, lines: Dict[int, int]) -> None:
+    """
+    Функция для добавления строк в корзину одним запросом INSERT ... ON CONFLICT DO UPDATE независимо от количества
+    строк. Количество товара, который уже лежит в корзине, суммируется, резерв строк продлевается. Остатки товаров на
+    складе не изменяются.
+    """
+
+    if not lines:
+        return
+    table = connection.ops.quote_name(ProductsInBasketCount._meta.db_table)
+    reserved_until = reservation_deadline()
+    params = []
+    for product_id, count in lines.items():
+        params.extend([basket.pk, product_id, count, reserved_until])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO {table} (basket_id, product_id, count_in_basket, reserved_until) VALUES {values} "
+            "{on_conflict}".format(
+                table=table,
+                values=", ".join(["(%s, %s, %s, %s)"] * len(lines)),
+                on_conflict=ON_LINE_CONFLICT.format(table=table),
+            ),
+            params,
+        )
+
+
+def merge_anonymous_basket(request: Request) -> Optional[Basket]:
+    """
+    Функция для переноса корзины анонимной сессии в корзину пользователя при входе в учетную запись. Строки
+    переносятся одним запросом INSERT ... SELECT ... ON CONFLICT DO UPDATE с суммированием количества товаров, после
+    чего анонимная корзина удаляется. Количество запросов не зависит от количества товаров в корзине. Товары
+    остаются зарезервированными на складе. Вызывается внутри транзакции после входа пользователя.
+    """
+
+    session_basket = request.session.get(BASKET_SESSION_KEY)
+    if session_basket is not None and session_basket[0] is None:
+        anonymous_id = session_basket[1]
+    elif "anonym" in request.session:
+        anonymous_id = (
+            Basket.objects.filter(
+                session_id=request.session["anonym"], user__isnull=True
+            )
+            .values_list("pk", flat=True)
+            .first()
+        )
+    else:
+        return None
+    request.session.pop("anonym", None)
+    request.session.pop(BASKET_SESSION_KEY, None)
+    if anonymous_id is None:
+        return None
+    basket = get_basket(request, create=True)
+    table = connection.ops.quote_name(ProductsInBasketCount._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO {table} (basket_id, product_id, count_in_basket, reserved_until) "
+            "SELECT %s, product_id, count_in_basket, %s FROM {table} "
+            "WHERE basket_id = %s AND count_in_basket > 0 {on_conflict}".format(
+                table=table, on_conflict=ON_LINE_CONFLICT.format(table=table)
+            ),
+            [basket.pk, reservation_deadline(), anonymous_id],
+        )
+    Basket.objects.filter(pk=anonymous_id, user__isnull=True).delete()
+    return basket
+
+
+def release_product_from_basket(basket: Basket, product_id: int, count: int) -> None:
+    """
+    Функция для возврата товара из корзины на склад условными запросами UPDATE. Вызывается внутри транзакции.
+    """
+
+    released = ProductsInBasketCount.objects.filter(
+        basket=basket, product_id=product_id, count_in_basket__gte=count
+    ).update(count_in_basket=F("count_in_basket") - count)
+    if not released:
+        raise ValidationError({"count": "Недостаточно товара в корзине"})
+    Product.objects.filter(pk=product_id).update(count=F("count") + count)
+
+
+def update_basket_lines(basket: Optional[Basket], changes: List[Dict]) -> None:
+    """
+    Функция для изменения количества нескольких товаров в корзине одной транзакцией. changes - список изменений
+    количества товаров {"id", "count"}: положительное количество добавляется в корзину, отрицательное возвращается на
+    склад. Изменения применяются все или ни одного: при ошибке в любой строке выбрасывается ValidationError со
+    списком ошибок по строкам. Остатки и строки корзины блокируются и изменяются пакетными запросами, количество
+    запросов не зависит от количества строк. Вызывается внутри транзакции.
+    """
+
+    deltas = defaultdict(int)
+    for change in changes:
+        deltas[change["id"]] += change["count"]
+    added = {product_id: delta for product_id, delta in deltas.items() if delta > 0}
+    removed = {product_id: -delta for product_id, delta in deltas.items() if delta < 0}
+    stock = dict(
+        Product.objects.select_for_update()
+        .filter(pk__in=list(deltas))
+        .order_by("pk")
+        .values_list("pk", "count")
+    )
+    in_basket = {}
+    if removed and basket is not None:
+        in_basket = dict(
+            ProductsInBasketCount.objects.select_for_update()
+            .filter(basket=basket, product__in=list(removed))
+            .order_by("product")
+            .values_list("product", "count_in_basket")
+        )
+    errors = {}
+    for product_id in deltas:
+        if product_id not in stock:
+            errors[product_id] = {"id": ["Товар не найден"]}
+        elif stock[product_id] < added.get(product_id, 0):
+            errors[product_id] = {"count": ["Недостаточно товара на складе"]}
+        elif in_basket.get(product_id, 0) < removed.get(product_id, 0):
+            errors[product_id] = {"count": ["Недостаточно товара в корзине"]}
+    if errors:
+        raise ValidationError([errors.get(change["id"], {}) for change in changes])
+    if added:
+        Product.objects.filter(pk__in=list(added)).update(
+            count=F("count") - delta_case(added)
+        )
+        add_lines_to_basket(basket, added)
+    if removed:
+        ProductsInBasketCount.objects.filter(
+            basket=basket, product__in=list(removed)
+        ).update(count_in_basket=F("count_in_basket") - delta_case(removed, "product"))
+        Product.objects.filter(pk__in=list(removed)).update(
+            count=F("count") + delta_case(removed)
+        )
+
+
+def claim_flash_sale_product(basket: Basket, product_id: int, count: int) -> bool:
+    """
+    Функция для списания товара флеш-распродажи из остатка в Redis без блокировки строки продукта в БД. Строка
+    корзины записывается в БД воркером celery, до записи заявка выводится в корзине basket_serializer. Возвращает
+    False для товаров вне распродажи.
+    """
+
+    store = get_flash_sale_store()
+    if store is None:
+        return False
+    result = store.claim(basket.pk, product_id, count)
+    if result == NOT_IN_SALE:
+        return False
+    if result == SOLD_OUT:
+        raise ValidationError({"count": "Недостаточно товара на складе"})
+    return True
+
+
 def product_add_to_bakset(
     request: Request, serializer: ProductUpdateBasketSerializer
 ) -> ProductInBasketListSerializer:
     """Функция для добавления товара в корзину."""
 
-    basket = get_basket(request)
+    basket = get_basket(request, create=True)
     product_id = serializer.validated_data["id"]
-    product = Product.objects.get(id=product_id)
     count = serializer.validated_data["count"]
-    product_in_basket, _ = ProductsInBasketCount.objects.get_or_create(
-        basket=basket, product=product
-    )
     with transaction.atomic():
-        product.count -= count
-        product.save(update_fields=["count"])
-        product_in_basket.count_in_basket += count
-        product_in_basket.save(update_fields=["count_in_basket"])
-        products = (
-            Product.objects.prefetch_related("basket")
-            .prefetch_related("products_in_basket_count")
-            .filter(basket=basket, products_in_basket_count__count_in_basket__gt=0)
-            .select_related("category")
-            .prefetch_related("images")
-            .prefetch_related("tags")
-            .prefetch_related("reviews")
-        )
-        products_serializer = ProductInBasketListSerializer(
-            products, context={"basket": basket.id}, many=True
-        )
+        if not claim_flash_sale_product(basket, product_id, count):
+            reserve_product_in_basket(basket, product_id, count)
+        products_serializer = basket_serializer(basket)
     return products_serializer
 
 
@@ -71,57 +439,137 @@ def product_delete_from_bakset(
 
     basket = get_basket(request)
     product_id = serializer.validated_data["id"]
-    product = Product.objects.get(id=product_id)
     count = serializer.validated_data["count"]
-    product_in_basket = ProductsInBasketCount.objects.get(
-        basket=basket, product=product
-    )
+    if basket is None:
+        raise ValidationError({"count": "Товара нет в корзине"})
     with transaction.atomic():
-        product.count += count
-        product.save(update_fields=["count"])
-        product_in_basket.count_in_basket -= count
-        product_in_basket.save(update_fields=["count_in_basket"])
-        products = (
-            Product.objects.prefetch_related("basket")
-            .prefetch_related("products_in_basket_count")
-            .filter(basket=basket, products_in_basket_count__count_in_basket__gt=0)
-            .select_related("category")
-            .prefetch_related("images")
-            .prefetch_related("tags")
-            .prefetch_related("reviews")
-        )
-        products_serializer = ProductInBasketListSerializer(
-            products, context={"basket": basket.id}, many=True
-        )
+        release_product_from_basket(basket, product_id, count)
+        products_serializer = basket_serializer(basket)
     return products_serializer
 
 
-def order_users_params_get(request: Request, order: Order) -> None:
-    """Функция для привязки профиля пользователя к заказу и внесения в заказ параметров пользователя."""
+def flush_checkout_claims(request: Request) -> None:
+    """
+    Функция для записи в БД заявок флеш-распродажи корзины перед оформлением заказа, чтобы товары заявок вошли в
+    резерв корзины. Иначе заявка, записанная после оформления, списывает товар со склада второй раз и
+    возвращает его в очищенную корзину. Вызывается вне транзакции создания заказа. Если заявки не удалось
+    записать, выбрасывается исключение FlashSaleClaimsPending.
+    """
+
+    store = get_flash_sale_store()
+    if store is None:
+        return
+    basket = get_basket(request)
+    if basket is None:
+        return
+    if not flush_basket_claims(
+        store,
+        basket.pk,
+        batch_size=settings.FLASH_SALE_WRITE_BATCH,
+        wait=settings.FLASH_SALE_CHECKOUT_WAIT,
+    ):
+        raise FlashSaleClaimsPending()
+
+
+def checkout_basket(basket: Basket, lines: List[Dict]) -> None:
+    """
+    Функция для очистки корзины после создания заказа. Резерв товаров, вошедших в заказ, списывается, остальные
+    товары корзины возвращаются на склад. Количество запросов не зависит от количества товаров. Вызывается внутри
+    транзакции создания заказа.
+    """
+
+    used = {line["id"]: line["reserved"] for line in lines if line["reserved"]}
+    if used:
+        ProductsInBasketCount.objects.filter(
+            basket=basket, product__in=list(used)
+        ).update(count_in_basket=F("count_in_basket") - delta_case(used, "product"))
+    return_to_stock(
+        ProductsInBasketCount.objects.filter(basket=basket, count_in_basket__gt=0)
+    )
+    ProductsInBasketCount.objects.filter(basket=basket).update(
+        count_in_basket=0, reserved_until=None
+    )
+
+
+def profile_contacts(profile: Profile) -> Dict:
+    """Функция для получения профиля и контактов пользователя, которые вносятся в заказ при оформлении."""
+
+    return {
+        "profile": profile,
+        "fullName": profile.fullName or "",
+        "phone": profile.phone or None,
+        "email": profile.email or "",
+    }
+
+
+def checkout_contacts(request: Request) -> Dict:
+    """
+    Функция для получения профиля и контактов пользователя для создаваемого заказа. Заказ анонимного пользователя
+    и пользователя без профиля создается без профиля.
+    """
+
+    profile = getattr(request.user, "profile", None)
+    return profile_contacts(profile) if profile is not None else {}
 
-    if request.user.is_authenticated:
-        profile = request.user.profile
-        order.profile = profile
-        order.fullName = profile.fullName if profile.fullName else None
-        order.phone = profile.phone if profile.phone else None
-        order.email = profile.email if profile.email else None
-        order.save(update_fields=["profile"])
+
+def remember_anonymous_order(request: Request, order: Order) -> None:
+    """Функция для сохранения в сессии id заказа, созданного анонимным пользователем."""
+
+    if not request.user.is_authenticated:
+        request.session[ORDERS_SESSION_KEY] = request.session.get(
+            ORDERS_SESSION_KEY, []
+        ) + [order.pk]
+
+
+def claim_anonymous_orders(request: Request) -> int:
+    """
+    Функция для привязки к профилю пользователя заказов, созданных в сессии до входа в учетную запись. К заказам
+    во всех статусах привязывается профиль, в еще не подтвержденные заказы вносятся и контакты из профиля.
+    Вызывается после входа пользователя. Возвращает количество привязанных заказов.
+    """
+
+    order_ids = request.session.pop(ORDERS_SESSION_KEY, [])
+    contacts = checkout_contacts(request) if order_ids else {}
+    if not contacts:
+        return 0
+    orders = Order.objects.filter(pk__in=order_ids, profile__isnull=True)
+    with transaction.atomic():
+        claimed = orders.filter(status=OrderStatus.CREATED).update(**contacts)
+        return claimed + orders.update(profile=contacts["profile"])
+
+
+def conditional_response(request: Request, data: Dict) -> HttpResponseBase:
+    """
+    Функция для получения ответа с заголовком ETag, вычисленным по данным ответа. Если клиент передал тот же ETag
+    в заголовке If-None-Match, возвращается ответ 304 без тела.
+    """
+
+    etag = quote_etag(hashlib.md5(JSONRenderer().render(data)).hexdigest())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = Response(data)
+        response["ETag"] = etag
+    return response
 
 
 def confirm_order(serializer: OrderUpdateSerializer, order: Order) -> Order:
-    """Функция для подтверждения заказа."""
-
-    serializer.save()
-    order.status = "confirmed"
-    total_cost = order.products.annotate(
-        product_cost=F("price") * F("products_in_order_count__count_in_order")
-    ).aggregate(total_cost=Sum("product_cost"))
-    delivery_price = DeliveryPrice.objects.first()
-    if total_cost["total_cost"] < delivery_price.free_delivery_point:
-        total_cost["total_cost"] += delivery_price.price
-    if order.deliveryType == "express":
-        express_delivery_price = ExpressDeliveryPrice.objects.first().price
-        total_cost["total_cost"] += express_delivery_price
-    order.totalCost = total_cost["total_cost"]
-    order.save(update_fields=["status", "totalCost"])
+    """
+    Функция для подтверждения заказа. В строки заказа записываются снимки товаров, итоговая стоимость считается
+    по ценам из снимков с учетом скидок. Контакты, доставка и итоговая стоимость записываются одним запросом вместе
+    с переходом в статус "confirmed". Если заказ уже подтвержден параллельным запросом, выбрасывается исключение
+    OrderTransitionError, снимки откатываются.
+    """
+
+    with transaction.atomic():
+        lines = snapshot_order_lines(order.products_in_order_count.all())
+        totals = price_lines(
+            [(line.price, line.salePrice, line.count_in_order) for line in lines],
+            serializer.validated_data.get("deliveryType", order.deliveryType),
+        )
+        transition_order(
+            order,
+            OrderStatus.CONFIRMED,
+            totalCost=totals["total"],
+            **serializer.validated_data
+        )
     return order
@@ -1,50 +1,154 @@
+import json
+from typing import Dict, Optional
+
+from django.conf import settings
 from django.db import transaction
-from drf_spectacular.utils import OpenApiExample, OpenApiResponse, extend_schema
-from rest_framework import status
+from django.db.models import QuerySet
+from django.http import Http404, HttpRequest, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views import View
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import (
+    OpenApiExample,
+    OpenApiParameter,
+    OpenApiResponse,
+    extend_schema,
+)
+from rest_framework import permissions, status
+from rest_framework.generics import ListAPIView
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from shop_app.models import Order, Product, ProductsInBasketCount
+
+from shop_app.analytics import sales_between
+from shop_app.cookie_basket import (
+    add_to_cookie_basket,
+    cookie_basket_enabled,
+    cookie_basket_serializer,
+    cookie_basket_summary,
+    get_cookie_basket,
+    persist_cookie_basket,
+    read_cookie_lines,
+    remove_from_cookie_basket,
+    store_cookie_basket,
+    update_cookie_basket,
+)
+from shop_app.gateway import SIGNATURE_HEADER, verify_webhook
+from shop_app.idempotency import (
+    IDEMPOTENCY_HEADER,
+    IdempotentReplay,
+    claim_idempotency_key,
+    complete_idempotency_key,
+    release_idempotency_key,
+)
+from shop_app.models import (
+    CategoryDailySales,
+    DeliveryDailySales,
+    Order,
+    OrderStatus,
+    Payment,
+    Product,
+    ProductDailySales,
+)
+from shop_app.order_status import OrderTransitionError
+from shop_app.payments import apply_payment_result, payment_events
+from shop_app.pricing import basket_totals, cookie_basket_totals
 from shop_app.serializers import (
+    BasketChangeSerializer,
+    BasketPreviewSerializer,
+    BasketSummarySerializer,
+    CategoryDailySalesSerializer,
+    DeliveryDailySalesSerializer,
     OrderCreateSerializer,
     OrderDetailSerializer,
+    OrderListSerializer,
     OrderUpdateSerializer,
     PaymentSerializer,
+    PaymentStatusSerializer,
+    ProductDailySalesSerializer,
     ProductInBasketListSerializer,
     ProductUpdateBasketSerializer,
+    SalesPeriodSerializer,
 )
 from shop_app.tasks import payment
 from shop_app.utils import (
+    DailySalesListViewPagination,
+    OrderListViewPagination,
+    basket_serializer,
+    checkout_basket,
+    checkout_contacts,
+    conditional_response,
     confirm_order,
+    flush_checkout_claims,
     get_basket,
-    order_users_params_get,
+    get_basket_summary,
+    prefetch_order_products,
     product_add_to_bakset,
     product_delete_from_bakset,
+    remember_anonymous_order,
+    update_basket_lines,
 )
+from shop_app.waiting_room import admit, leave, waiting_room_position
+
+
+class CookieBasketMixin:
+    """
+    Примесь для записи в ответ корзины анонимного пользователя, которая хранится в подписанном cookie.
+    Родитель: object.
+    """
+
+    def finalize_response(
+        self, request: Request, response: Response, *args, **kwargs
+    ) -> Response:
+        """Метод для записи измененной корзины в cookie ответа."""
+
+        response = super().finalize_response(request, response, *args, **kwargs)
+        store_cookie_basket(request, response)
+        return response
+
+
+# Заголовок ответа с товарами из отклоненных заявок флеш-распродажи
+REJECTED_CLAIMS_HEADER = "Flash-Sale-Rejected"
+
+
+def rejected_claims_headers(
+    serializer: ProductInBasketListSerializer,
+) -> Optional[Dict[str, str]]:
+    """
+    Функция для получения заголовка ответа с товарами из заявок флеш-распродажи, которые не удалось записать
+    в корзину: список id товара и количества в формате JSON.
+    """
+
+    rejected = serializer.context.get("rejected")
+    if not rejected:
+        return None
+    return {
+        REJECTED_CLAIMS_HEADER: json.dumps(
+            [
+                {"id": product_id, "count": count}
+                for product_id, count in rejected.items()
+            ]
+        )
+    }
 
 
 @extend_schema(tags=["basket"])
-class BasketView(APIView):
-    """Представление корзины с товарами. Родитель: APIView."""
+class BasketView(CookieBasketMixin, APIView):
+    """Представление корзины с товарами. Родители: CookieBasketMixin, APIView."""
 
     @extend_schema(responses={200: ProductInBasketListSerializer})
     def get(self, request: Request) -> Response:
         """Метод для отображения списка товаров в корзине."""
 
+        if cookie_basket_enabled(request):
+            serializer = cookie_basket_serializer(get_cookie_basket(request))
+            return Response(serializer.data)
         basket = get_basket(request)
-        products = (
-            Product.objects.prefetch_related("basket")
-            .prefetch_related("products_in_basket_count")
-            .filter(basket=basket, products_in_basket_count__count_in_basket__gt=0)
-            .select_related("category")
-            .prefetch_related("images")
-            .prefetch_related("tags")
-            .prefetch_related("reviews")
-        )
-        serializer = ProductInBasketListSerializer(
-            products, context={"basket": basket.id}, many=True
-        )
-        return Response(serializer.data)
+        if basket is None:
+            return Response([])
+        serializer = basket_serializer(basket)
+        return Response(serializer.data, headers=rejected_claims_headers(serializer))
 
     @extend_schema(
         request=ProductUpdateBasketSerializer,
@@ -58,8 +162,19 @@ class BasketView(APIView):
 
         serializer = ProductUpdateBasketSerializer(data=request.data)
         if serializer.is_valid():
-            products_serializer = product_add_to_bakset(request, serializer)
-            return Response(products_serializer.data, status=status.HTTP_200_OK)
+            if cookie_basket_enabled(request):
+                products_serializer = add_to_cookie_basket(
+                    request,
+                    serializer.validated_data["id"],
+                    serializer.validated_data["count"],
+                )
+            else:
+                products_serializer = product_add_to_bakset(request, serializer)
+            return Response(
+                products_serializer.data,
+                status=status.HTTP_200_OK,
+                headers=rejected_claims_headers(products_serializer),
+            )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @extend_schema(
@@ -74,30 +189,251 @@ class BasketView(APIView):
 
         serializer = ProductUpdateBasketSerializer(data=request.data)
         if serializer.is_valid():
-            products_serializer = product_delete_from_bakset(request, serializer)
-            return Response(products_serializer.data, status=status.HTTP_200_OK)
+            if cookie_basket_enabled(request):
+                products_serializer = remove_from_cookie_basket(
+                    request,
+                    serializer.validated_data["id"],
+                    serializer.validated_data["count"],
+                )
+            else:
+                products_serializer = product_delete_from_bakset(request, serializer)
+            return Response(
+                products_serializer.data,
+                status=status.HTTP_200_OK,
+                headers=rejected_claims_headers(products_serializer),
+            )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-@extend_schema(tags=["order"])
-class OrderListView(APIView):
-    """Представление списка заказов. Родитель: APIView."""
+@extend_schema(tags=["basket"])
+class BasketSummaryView(APIView):
+    """Представление количества товаров в корзине и их стоимости. Родитель: APIView."""
+
+    @extend_schema(responses={200: BasketSummarySerializer})
+    def get(self, request: Request) -> Response:
+        """Метод для отображения количества товаров в корзине и их стоимости без списка товаров."""
+
+        if cookie_basket_enabled(request):
+            summary = cookie_basket_summary(request)
+        else:
+            summary = get_basket_summary(request)
+        return Response(BasketSummarySerializer(summary).data)
+
+
+@extend_schema(tags=["basket"])
+class BasketPreviewView(APIView):
+    """Представление предварительного расчета стоимости корзины. Родитель: APIView."""
 
-    @extend_schema(responses={200: OrderDetailSerializer})
+    @extend_schema(
+        responses={200: BasketPreviewSerializer},
+        parameters=[
+            OpenApiParameter(
+                name="deliveryType",
+                type=str,
+                enum=["ordinary", "express"],
+                description="Тип доставки",
+            )
+        ],
+    )
     def get(self, request: Request) -> Response:
-        """Метод для отображения списка заказов."""
+        """
+        Метод для отображения стоимости товаров в корзине, скидок по действующим акциям, стоимости доставки и
+        итоговой стоимости заказа по правилам подтверждения заказа.
+        """
+
+        delivery_type = request.query_params.get("deliveryType", "ordinary")
+        if cookie_basket_enabled(request):
+            totals = cookie_basket_totals(read_cookie_lines(request), delivery_type)
+        else:
+            totals = basket_totals(get_basket(request), delivery_type)
+        return Response(BasketPreviewSerializer(totals).data)
+
+
+@extend_schema(tags=["basket"])
+class BasketBatchView(CookieBasketMixin, APIView):
+    """Представление для изменения количества нескольких товаров в корзине. Родители: CookieBasketMixin, APIView."""
+
+    @extend_schema(
+        request=BasketChangeSerializer(many=True),
+        responses={
+            200: ProductInBasketListSerializer(many=True),
+            400: OpenApiResponse(
+                description="Корзина не изменена, ошибки по строкам запроса"
+            ),
+        },
+    )
+    def post(self, request: Request) -> Response:
+        """
+        Метод для изменения количества нескольких товаров в корзине одной транзакцией. Изменения применяются все или
+        ни одного, корзина возвращается один раз.
+        """
 
-        profile = request.user.profile
-        orders = (
-            Order.objects.select_related("profile")
-            .filter(profile=profile)
-            .prefetch_related("products")
+        serializer = BasketChangeSerializer(
+            data=request.data, many=True, allow_empty=False
         )
-        orders_pk = [order.pk for order in orders]
-        serializer = OrderDetailSerializer(
-            orders, many=True, context={"orders": orders_pk}
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        changes = serializer.validated_data
+        if cookie_basket_enabled(request):
+            products_serializer = update_cookie_basket(request, changes)
+            return Response(products_serializer.data)
+        basket = get_basket(
+            request, create=any(change["count"] > 0 for change in changes)
         )
-        return Response(serializer.data)
+        with transaction.atomic():
+            update_basket_lines(basket, changes)
+            products_serializer = basket_serializer(basket)
+            return Response(
+                products_serializer.data,
+                headers=rejected_claims_headers(products_serializer),
+            )
+
+
+class WaitingRoomMixin:
+    """
+    Примесь для допуска POST-запросов к представлению через виртуальную комнату ожидания. Место в комнате занимается
+    только на время выполнения допущенного запроса. Родитель: object.
+    """
+
+    def get_waiting_room(self, request: Request, **kwargs) -> str:
+        """Метод для получения названия комнаты ожидания запроса."""
+
+        return "checkout"
+
+    def initial(self, request: Request, *args, **kwargs) -> None:
+        """Метод для допуска запроса через комнату ожидания после аутентификации."""
+
+        super().initial(request, *args, **kwargs)
+        if request.method == "POST":
+            request.waiting_room_token = admit(
+                request, self.get_waiting_room(request, **kwargs)
+            )
+
+    def finalize_response(
+        self, request: Request, response: Response, *args, **kwargs
+    ) -> Response:
+        """Метод для освобождения места в комнате ожидания после выполнения допущенного запроса."""
+
+        response = super().finalize_response(request, response, *args, **kwargs)
+        leave(request)
+        return response
+
+
+# Заголовок с ключом идемпотентности в схеме API
+IDEMPOTENCY_PARAMETER = OpenApiParameter(
+    name=IDEMPOTENCY_HEADER,
+    type=str,
+    location=OpenApiParameter.HEADER,
+    description="Ключ, который не меняется при повторах запроса",
+)
+
+
+class IdempotencyMixin:
+    """
+    Примесь для идемпотентных POST-запросов с заголовком Idempotency-Key. Ключ занимается после аутентификации и до
+    допуска через комнату ожидания, поэтому повтор выполненного запроса получает сохраненный ответ без очереди.
+    Родитель: object.
+    """
+
+    def initial(self, request: Request, *args, **kwargs) -> None:
+        """Метод для занятия ключа идемпотентности запроса после аутентификации."""
+
+        super().initial(request, *args, **kwargs)
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if request.method == "POST" and key:
+            request.idempotency_key = claim_idempotency_key(request, key)
+
+    def handle_exception(self, exc: Exception) -> Response:
+        """Метод для ответа на повтор выполненного запроса и освобождения ключа после необработанной ошибки."""
+
+        if isinstance(exc, IdempotentReplay):
+            return exc.response()
+        try:
+            return super().handle_exception(exc)
+        except Exception:
+            record = getattr(self.request, "idempotency_key", None)
+            if record is not None:
+                release_idempotency_key(record)
+            raise
+
+    def idempotent_response(self, response: Response) -> Response:
+        """
+        Метод для сохранения ответа запроса с ключом идемпотентности. Вызывается в транзакции, которая создает заказ
+        или оплату, поэтому ответ фиксируется вместе с ними.
+        """
+
+        record = getattr(self.request, "idempotency_key", None)
+        if record is not None:
+            complete_idempotency_key(record, response)
+        return response
+
+    def finalize_response(
+        self, request: Request, response: Response, *args, **kwargs
+    ) -> Response:
+        """Метод для сохранения ответа запроса с ключом идемпотентности, если ответ еще не сохранен."""
+
+        response = super().finalize_response(request, response, *args, **kwargs)
+        record = getattr(request, "idempotency_key", None)
+        if record is not None and record.status_code is None:
+            complete_idempotency_key(record, response)
+        return response
+
+
+@extend_schema(tags=["order"])
+class WaitingRoomView(APIView):
+    """Представление позиции в очереди комнаты ожидания. Родитель: APIView."""
+
+    @extend_schema(
+        responses={
+            200: OpenApiResponse(
+                description="Позиция в очереди (0 - пользователь допущен к оформлению)",
+                examples=[
+                    OpenApiExample(name="", value={"position": 3, "admitted": False})
+                ],
+            ),
+            404: OpenApiResponse(description="Билет не найден"),
+        }
+    )
+    def get(self, request: Request, token: str) -> Response:
+        """Метод для опроса позиции в очереди по билету."""
+
+        position = waiting_room_position(token)
+        return Response({"position": position, "admitted": position == 0})
+
+
+@extend_schema(tags=["order"])
+class OrderListView(CookieBasketMixin, WaitingRoomMixin, IdempotencyMixin, APIView):
+    """
+    Представление списка заказов. Родители: CookieBasketMixin, WaitingRoomMixin, IdempotencyMixin, APIView.
+    """
+
+    def get_waiting_room(self, request: Request, **kwargs) -> str:
+        """Метод для допуска заказов с товарами флеш-распродажи через отдельную комнату ожидания."""
+
+        product_ids = [
+            product.get("id") for product in request.data if isinstance(product, dict)
+        ]
+        if Product.objects.filter(pk__in=product_ids, flashSale=True).exists():
+            return "flash_sale"
+        return "checkout"
+
+    @extend_schema(
+        responses={200: OrderListSerializer(many=True)},
+        parameters=[
+            OpenApiParameter(
+                name="cursor", type=str, description="Курсор страницы списка заказов"
+            )
+        ],
+    )
+    def get(self, request: Request) -> Response:
+        """Метод для отображения страницы списка заказов."""
+
+        paginator = OrderListViewPagination()
+        page = paginator.paginate_queryset(
+            Order.objects.filter(profile=request.user.profile), request, view=self
+        )
+        serializer = OrderListSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     @extend_schema(
         request=OrderCreateSerializer,
@@ -110,25 +446,35 @@ class OrderListView(APIView):
                 ],
             ),
             400: OpenApiResponse(description="Заказ не создан"),
+            409: OpenApiResponse(
+                description="Запрос с этим ключом идемпотентности еще выполняется"
+            ),
+            422: OpenApiResponse(
+                description="Ключ идемпотентности использован с другим запросом"
+            ),
+            503: OpenApiResponse(
+                description="Товары флеш-распродажи еще добавляются в корзину"
+            ),
         },
+        parameters=[IDEMPOTENCY_PARAMETER],
     )
     def post(self, request: Request) -> Response:
         """Метод для создания заказа."""
 
-        serializer = OrderCreateSerializer(data={"products": request.data})
-        if serializer.is_valid():
-            with transaction.atomic():
-                order = serializer.save()
-                basket = get_basket(request)
-                products_in_basket = ProductsInBasketCount.objects.filter(
-                    basket=basket, count_in_basket__gt=0
-                )
-                for product in products_in_basket:
-                    product.count_in_basket = 0
-                ProductsInBasketCount.objects.bulk_update(
-                    products_in_basket, ["count_in_basket"]
+        flush_checkout_claims(request)
+        with transaction.atomic():
+            basket = persist_cookie_basket(request) or get_basket(request)
+            serializer = OrderCreateSerializer(
+                data={"products": request.data}, context={"basket": basket}
+            )
+            if serializer.is_valid():
+                order = serializer.save(**checkout_contacts(request))
+                remember_anonymous_order(request, order)
+                if basket is not None:
+                    checkout_basket(basket, serializer.validated_data["products"])
+                return self.idempotent_response(
+                    Response({"orderId": order.id}, status=status.HTTP_200_OK)
                 )
-                return Response({"orderId": order.id}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -136,19 +482,22 @@ class OrderListView(APIView):
 class OrderDetailView(APIView):
     """Представление детальной страницы заказа. Родитель: APIView."""
 
-    @extend_schema(responses={200: OrderDetailSerializer})
+    @extend_schema(
+        responses={
+            200: OrderDetailSerializer,
+            304: OpenApiResponse(description="Заказ не изменился"),
+        }
+    )
     def get(self, request: Request, **kwargs) -> Response:
-        """Метод для отображения детальной страницы заказа."""
+        """
+        Метод для отображения детальной страницы заказа. Заказ только читается из БД, ответ помечается заголовком
+        ETag.
+        """
 
         order_pk = kwargs["pk"]
-        order = (
-            Order.objects.prefetch_related("products")
-            .select_related("profile")
-            .get(pk=order_pk)
-        )
-        order_users_params_get(request, order)
-        serializer = OrderDetailSerializer(order, context={"orders": [order_pk]})
-        return Response(serializer.data)
+        order = prefetch_order_products(Order.objects.all()).get(pk=order_pk)
+        serializer = OrderDetailSerializer(order)
+        return conditional_response(request, serializer.data)
 
     @extend_schema(
         request=OrderUpdateSerializer,
@@ -158,48 +507,231 @@ class OrderDetailView(APIView):
         },
     )
     def post(self, request: Request, **kwargs) -> Response:
-        """Метод для подтверждения заказа."""
+        """
+        Метод для подтверждения заказа. Повторное подтверждение, в том числе параллельным запросом, возвращает id
+        заказа без изменения заказа.
+        """
 
         order_pk = kwargs["pk"]
-        order = (
-            Order.objects.prefetch_related("products")
-            .prefetch_related("products_in_order_count")
-            .select_related("profile")
-            .get(pk=order_pk)
-        )
-        if order.status == "paid":
+        order = Order.objects.select_related("profile").get(pk=order_pk)
+        serializer = OrderUpdateSerializer(order, data=request.data)
+        if order.status == OrderStatus.CREATED and serializer.is_valid():
+            try:
+                confirm_order(serializer, order)
+            except OrderTransitionError:
+                pass
+        if order.status == OrderStatus.PAID:
             return Response(
                 "Заказ № {order} уже оплачен!".format(order=order_pk),
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        elif order.status == "confirmed":
-            return Response({"orderId": order.id}, status=status.HTTP_200_OK)
-        serializer = OrderUpdateSerializer(order, data=request.data)
-        if serializer.is_valid():
-            order = confirm_order(serializer, order)
+        elif order.status == OrderStatus.CONFIRMED:
             return Response({"orderId": order.id}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 @extend_schema(tags=["payment"])
-class PaymentView(APIView):
-    """Представление страницы оплаты заказа. Родитель: APIView."""
+class PaymentView(WaitingRoomMixin, IdempotencyMixin, APIView):
+    """Представление страницы оплаты заказа. Родители: WaitingRoomMixin, IdempotencyMixin, APIView."""
+
+    def get_waiting_room(self, request: Request, **kwargs) -> str:
+        """Метод для допуска оплаты заказов с товарами флеш-распродажи через отдельную комнату ожидания."""
+
+        if Product.objects.filter(
+            products_in_order_count__order=kwargs["pk"], flashSale=True
+        ).exists():
+            return "flash_sale"
+        return "checkout"
 
     @extend_schema(
         request=PaymentSerializer,
         responses={
-            200: OpenApiResponse(description="Заказ успешно оплачен"),
+            202: OpenApiResponse(
+                response=202,
+                description="Оплата принята в обработку",
+                examples=[
+                    OpenApiExample(name="", value={"paymentId": 1}, status_codes=[202])
+                ],
+            ),
             400: OpenApiResponse(description="Заказ не оплачен"),
+            409: OpenApiResponse(
+                description="Запрос с этим ключом идемпотентности еще выполняется"
+            ),
+            422: OpenApiResponse(
+                description="Ключ идемпотентности использован с другим запросом"
+            ),
         },
+        parameters=[IDEMPOTENCY_PARAMETER],
     )
     def post(self, request: Request, **kwargs) -> Response:
-        """Метод для оплаты заказа."""
+        """
+        Метод для оплаты заказа. Оплата выполняется воркером celery, ответ с id оплаты возвращается сразу. Статус
+        оплаты передается представлениями PaymentStatusView и PaymentEventsView. Заказ блокируется на время
+        проверки, поэтому у заказа не больше одной оплаты в обработке: пока она не завершена, повторная оплата
+        возвращает ее id без нового списания. Новая оплата получает следующий номер попытки оплаты заказа, от которого
+        зависит ключ идемпотентности списания.
+        """
 
         serializer = PaymentSerializer(data=request.data)
-        if serializer.is_valid():
-            order_pk = kwargs["pk"]
-            card_num = serializer.validated_data["number"]
-            updated_orders_status = payment.delay(order_pk, card_num)
-            if updated_orders_status.get() == "paid":
-                return Response(status=status.HTTP_200_OK)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        card_num = serializer.validated_data["number"]
+        with transaction.atomic():
+            order = get_object_or_404(
+                Order.objects.select_for_update(), pk=kwargs["pk"]
+            )
+            if order.status == OrderStatus.PAID:
+                return Response(
+                    "Заказ № {order} уже оплачен!".format(order=order.pk),
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if order.status != OrderStatus.CONFIRMED:
+                return Response(
+                    "Заказ № {order} не подтвержден!".format(order=order.pk),
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            order_payment = order.payments.filter(status="pending").first()
+            if order_payment is None:
+                order_payment = Payment.objects.create(
+                    order=order, attempt=order.payments.count() + 1
+                )
+                transaction.on_commit(lambda: payment.delay(order_payment.pk, card_num))
+            return self.idempotent_response(
+                Response(
+                    {"paymentId": order_payment.pk},
+                    status=status.HTTP_202_ACCEPTED,
+                    headers={
+                        "Location": reverse(
+                            "payment_status", kwargs={"pk": order_payment.pk}
+                        )
+                    },
+                )
+            )
+
+
+@extend_schema(tags=["payment"])
+class PaymentStatusView(APIView):
+    """Представление статуса оплаты заказа. Родитель: APIView."""
+
+    @extend_schema(responses={200: PaymentStatusSerializer})
+    def get(self, request: Request, **kwargs) -> Response:
+        """Метод для получения статуса оплаты."""
+
+        order_payment = get_object_or_404(Payment, pk=kwargs["pk"])
+        return Response(PaymentStatusSerializer(order_payment).data)
+
+
+@extend_schema(tags=["payment"])
+class PaymentWebhookView(APIView):
+    """
+    Представление для уведомлений платежного шлюза о результате оплаты. Уведомление подписывается ключом
+    PAYMENT_WEBHOOK_SECRET, без ключа уведомления отклоняются. Родитель: APIView.
+    """
+
+    authentication_classes = []
+
+    @extend_schema(
+        responses={
+            200: OpenApiResponse(description="Уведомление принято"),
+            400: OpenApiResponse(description="Неверный формат уведомления"),
+            403: OpenApiResponse(
+                description="Неверная подпись уведомления или не задан ключ подписи"
+            ),
+        },
+    )
+    def post(self, request: Request) -> Response:
+        """Метод для записи результата оплаты из уведомления. Повторные уведомления не меняют оплату."""
+
+        body = request.body
+        signature = request.headers.get(SIGNATURE_HEADER, "")
+        if not settings.PAYMENT_WEBHOOK_SECRET or not verify_webhook(
+            body, signature, settings.PAYMENT_WEBHOOK_SECRET
+        ):
+            return Response(status=status.HTTP_403_FORBIDDEN)
+        try:
+            result = json.loads(body)
+            payment_id = result["payment"]
+        except (ValueError, KeyError, TypeError):
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        if apply_payment_result(payment_id, result) is None:
+            raise Http404("Оплата не найдена")
+        return Response(status=status.HTTP_200_OK)
+
+
+class PaymentEventsView(View):
+    """
+    Асинхронное представление потока событий оплаты (Server-Sent Events). Ожидание статуса оплаты не занимает
+    воркер сервера, поэтому представление обслуживается сервером ASGI. Родитель: View.
+    """
+
+    async def get(self, request: HttpRequest, **kwargs) -> StreamingHttpResponse:
+        """Метод для получения потока событий оплаты."""
+
+        if not await Payment.objects.filter(pk=kwargs["pk"]).aexists():
+            raise Http404("Оплата не найдена")
+        response = StreamingHttpResponse(
+            payment_events(kwargs["pk"]), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        # nginx передает события клиенту без буферизации
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+# Параметры периода отчетов о продажах
+SALES_PERIOD_PARAMETERS = [
+    OpenApiParameter(
+        name="dateFrom", type=OpenApiTypes.DATE, description="Начало периода"
+    ),
+    OpenApiParameter(
+        name="dateTo", type=OpenApiTypes.DATE, description="Конец периода"
+    ),
+]
+
+
+@extend_schema(tags=["analytics"], parameters=SALES_PERIOD_PARAMETERS)
+class DailySalesListView(ListAPIView):
+    """
+    Представление продаж по дням за период для администраторов. Продажи читаются из таблицы продаж по дням
+    без обращения к таблицам заказов. Продажи возвращаются постранично. Родитель: ListAPIView.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+    filter_backends = []
+    pagination_class = DailySalesListViewPagination
+    model = None
+    related = []
+
+    def get_queryset(self) -> QuerySet:
+        """Метод для получения продаж по дням за период из параметров запроса."""
+
+        period = SalesPeriodSerializer(data=self.request.query_params)
+        period.is_valid(raise_exception=True)
+        return sales_between(
+            self.model,
+            period.validated_data.get("dateFrom"),
+            period.validated_data.get("dateTo"),
+        ).select_related(*self.related)
+
+
+class ProductDailySalesView(DailySalesListView):
+    """Представление продаж товаров по дням. Родитель: DailySalesListView."""
+
+    model = ProductDailySales
+    related = ["product"]
+    serializer_class = ProductDailySalesSerializer
+
+
+class CategoryDailySalesView(DailySalesListView):
+    """Представление продаж категорий товаров по дням. Родитель: DailySalesListView."""
+
+    model = CategoryDailySales
+    related = ["category"]
+    serializer_class = CategoryDailySalesSerializer
+
+
+class DeliveryDailySalesView(DailySalesListView):
+    """Представление продаж по типам доставки по дням. Родитель: DailySalesListView."""
+
+    model = DeliveryDailySales
+    serializer_class = DeliveryDailySalesSerializer
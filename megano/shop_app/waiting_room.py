@@ -0,0 +1,211 @@
+import time
+import uuid
+from typing import Dict, Optional
+
+import redis
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.request import Request
+
+QUEUE_KEY = "waiting_room:{room}:queue"
+ACTIVE_KEY = "waiting_room:{room}:active"
+SEEN_KEY = "waiting_room:{room}:seen"
+SEQUENCE_KEY = "waiting_room:{room}:sequence"
+
+# Заголовок, в котором клиент передает билет комнаты ожидания
+TOKEN_HEADER = "X-Waiting-Room-Token"
+
+# Постановка в очередь, допуск из начала очереди и получение позиции выполняются в Redis атомарно. Без постановки
+# в очередь (ARGV[6] = 0) для билета, которого нет в очереди и среди допущенных, возвращается -1
+ENTER_SCRIPT = """
+local token, now = ARGV[1], tonumber(ARGV[2])
+local capacity, lease, timeout = tonumber(ARGV[3]), tonumber(ARGV[4]), tonumber(ARGV[5])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+for _, stale in ipairs(redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now - timeout)) do
+    redis.call('ZREM', KEYS[1], stale)
+    redis.call('ZREM', KEYS[3], stale)
+end
+if redis.call('ZSCORE', KEYS[2], token) then
+    redis.call('ZADD', KEYS[2], now + lease, token)
+    return 0
+end
+if not redis.call('ZSCORE', KEYS[1], token) then
+    if ARGV[6] == '0' then
+        return -1
+    end
+    redis.call('ZADD', KEYS[1], redis.call('INCR', KEYS[4]), token)
+end
+redis.call('ZADD', KEYS[3], now, token)
+local free = capacity - redis.call('ZCARD', KEYS[2])
+if free > 0 then
+    for _, admitted in ipairs(redis.call('ZRANGE', KEYS[1], 0, free - 1)) do
+        redis.call('ZREM', KEYS[1], admitted)
+        redis.call('ZREM', KEYS[3], admitted)
+        redis.call('ZADD', KEYS[2], now + lease, admitted)
+    end
+end
+if redis.call('ZSCORE', KEYS[2], token) then
+    return 0
+end
+return redis.call('ZRANK', KEYS[1], token) + 1
+"""
+
+
+class WaitingRoomQueued(APIException):
+    """Исключение для ответа пользователю, поставленному в очередь комнаты ожидания. Родитель: APIException."""
+
+    status_code = status.HTTP_429_TOO_MANY_REQUESTS
+    default_detail = "Вы в очереди на оформление заказа"
+    default_code = "waiting_room"
+
+    def __init__(self, token: str, position: int) -> None:
+        """Метод для создания исключения с билетом и позицией в очереди."""
+
+        super().__init__()
+        # Позиция передается числом, а не строкой ErrorDetail
+        self.detail = {"token": token, "position": position}
+        # Интервал повторного опроса позиции для заголовка Retry-After
+        self.wait = settings.WAITING_ROOM_POLL_INTERVAL
+
+
+class WaitingRoom:
+    """
+    Виртуальная комната ожидания в Redis. Одновременно к оформлению допускается не больше заданного количества
+    пользователей комнаты, остальные получают билет и допускаются в порядке очереди. Родитель: object.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        rooms: Dict[str, int],
+        lease: float = 120,
+        queue_timeout: float = 30,
+    ) -> None:
+        """
+        Метод для создания комнаты ожидания. rooms - количество пользователей, одновременно допускаемых к оформлению,
+        по названиям комнат, lease - время допуска к оформлению в секундах, queue_timeout - время, после которого
+        билет пользователя, переставшего опрашивать позицию, удаляется из очереди.
+        """
+
+        self.client = client
+        self.rooms = rooms
+        self.lease = lease
+        self.queue_timeout = queue_timeout
+        self._enter = client.register_script(ENTER_SCRIPT)
+
+    @staticmethod
+    def new_token(room: str) -> str:
+        """Метод для выдачи билета комнаты ожидания."""
+
+        return "{room}:{token}".format(room=room, token=uuid.uuid4().hex)
+
+    def token_room(self, token: str) -> Optional[str]:
+        """Метод для получения названия комнаты по билету."""
+
+        room, _, _ = token.rpartition(":")
+        return room if room in self.rooms else None
+
+    @staticmethod
+    def keys(room: str) -> list:
+        """Метод для получения ключей комнаты в Redis."""
+
+        return [
+            key.format(room=room)
+            for key in (QUEUE_KEY, ACTIVE_KEY, SEEN_KEY, SEQUENCE_KEY)
+        ]
+
+    def enter(self, token: str, enqueue: bool = True) -> Optional[int]:
+        """
+        Метод для входа в комнату или опроса позиции в очереди. Возвращает 0, если пользователь допущен к
+        оформлению, иначе позицию в очереди, начиная с 1. Без постановки в очередь (enqueue=False) для билета,
+        которого нет в очереди и среди допущенных, возвращает None.
+        """
+
+        room = self.token_room(token)
+        position = self._enter(
+            keys=self.keys(room),
+            args=[
+                token,
+                time.time(),
+                self.rooms[room],
+                self.lease,
+                self.queue_timeout,
+                int(enqueue),
+            ],
+        )
+        return None if position < 0 else position
+
+    def leave(self, token: str) -> None:
+        """Метод для освобождения места в комнате после завершения оформления."""
+
+        queue_key, active_key, seen_key, _ = self.keys(self.token_room(token))
+        pipeline = self.client.pipeline()
+        pipeline.zrem(active_key, token)
+        pipeline.zrem(queue_key, token)
+        pipeline.zrem(seen_key, token)
+        pipeline.execute()
+
+
+_waiting_room = None
+
+
+def get_waiting_room() -> Optional[WaitingRoom]:
+    """Функция для получения комнаты ожидания. Пустой адрес Redis отключает комнату ожидания."""
+
+    global _waiting_room
+    if not settings.WAITING_ROOM_REDIS_URL:
+        return None
+    if _waiting_room is None:
+        _waiting_room = WaitingRoom(
+            redis.Redis.from_url(settings.WAITING_ROOM_REDIS_URL),
+            rooms=settings.WAITING_ROOMS,
+            lease=settings.WAITING_ROOM_LEASE,
+            queue_timeout=settings.WAITING_ROOM_QUEUE_TIMEOUT,
+        )
+    return _waiting_room
+
+
+def admit(request: Request, room: str) -> Optional[str]:
+    """
+    Функция для допуска запроса к оформлению через комнату ожидания. Возвращает билет допущенного пользователя или
+    None, если комната ожидания отключена. Пользователь, не допущенный к оформлению, получает ответ 429 с билетом и
+    позицией в очереди.
+    """
+
+    waiting_room = get_waiting_room()
+    if waiting_room is None:
+        return None
+    token = request.headers.get(TOKEN_HEADER)
+    if not token or waiting_room.token_room(token) != room:
+        token = waiting_room.new_token(room)
+    position = waiting_room.enter(token)
+    if position:
+        raise WaitingRoomQueued(token, position)
+    return token
+
+
+def waiting_room_position(token: str) -> int:
+    """
+    Функция для опроса позиции в очереди по билету, выданному admit. 0 - пользователь допущен к оформлению.
+    Билет, которого нет в очереди и среди допущенных, не ставится в очередь.
+    """
+
+    waiting_room = get_waiting_room()
+    if waiting_room is None:
+        return 0
+    position = None
+    if waiting_room.token_room(token) is not None:
+        position = waiting_room.enter(token, enqueue=False)
+    if position is None:
+        raise NotFound("Билет не найден")
+    return position
+
+
+def leave(request: Request) -> None:
+    """Функция для освобождения места в комнате ожидания после завершения допущенного запроса."""
+
+    token = getattr(request, "waiting_room_token", None)
+    waiting_room = get_waiting_room()
+    if token is not None and waiting_room is not None:
+        waiting_room.leave(token)
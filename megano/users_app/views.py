@@ -2,6 +2,7 @@ import json
 
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
+from django.db import transaction
 from drf_spectacular.utils import (
     OpenApiParameter,
     OpenApiResponse,
@@ -12,6 +13,9 @@ from rest_framework import permissions, serializers, status
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from shop_app.cookie_basket import persist_cookie_basket
+from shop_app.utils import claim_anonymous_orders, merge_anonymous_basket
+from shop_app.views import CookieBasketMixin
 from users_app.models import Avatar, Profile
 from users_app.serializers import ProfileSerializer, UserPasswordSerializer
 
@@ -31,8 +35,12 @@ from users_app.serializers import ProfileSerializer, UserPasswordSerializer
         500: OpenApiResponse(description="Неверное имя пользователя или пароль"),
     },
 )
-class SignInView(APIView):
-    """Представление для аутентификации существующего пользователя. Родитель: APIView."""
+class SignInView(CookieBasketMixin, APIView):
+    """
+    Представление для аутентификации существующего пользователя. Корзина анонимного пользователя из cookie
+    и корзина анонимной сессии переносятся в корзину пользователя, заказы анонимной сессии привязываются к профилю.
+    Родители: CookieBasketMixin, APIView.
+    """
 
     def post(self, request: Request) -> Response:
         """Метод для отправки заполненной формы аутентификации существующего пользователя на сервер."""
@@ -43,6 +51,10 @@ class SignInView(APIView):
         user = authenticate(request, username=username, password=password)
         if user is not None:
             login(request, user)
+            with transaction.atomic():
+                merge_anonymous_basket(request)
+                persist_cookie_basket(request)
+                claim_anonymous_orders(request)
             return Response(status=status.HTTP_200_OK)
         return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -63,8 +75,12 @@ class SignInView(APIView):
         500: OpenApiResponse(description="Регистрация не выполнена"),
     },
 )
-class SignUpView(APIView):
-    """Представление для регистрации нового пользователя. Родитель: APIView."""
+class SignUpView(CookieBasketMixin, APIView):
+    """
+    Представление для регистрации нового пользователя. Корзина анонимного пользователя из cookie и корзина анонимной
+    сессии переносятся в корзину пользователя, заказы анонимной сессии привязываются к профилю. Родители:
+    CookieBasketMixin, APIView.
+    """
 
     def post(self, request: Request) -> Response:
         """Метод для отправки заполненной формы регистрации нового пользователя на сервер."""
@@ -79,6 +95,10 @@ class SignUpView(APIView):
             user = authenticate(request, username=username, password=password)
             if user is not None:
                 login(request, user)
+                with transaction.atomic():
+                    merge_anonymous_basket(request)
+                    persist_cookie_basket(request)
+                    claim_anonymous_orders(request)
                 return Response(status=status.HTTP_200_OK)
         except Exception:
             return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)